@@ -2,8 +2,21 @@ from django.contrib import admin
 
 # Register your models here.
 from .models import Submission, Challenge, Requirement
+from .skeletons import compile_skeletons
 
 admin.site.register(Submission)
 
-admin.site.register(Challenge)
-admin.site.register(Requirement)
+@admin.register(Challenge)
+class ChallengeAdmin(admin.ModelAdmin):
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+
+        # Prerequisites are saved here, after the challenge itself
+        compile_skeletons(form.instance)
+
+@admin.register(Requirement)
+class RequirementAdmin(admin.ModelAdmin):
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+
+        compile_skeletons(obj.challenge)
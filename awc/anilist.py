@@ -1,8 +1,87 @@
+import asyncio
+import contextvars
 import json
+import httpx
 import requests
 import os
+import re
+import threading
+import time
 
-class Anilist:
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+from .cassette import CassetteAdapter
+from .metrics import AnilistCall, AnilistMetrics, cache_status
+from .ratelimit import RateLimiter, RateLimitTimeout
+from .records import GraphQLError, Media, PageInfo, ThreadComment, decode_data, decode_response, loads
+from .resilience import AnilistUnavailable, backoff_delay, is_retryable_status, mark_stale
+from .singleflight import SingleFlight, AsyncSingleFlight, request_key, is_mutation
+
+def build_batched_query(field, arguments, selection, calls, alias_prefix='c'):
+    """Merges many calls to one root field into a single GraphQL document using aliases"""
+    definitions = []
+    fields = []
+    variables = {}
+    aliases = []
+
+    for i, call in enumerate(calls):
+        alias = '{}{}'.format(alias_prefix, i + 1)
+        field_arguments = []
+
+        for name, graphql_type in arguments.items():
+            variable = '{}_{}'.format(name, i + 1)
+
+            definitions.append('${}: {}'.format(variable, graphql_type))
+            field_arguments.append('{}: ${}'.format(name, variable))
+            variables[variable] = call.get(name)
+
+        fields.append('{}: {} ({}) {{{}}}'.format(alias, field, ', '.join(field_arguments), selection))
+        aliases.append(alias)
+
+    query = 'query ({}) {{\n{}\n}}'.format(', '.join(definitions), '\n'.join(fields))
+
+    return query, variables, aliases
+
+def split_batched_response(response, aliases):
+    """Returns the per-alias results of a batched query, with None for aliases that errored"""
+    response_data = loads(response)
+    data = response_data.get('data') or {}
+
+    failed = set()
+
+    for error in response_data.get('errors', []):
+        if error.get('path'):
+            failed.add(error['path'][0])
+
+    return [None if alias in failed else data.get(alias) for alias in aliases]
+
+def chunk(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def decode_thread_comment(data, extensions=None):
+    """Returns the first comment of a ThreadComment result, which Anilist sends as a list"""
+    if not data:
+        raise GraphQLError([{'message': 'Comment not found', 'status': 404}])
+
+    return ThreadComment.from_dict(data[0], stale=bool((extensions or {}).get('stale')))
+
+def is_good_response(response):
+    """Returns whether a response can stand in for Anilist later, so a 2xx whose data decodes without errors"""
+    if not 200 <= response.status_code < 300:
+        return False
+
+    try:
+        decode_response(response.text)
+    except (GraphQLError, ValueError, AttributeError):
+        return False
+
+    return True
+
+ROOT_FIELD_PATTERN = re.compile(r'\{\s*(?:\w+\s*:\s*)?(\w+)')
+
+class AnilistQueries:
+    '''Anilist endpoints and GraphQL documents shared by the sync and async clients'''
 
     API_URL = 'https://graphql.anilist.co'
     AUTH_URL = 'https://anilist.co/api/v2/oauth/token'
@@ -44,6 +123,25 @@ class Anilist:
     }
     '''
 
+    # Anilist rejects documents above this complexity, so batches are chunked to stay under it
+    MAX_QUERY_COMPLEXITY = 500
+
+    THREAD_COMMENT_BATCH = {
+        'field': 'ThreadComment',
+        'arguments': {'threadId': 'Int', 'id': 'Int'},
+        'selection': 'comment, threadId, id',
+        'complexity': 10,
+    }
+
+    MEDIA_BATCH = {
+        'field': 'Media',
+        'arguments': {'id': 'Int'},
+        'selection': 'id, title { userPreferred }, coverImage { large }, episodes, '
+                     'mediaListEntry { id, status, progress, repeat, '
+                     'startedAt { year, month, day }, completedAt { year, month, day } }',
+        'complexity': 20,
+    }
+
     GET_POST_QUERY = '''
     query ($thread_id: Int, $comment_id: Int) {
       ThreadComment (threadId: $thread_id, id: $comment_id) {
@@ -73,8 +171,8 @@ class Anilist:
     '''
 
     GET_ANIME_FROM_ID_QUERY = '''
-    query ($ids: [Int]) {
-        Page(page:1, perPage: 50) {
+    query ($ids: [Int], $page: Int = 1) {
+        Page(page: $page, perPage: 50) {
             pageInfo {
                 currentPage
                 lastPage
@@ -149,18 +247,208 @@ class Anilist:
         }
     }
     '''
-    
-    def __init__(self, client_id, client_secret, redirect_uri):
+
+    _operation_names = None
+
+    @classmethod
+    def operation_name(cls, query):
+        """Returns the attribute name of a query, or of the batch definition a batched query was built from"""
+        if cls._operation_names is None:
+            names = {}
+
+            for name in dir(cls):
+                if name.endswith('_QUERY'):
+                    names[getattr(cls, name)] = name
+                elif name.endswith('_BATCH'):
+                    names[getattr(cls, name)['field']] = name
+
+            cls._operation_names = names
+
+        name = cls._operation_names.get(query)
+
+        if name is None:
+            match = ROOT_FIELD_PATTERN.search(query)
+            name = cls._operation_names.get(match.group(1), match.group(1)) if match else 'UNKNOWN'
+
+        return name
+
+class RateLimitedClient:
+    '''How long the sync and async clients' calls may wait for their rate limiter'''
+
+    def rate_limit_timeout(self, priority):
+        """Returns how long a call may wait for the rate limiter, where None waits as long as it takes"""
+        # A page waiting out a long Retry-After would hold its worker, so it gets no longer than a read
+        if priority == RateLimiter.INTERACTIVE:
+            return self.read_timeout
+
+        return None
+
+class Anilist(RateLimitedClient, AnilistQueries):
+
+    def __init__(self, client_id, client_secret, redirect_uri, pool_size=10, connect_timeout=3.05, read_timeout=10,
+                 rate_limiter=None, media_cache=None, retries=2, circuit_breaker=None, response_cache=None, metrics=None,
+                 api_url=None, auth_url=None, cassette=None):
         self.client_id = client_id
         self.client_secret = client_secret
         self.redirect_uri = redirect_uri
 
-    def authenticate(self, authorisation_code, client_id, client_secret, redirect_uri):
-        headers = {
-            'Content-Type': 'application/json',
-            'Accept': 'application/json',
+        # Lets a local fake Anilist stand in for the real one
+        self.API_URL = api_url or self.API_URL
+        self.AUTH_URL = auth_url or self.AUTH_URL
+
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.read_timeout = read_timeout
+        self.rate_limiter = rate_limiter
+        self.media_cache = media_cache
+        self.single_flight = SingleFlight()
+        self.metrics = metrics or AnilistMetrics()
+        self.cassette = cassette
+
+        self.retries = retries
+        self.circuit_breaker = circuit_breaker
+        self.response_cache = response_cache
+
+        self._refreshing = set()
+        self._refreshing_lock = threading.Lock()
+
+        self._session = None
+        self._session_pid = None
+
+    @property
+    def session(self):
+        """Returns the connection pooled session for this worker process"""
+        # Gunicorn forks workers after import, so each process needs its own sockets
+        if self._session is None or self._session_pid != os.getpid():
+            session = requests.Session()
+            session.headers.update({
+                'Content-Type': 'application/json',
+                'Accept': 'application/json',
+                'Accept-Encoding': 'gzip, deflate',
+                'Connection': 'keep-alive',
+            })
+
+            if self.cassette:
+                adapter = CassetteAdapter(self.cassette, pool_connections=2, pool_maxsize=self.pool_size)
+            else:
+                adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self.pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+
+            self._session = session
+            self._session_pid = os.getpid()
+
+        return self._session
+
+    def pool_stats(self):
+        """Returns connection reuse statistics for the current worker's pool"""
+        stats = {
+            'pools': 0,
+            'requests': 0,
+            'connections': 0,
+            'idle_connections': 0,
+            'reuse_rate': 0.0,
         }
 
+        if self._session is None or self._session_pid != os.getpid():
+            return stats
+
+        for adapter in set(self._session.adapters.values()):
+            pools = adapter.poolmanager.pools
+
+            for key in pools.keys():
+                pool = pools.get(key)
+
+                if pool is None:
+                    continue
+
+                stats['pools'] += 1
+                stats['requests'] += pool.num_requests
+                stats['connections'] += pool.num_connections
+                stats['idle_connections'] += pool.pool.qsize() if pool.pool else 0
+
+        if stats['requests']:
+            stats['reuse_rate'] = 1 - (stats['connections'] / stats['requests'])
+
+        return stats
+
+    def _post(self, url, json_body, headers=None, priority=RateLimiter.INTERACTIVE):
+        if self.rate_limiter:
+            try:
+                self.rate_limiter.acquire(priority, timeout=self.rate_limit_timeout(priority))
+            except RateLimitTimeout as err:
+                raise AnilistUnavailable(str(err)) from err
+
+        response = self.session.post(url, json=json_body, headers=headers, timeout=self.timeout)
+
+        if self.rate_limiter:
+            self.rate_limiter.update(response.status_code, response.headers)
+
+        return response
+
+    def _send(self, url, json_body, headers=None, priority=RateLimiter.INTERACTIVE, idempotent=False, operation=None):
+        """Posts through the circuit breaker, retrying idempotent calls with jittered backoff"""
+        attempts = self.retries + 1 if idempotent else 1
+
+        call = AnilistCall(operation or self.operation_name(json_body['query']))
+        started = time.perf_counter()
+
+        try:
+            for attempt in range(attempts):
+                call.retries = attempt
+
+                if self.circuit_breaker:
+                    self.circuit_breaker.before_call()
+
+                try:
+                    response = self._post(url, json_body, headers=headers, priority=priority)
+                except requests.RequestException as err:
+                    error = err
+                except AnilistUnavailable:
+                    # The rate limiter gave up before Anilist was called, which says nothing about its health
+                    if self.circuit_breaker:
+                        self.circuit_breaker.release()
+
+                    raise
+                else:
+                    call.observe_response(response.status_code, response.headers, len(response.content))
+
+                    if response.status_code == 429:
+                        # Anilist is up but throttling, which says nothing about its health
+                        if self.circuit_breaker:
+                            self.circuit_breaker.release()
+
+                        if not idempotent:
+                            return response
+
+                        error = AnilistUnavailable("Anilist responded with HTTP 429")
+
+                        # The rate limiter has taken in Retry-After, so its next acquire waits it out
+                        if not self.rate_limiter and attempt < attempts - 1:
+                            time.sleep(backoff_delay(attempt))
+
+                        continue
+
+                    if not is_retryable_status(response.status_code):
+                        if self.circuit_breaker:
+                            self.circuit_breaker.record_success()
+
+                        return response
+
+                    error = AnilistUnavailable("Anilist responded with HTTP {}".format(response.status_code))
+
+                if self.circuit_breaker:
+                    self.circuit_breaker.record_failure()
+
+                if attempt < attempts - 1:
+                    time.sleep(backoff_delay(attempt))
+
+            raise AnilistUnavailable("Anilist failed after {} attempt(s): {}".format(attempts, error)) from error
+        finally:
+            call.latency_ms = (time.perf_counter() - started) * 1000
+            self.metrics.record(call)
+
+    def authenticate(self, authorisation_code, client_id, client_secret, redirect_uri):
         json_body = {
             'grant_type': 'authorization_code',
             'client_id': client_id,
@@ -169,30 +457,504 @@ class Anilist:
             'code': authorisation_code,
         }
 
-        return requests.post(self.AUTH_URL, json=json_body, headers=headers).text
+        return self._send(self.AUTH_URL, json_body, operation='AUTHENTICATE').text
+
+    def _coalesce(self, access_token, query, variables, function):
+        """Shares one request between threads asking the same query at the same time"""
+        if is_mutation(query):
+            return function()
+
+        return self.single_flight.do(request_key(query, variables, access_token), function)
+
+    def _refresh_in_background(self, key, function):
+        with self._refreshing_lock:
+            if key in self._refreshing:
+                return
+
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                response = function()
+
+                if is_good_response(response):
+                    self.response_cache.set(key, response.text)
+            except AnilistUnavailable:
+                pass
+            finally:
+                with self._refreshing_lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def _with_stale(self, access_token, query, variables, function, priority=RateLimiter.INTERACTIVE):
+        """Returns the text of function()'s response, falling back to the last good response, marked stale,
+        when Anilist is unavailable"""
+        # Bulk replies are rarely asked for again, so keeping them would only push media out of the cache
+        if not self.response_cache or is_mutation(query) or priority == RateLimiter.BULK:
+            return function().text
+
+        key = request_key(query, variables, access_token)
+
+        try:
+            response = function()
+        except AnilistUnavailable:
+            cached = self.response_cache.get(key)
 
-    def post_query(self, query, variables):
+            if cached is None:
+                raise
+
+            self._refresh_in_background(key, function)
+
+            return mark_stale(*cached)
+
+        # Rate limit and error replies would be served as the last good copy in the next outage
+        if is_good_response(response):
+            self.response_cache.set(key, response.text)
+
+        return response.text
+
+    def post_query(self, query, variables, priority=RateLimiter.INTERACTIVE, stale=False):
+        """Returns the text of a query's response, where stale lets an interactive read fall back to its last good response"""
+        def send():
+            return self._send(self.API_URL, {'query': query, 'variables': variables}, priority=priority,
+                              idempotent=not is_mutation(query))
+
+        if stale:
+            return self._coalesce(None, query, variables, lambda: self._with_stale(None, query, variables, send, priority))
+
+        return self._coalesce(None, query, variables, lambda: send().text)
+
+    def post_authorised_query(self, access_token, query, variables, priority=RateLimiter.INTERACTIVE, stale=False):
         headers = {
-            'Content-Type': 'application/json',
-            'Accept': 'application/json',
+            'Authorization': 'Bearer ' + access_token,
+        }
+
+        def send():
+            return self._send(self.API_URL, {'query': query, 'variables': variables}, headers=headers, priority=priority,
+                              idempotent=not is_mutation(query))
+
+        if stale:
+            return self._coalesce(access_token, query, variables, lambda: self._with_stale(access_token, query, variables, send, priority))
+
+        return self._coalesce(access_token, query, variables, lambda: send().text)
+
+    def paginate(self, query, variables, access_token=None, page_variable='page', priority=RateLimiter.INTERACTIVE, stale=False):
+        """Yields every Page of a paginated query in order, fetching pages after the first concurrently"""
+        def fetch(page_number):
+            page_variables = dict(variables, **{page_variable: page_number})
+
+            if access_token:
+                response = self.post_authorised_query(access_token, query, page_variables, priority=priority, stale=stale)
+            else:
+                response = self.post_query(query, page_variables, priority=priority, stale=stale)
+
+            return decode_data(response)['Page']
+
+        first_page = fetch(1)
+        last_page = PageInfo.from_dict(first_page['pageInfo']).last_page
+
+        if last_page < 2:
+            yield first_page
+            return
+
+        # Each page still takes a rate limiter token, so the pool size only bounds concurrency
+        executor = ThreadPoolExecutor(max_workers=min(self.pool_size, last_page - 1))
+
+        try:
+            # Every page is submitted before the first is handed over, so they are fetched while the consumer works.
+            # Worker threads run in a copy of this context so their calls count towards the current request
+            futures = [executor.submit(contextvars.copy_context().run, fetch, page_number) for page_number in range(2, last_page + 1)]
+
+            yield first_page
+
+            for future in futures:
+                yield future.result()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def paginate_items(self, query, variables, key, access_token=None, page_variable='page', priority=RateLimiter.INTERACTIVE, stale=False):
+        """Yields the items under key from every page, in page order"""
+        for page in self.paginate(query, variables, access_token=access_token, page_variable=page_variable, priority=priority, stale=stale):
+            yield from page[key]
+
+    def post_batched_query(self, batch, calls, access_token=None, priority=RateLimiter.INTERACTIVE):
+        """Runs many calls of a batch definition in as few requests as the complexity limit allows"""
+        results = []
+
+        for calls_chunk in chunk(calls, max(1, self.MAX_QUERY_COMPLEXITY // batch['complexity'])):
+            query, variables, aliases = build_batched_query(batch['field'], batch['arguments'], batch['selection'], calls_chunk)
+
+            if access_token:
+                response = self.post_authorised_query(access_token, query, variables, priority=priority)
+            else:
+                response = self.post_query(query, variables, priority=priority)
+
+            results.extend(split_batched_response(response, aliases))
+
+        return results
+
+    def get_posts(self, comments, priority=RateLimiter.INTERACTIVE):
+        """Returns the ThreadComment for each (thread_id, comment_id) pair, or None if it could not be fetched"""
+        calls = [{'threadId': thread_id, 'id': comment_id} for thread_id, comment_id in comments]
+
+        results = self.post_batched_query(self.THREAD_COMMENT_BATCH, calls, priority=priority)
+
+        return [ThreadComment.from_dict(result[0]) if result else None for result in results]
+
+    def get_media(self, access_token, ids, priority=RateLimiter.INTERACTIVE):
+        """Returns the Media for each id, including the viewer's list entry"""
+        calls = [{'id': media_id} for media_id in ids]
+
+        results = self.post_batched_query(self.MEDIA_BATCH, calls, access_token=access_token, priority=priority)
+
+        return [Media.from_dict(result) if result else None for result in results]
+
+    def get_user_info(self, access_token):
+        return decode_data(self.post_authorised_query(access_token, self.GET_USER_INFO_QUERY, {}))['Viewer']
+
+    def get_post(self, thread_id, comment_id):
+        variables = {
+            'thread_id': thread_id,
+            'comment_id': comment_id,
+        }
+
+        data, extensions = decode_response(self.post_query(self.GET_POST_QUERY, variables, stale=True))
+
+        return decode_thread_comment(data['ThreadComment'], extensions)
+
+    def get_user_posts(self, user_id, priority=RateLimiter.BULK):
+        """Yields each page of a user's forum comments as ThreadComment records"""
+        for page in self.paginate(self.GET_USER_POSTS_QUERY, {'user_id': user_id}, page_variable='page_number', priority=priority):
+            yield [ThreadComment.from_dict(comment) for comment in page['threadComments']]
+
+    def get_anime(self, access_token, ids):
+        """Returns the Media for the ids, only fetching media missing from the cache"""
+        if self.media_cache:
+            cached, missing = self.media_cache.get_media(ids, access_token)
+            status = 'miss' if missing else 'hit'
+        else:
+            cached, missing = {}, list(ids)
+            status = None
+
+        fetched = []
+
+        if missing:
+            # More than 50 ids spill onto later pages
+            with cache_status(status):
+                fetched = list(self.paginate_items(self.GET_ANIME_FROM_ID_QUERY, {'ids': missing}, 'media', access_token=access_token, stale=True))
+
+            if self.media_cache:
+                self.media_cache.set_media(fetched, access_token)
+
+        elif status == 'hit':
+            self.metrics.record(AnilistCall('GET_ANIME_FROM_ID_QUERY', cache=status))
+
+        return [Media.from_dict(media) for media in list(cached.values()) + fetched]
+
+    def search_anime(self, access_token, search):
+        """Returns the Media matching a search, served from the cache for repeated searches"""
+        media = self.media_cache.get_search(search, access_token) if self.media_cache else None
+
+        if media is not None:
+            self.metrics.record(AnilistCall('SEARCH_ANIME_QUERY', cache='hit'))
+        else:
+            with cache_status('miss' if self.media_cache else None):
+                media = decode_data(self.post_authorised_query(access_token, self.SEARCH_ANIME_QUERY, {'search': search}, stale=True))['Page']['media']
+
+            if self.media_cache:
+                self.media_cache.set_search(search, media, access_token)
+
+        return [Media.from_dict(item) for item in media]
+
+    def delete_post(self, access_token, comment_id):
+        variables = {
+            'id': comment_id
         }
 
-        response = requests.post(self.API_URL, json={'query': query, 'variables': variables}, headers=headers)
+        return self.post_authorised_query(access_token, self.DELETE_POST_QUERY, variables)
+
+class AsyncAnilist(RateLimitedClient, AnilistQueries):
+    '''Asyncio Anilist client so independent calls can be awaited concurrently'''
+
+    def __init__(self, client_id, client_secret, redirect_uri, pool_size=10, connect_timeout=3.05, read_timeout=10,
+                 rate_limiter=None, retries=2, circuit_breaker=None, transport=None, metrics=None, api_url=None, auth_url=None):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.redirect_uri = redirect_uri
+
+        self.API_URL = api_url or self.API_URL
+        self.AUTH_URL = auth_url or self.AUTH_URL
+
+        self.pool_size = pool_size
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.read_timeout = read_timeout
+        self.rate_limiter = rate_limiter
+        self.transport = transport
+        self.single_flight = AsyncSingleFlight()
+        self.metrics = metrics or AnilistMetrics()
+
+        self.retries = retries
+        self.circuit_breaker = circuit_breaker
+
+        self._client = None
+        self._client_loop = None
+
+    @property
+    def client(self):
+        """Returns the connection pooled client for the running event loop"""
+        loop = asyncio.get_running_loop()
+
+        # httpx connections are bound to the loop that opened them
+        if self._client is None or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(
+                headers={
+                    'Content-Type': 'application/json',
+                    'Accept': 'application/json',
+                    'Accept-Encoding': 'gzip, deflate',
+                },
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                transport=self.transport,
+            )
+            self._client_loop = loop
+
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+
+            self._client = None
+            self._client_loop = None
+
+    async def _post(self, url, json_body, headers=None, priority=RateLimiter.INTERACTIVE):
+        if self.rate_limiter:
+            try:
+                await self.rate_limiter.acquire_async(priority, timeout=self.rate_limit_timeout(priority))
+            except RateLimitTimeout as err:
+                raise AnilistUnavailable(str(err)) from err
+
+        response = await self.client.post(url, json=json_body, headers=headers)
+
+        if self.rate_limiter:
+            self.rate_limiter.update(response.status_code, response.headers)
+
+        return response
+
+    async def _send(self, url, json_body, headers=None, priority=RateLimiter.INTERACTIVE, idempotent=False, operation=None):
+        attempts = self.retries + 1 if idempotent else 1
+
+        call = AnilistCall(operation or self.operation_name(json_body['query']))
+        started = time.perf_counter()
+
+        try:
+            for attempt in range(attempts):
+                call.retries = attempt
+
+                if self.circuit_breaker:
+                    self.circuit_breaker.before_call()
+
+                try:
+                    response = await self._post(url, json_body, headers=headers, priority=priority)
+                except httpx.HTTPError as err:
+                    error = err
+                except AnilistUnavailable:
+                    # The rate limiter gave up before Anilist was called, which says nothing about its health
+                    if self.circuit_breaker:
+                        self.circuit_breaker.release()
+
+                    raise
+                else:
+                    call.observe_response(response.status_code, response.headers, len(response.content))
+
+                    if response.status_code == 429:
+                        # Anilist is up but throttling, which says nothing about its health
+                        if self.circuit_breaker:
+                            self.circuit_breaker.release()
+
+                        if not idempotent:
+                            return response
+
+                        error = AnilistUnavailable("Anilist responded with HTTP 429")
+
+                        # The rate limiter has taken in Retry-After, so its next acquire waits it out
+                        if not self.rate_limiter and attempt < attempts - 1:
+                            await asyncio.sleep(backoff_delay(attempt))
+
+                        continue
+
+                    if not is_retryable_status(response.status_code):
+                        if self.circuit_breaker:
+                            self.circuit_breaker.record_success()
+
+                        return response
+
+                    error = AnilistUnavailable("Anilist responded with HTTP {}".format(response.status_code))
+
+                if self.circuit_breaker:
+                    self.circuit_breaker.record_failure()
+
+                if attempt < attempts - 1:
+                    await asyncio.sleep(backoff_delay(attempt))
+
+            raise AnilistUnavailable("Anilist failed after {} attempt(s): {}".format(attempts, error)) from error
+        finally:
+            call.latency_ms = (time.perf_counter() - started) * 1000
+            self.metrics.record(call)
+
+    async def authenticate(self, authorisation_code, client_id, client_secret, redirect_uri):
+        json_body = {
+            'grant_type': 'authorization_code',
+            'client_id': client_id,
+            'client_secret': client_secret,
+            'redirect_uri': redirect_uri,
+            'code': authorisation_code,
+        }
+
+        response = await self._send(self.AUTH_URL, json_body, operation='AUTHENTICATE')
         return response.text
 
-    def post_authorised_query(self, access_token, query, variables):
+    async def _coalesce(self, access_token, query, variables, function):
+        if is_mutation(query):
+            return await function()
+
+        return await self.single_flight.do(request_key(query, variables, access_token), function)
+
+    async def post_query(self, query, variables, priority=RateLimiter.INTERACTIVE):
+        async def send():
+            response = await self._send(self.API_URL, {'query': query, 'variables': variables}, priority=priority,
+                                        idempotent=not is_mutation(query))
+            return response.text
+
+        return await self._coalesce(None, query, variables, send)
+
+    async def post_authorised_query(self, access_token, query, variables, priority=RateLimiter.INTERACTIVE):
         headers = {
             'Authorization': 'Bearer ' + access_token,
-            'Content-Type': 'application/json',
-            'Accept': 'application/json',
         }
 
-        response = requests.post(self.API_URL, json={'query': query, 'variables': variables}, headers=headers)
-        return response.text
+        async def send():
+            response = await self._send(self.API_URL, {'query': query, 'variables': variables}, headers=headers, priority=priority,
+                                        idempotent=not is_mutation(query))
+            return response.text
+
+        return await self._coalesce(access_token, query, variables, send)
+
+    async def get_user_info(self, access_token):
+        return decode_data(await self.post_authorised_query(access_token, self.GET_USER_INFO_QUERY, {}))['Viewer']
+
+    async def get_post(self, thread_id, comment_id):
+        variables = {
+            'thread_id': thread_id,
+            'comment_id': comment_id,
+        }
+
+        data, extensions = decode_response(await self.post_query(self.GET_POST_QUERY, variables))
+
+        return decode_thread_comment(data['ThreadComment'], extensions)
+
+    async def get_user_posts(self, user_id, priority=RateLimiter.BULK):
+        """Yields each page of a user's forum comments as ThreadComment records"""
+        async for page in self.paginate(self.GET_USER_POSTS_QUERY, {'user_id': user_id}, page_variable='page_number', priority=priority):
+            yield [ThreadComment.from_dict(comment) for comment in page['threadComments']]
+
+    async def get_anime(self, access_token, ids):
+        media = []
+
+        async for page in self.paginate(self.GET_ANIME_FROM_ID_QUERY, {'ids': ids}, access_token=access_token):
+            media.extend(Media.from_dict(item) for item in page['media'])
+
+        return media
+
+    async def search_anime(self, access_token, search):
+        response = await self.post_authorised_query(access_token, self.SEARCH_ANIME_QUERY, {'search': search})
+
+        return [Media.from_dict(item) for item in decode_data(response)['Page']['media']]
+
+    async def paginate(self, query, variables, access_token=None, page_variable='page', priority=RateLimiter.INTERACTIVE):
+        """Yields every Page of a paginated query in order, fetching pages after the first concurrently"""
+        async def fetch(page_number):
+            page_variables = dict(variables, **{page_variable: page_number})
+
+            if access_token:
+                response = await self.post_authorised_query(access_token, query, page_variables, priority=priority)
+            else:
+                response = await self.post_query(query, page_variables, priority=priority)
+
+            return decode_data(response)['Page']
+
+        first_page = await fetch(1)
+        last_page = PageInfo.from_dict(first_page['pageInfo']).last_page
+
+        # Every page is scheduled before the first is handed over, so they are fetched while the consumer works
+        tasks = [asyncio.ensure_future(fetch(page_number)) for page_number in range(2, last_page + 1)]
+
+        try:
+            yield first_page
+
+            for task in tasks:
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def post_batched_query(self, batch, calls, access_token=None, priority=RateLimiter.INTERACTIVE):
+        """Runs many calls of a batch definition, sending every chunk concurrently"""
+        pending = []
+        chunk_aliases = []
+
+        for calls_chunk in chunk(calls, max(1, self.MAX_QUERY_COMPLEXITY // batch['complexity'])):
+            query, variables, aliases = build_batched_query(batch['field'], batch['arguments'], batch['selection'], calls_chunk)
+
+            if access_token:
+                pending.append(self.post_authorised_query(access_token, query, variables, priority=priority))
+            else:
+                pending.append(self.post_query(query, variables, priority=priority))
+
+            chunk_aliases.append(aliases)
+
+        results = []
+
+        for response, aliases in zip(await asyncio.gather(*pending), chunk_aliases):
+            results.extend(split_batched_response(response, aliases))
+
+        return results
+
+    async def get_posts(self, comments, priority=RateLimiter.INTERACTIVE):
+        calls = [{'threadId': thread_id, 'id': comment_id} for thread_id, comment_id in comments]
+
+        results = await self.post_batched_query(self.THREAD_COMMENT_BATCH, calls, priority=priority)
+
+        return [ThreadComment.from_dict(result[0]) if result else None for result in results]
+
+    async def get_media(self, access_token, ids, priority=RateLimiter.INTERACTIVE):
+        calls = [{'id': media_id} for media_id in ids]
+
+        results = await self.post_batched_query(self.MEDIA_BATCH, calls, access_token=access_token, priority=priority)
+
+        return [Media.from_dict(result) if result else None for result in results]
+
+    async def make_post(self, access_token, thread_id, comment):
+        variables = {
+            'thread_id': thread_id,
+            'comment': comment,
+        }
+
+        return await self.post_authorised_query(access_token, self.MAKE_POST_QUERY, variables)
+
+    async def update_post(self, access_token, comment_id, thread_id, comment):
+        variables = {
+            'id': comment_id,
+            'thread_id': thread_id,
+            'comment': comment,
+        }
+
+        return await self.post_authorised_query(access_token, self.UPDATE_POST_QUERY, variables)
 
-    def delete_post(self, comment_id):
+    async def delete_post(self, access_token, comment_id):
         variables = {
             'id': comment_id
         }
 
-        return self.anilist.post_authorised_query(request.session['access_token'], anilist.DELETE_POST_QUERY, variables)
+        return await self.post_authorised_query(access_token, self.DELETE_POST_QUERY, variables)
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class AWCConfig(AppConfig):
     name = 'awc'
+
+    def ready(self):
+        # Connects the receivers that keep cached challenge code parses up to date
+        from . import signals
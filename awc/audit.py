@@ -0,0 +1,200 @@
+import collections
+import gzip
+import json
+import os
+import time
+
+from django.apps import apps
+
+# Fields of a requirement that parsing reads, copied into worker processes
+REQUIREMENT_FIELDS = ('number', 'bonus', 'text', 'extra_newline', 'anime_title', 'anime_link', 'force_raw_edit')
+
+PARSED = 'parsed'
+FAILED = 'failed'
+MISSING = 'missing'
+
+# Comments matching the fingerprint of the last one posted or parsed, which are not parsed again
+UNCHANGED = 'unchanged'
+
+# Failed submission ids kept for each challenge, as the failed count already covers the rest
+MAX_FAILED_SUBMISSIONS = 20
+
+# Set up in each worker process by init_worker
+_parsers = {}
+
+def challenge_table(challenges):
+    """Returns the picklable details of each challenge that parse workers need, by challenge id"""
+    table = {}
+
+    for challenge in challenges.prefetch_related('requirement_set', 'prerequisites'):
+        table[challenge.id] = {
+            'name': challenge.name,
+            'category': challenge.category,
+            'has_prerequisites': len(challenge.prerequisites.all()) > 0,
+            'requirements': [{field: getattr(requirement, field) for field in REQUIREMENT_FIELDS} for requirement in challenge.requirement_set.all()],
+        }
+
+    return table
+
+def init_worker(table):
+    # Spawned workers start without Django, forked ones already have it
+    if not apps.ready:
+        import django
+        django.setup()
+
+    from .models import Challenge, Requirement
+    from .parser import ChallengeCodeParser
+
+    for challenge_id, details in table.items():
+        challenge = Challenge(id=challenge_id, name=details['name'], category=details['category'])
+        requirements = [Requirement(challenge_id=challenge_id, **fields) for fields in details['requirements']]
+
+        _parsers[challenge_id] = ChallengeCodeParser(challenge, requirements, details['has_prerequisites'])
+
+def format_name(code_format):
+    if code_format is None:
+        return 'unknown'
+
+    return '+'.join([code_format.layout] + [name for name in ('prerequisites', 'seasons') if getattr(code_format, name)])
+
+def parse_batch(batch):
+    """Returns (submission_id, challenge_id, status, format, error, seconds) for each (submission_id, challenge_id, comment)"""
+    results = []
+
+    for submission_id, challenge_id, comment in batch:
+        started = time.perf_counter()
+        state = _parsers[challenge_id].parse(comment)
+        elapsed = time.perf_counter() - started
+
+        # The last traceback line names the exception, which groups failures well enough
+        error = state.error.strip().splitlines()[-1] if state.failed else None
+
+        results.append((submission_id, challenge_id, FAILED if state.failed else PARSED, format_name(state.format), error, elapsed))
+
+    return results
+
+class SnapshotReader(object):
+    '''Reads the comments in a gzipped JSON lines snapshot, in submission id order
+
+    Submissions are looked up in increasing id order, so the file is read alongside them without
+    holding it in memory.
+    '''
+
+    def __init__(self, path):
+        self._file = gzip.open(path, 'rt')
+        self._next = self._read()
+
+    def _read(self):
+        line = self._file.readline()
+
+        return json.loads(line) if line else None
+
+    def get(self, submission_id, thread_id, comment_id):
+        """Returns (found, comment) for a submission"""
+        while self._next is not None and self._next['submission'] < submission_id:
+            self._next = self._read()
+
+        entry = self._next
+
+        if entry is None or entry['submission'] != submission_id or (entry['thread_id'], entry['comment_id']) != (thread_id, comment_id):
+            return False, None
+
+        return True, entry['comment']
+
+    def close(self):
+        self._file.close()
+
+class SnapshotWriter(object):
+    '''Writes fetched comments to a gzipped JSON lines snapshot, which only appears once complete'''
+
+    def __init__(self, path):
+        self.path = path
+        self._partial_path = path + '.partial'
+        self._file = gzip.open(self._partial_path, 'wt')
+
+    def write(self, submission_id, thread_id, comment_id, comment):
+        self._file.write(json.dumps({'submission': submission_id, 'thread_id': thread_id, 'comment_id': comment_id, 'comment': comment}) + '\n')
+
+    def close(self):
+        self._file.close()
+        os.replace(self._partial_path, self.path)
+
+class ChallengeAudit(object):
+    '''Parse results of one challenge's submissions'''
+
+    def __init__(self, name):
+        self.name = name
+        self.counts = collections.Counter()
+        self.formats = collections.Counter()
+        self.errors = collections.Counter()
+        self.failed_submissions = []
+        self.parse_seconds = 0.0
+        self.slowest_parse = 0.0
+
+    def to_dict(self, top_errors=5):
+        parses = self.counts[PARSED] + self.counts[FAILED]
+
+        return {
+            'name': self.name,
+            'submissions': sum(self.counts.values()),
+            'parsed': self.counts[PARSED],
+            'failed': self.counts[FAILED],
+            'missing': self.counts[MISSING],
+            'unchanged': self.counts[UNCHANGED],
+            'formats': dict(self.formats),
+            'errors': dict(self.errors.most_common(top_errors)),
+            'failed_submissions': self.failed_submissions,
+            'parse_ms': {
+                'total': round(self.parse_seconds * 1000, 3),
+                'mean': round(self.parse_seconds * 1000 / parses, 3) if parses else 0.0,
+                'max': round(self.slowest_parse * 1000, 3),
+            },
+        }
+
+class AuditSummary(object):
+    '''Running totals of an audit, kept per challenge so memory does not grow with the submissions'''
+
+    def __init__(self, challenge_names, max_failed_submissions=MAX_FAILED_SUBMISSIONS):
+        self.challenge_names = challenge_names
+        self.max_failed_submissions = max_failed_submissions
+        self.challenges = {}
+
+    def challenge(self, challenge_id):
+        if challenge_id not in self.challenges:
+            self.challenges[challenge_id] = ChallengeAudit(self.challenge_names.get(challenge_id, str(challenge_id)))
+
+        return self.challenges[challenge_id]
+
+    def add_missing(self, submission_id, challenge_id):
+        self.challenge(challenge_id).counts[MISSING] += 1
+
+    def add_unchanged(self, submission_id, challenge_id):
+        self.challenge(challenge_id).counts[UNCHANGED] += 1
+
+    def add(self, results):
+        for submission_id, challenge_id, status, code_format, error, seconds in results:
+            audit = self.challenge(challenge_id)
+
+            audit.counts[status] += 1
+            audit.formats[code_format] += 1
+            audit.parse_seconds += seconds
+            audit.slowest_parse = max(audit.slowest_parse, seconds)
+
+            if status == FAILED:
+                audit.errors[error] += 1
+
+                if len(audit.failed_submissions) < self.max_failed_submissions:
+                    audit.failed_submissions.append(submission_id)
+
+    def to_dict(self):
+        challenges = [audit.to_dict() for audit in sorted(self.challenges.values(), key=lambda audit: audit.name)]
+
+        totals = collections.Counter()
+
+        for challenge in challenges:
+            totals.update({key: challenge[key] for key in ('submissions', 'parsed', 'failed', 'missing', 'unchanged')})
+
+        return {
+            'totals': dict(totals),
+            'challenges': challenges,
+        }
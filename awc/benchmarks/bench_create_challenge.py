@@ -0,0 +1,37 @@
+from awc.benchmarks.corpus import CLASSIC, KINDS, SEASONAL
+from awc.benchmarks.harness import BenchmarkCase, env_sizes
+from awc.models import Challenge
+from awc.utils import Utils
+
+class CreateChallengeBenchmark(BenchmarkCase):
+    def thread_codes(self, kind, size, count):
+        return [self.generator.thread_code(kind, size) for i in range(count)]
+
+    def test_create_challenge_from_code(self):
+        for kind, (category, name) in KINDS.items():
+            # Classic and Seasonal challenges have no requirements to create
+            if kind in (CLASSIC, SEASONAL):
+                continue
+
+            for size in env_sizes():
+                # Every code creates a new challenge, so each run needs its own codes and only the mean is kept
+                codes = [code for code, requirements in self.thread_codes(kind, size, 2 * self.repeat)]
+
+                self.benchmark('create_challenge_from_code/{}/{}'.format(kind, size),
+                               lambda code: Utils.create_challenge_from_code(1, code, category),
+                               codes, repeat=1)
+
+    def test_round_trip(self):
+        for kind, (category, name) in KINDS.items():
+            for code, requirements in self.thread_codes(kind, 20, 3):
+                with self.subTest(kind):
+                    name = code.split('__')[1]
+
+                    Challenge.objects.filter(name=name).delete()
+                    Utils.create_challenge_from_code(1, code, category)
+
+                    challenge = Challenge.objects.get(name=name)
+                    created = [(requirement.number, requirement.mode, requirement.bonus, requirement.text, requirement.extra.strip())
+                               for requirement in challenge.requirement_set.order_by('id')]
+
+                    self.assertEquals(created, requirements)
@@ -0,0 +1,40 @@
+from awc.benchmarks.corpus import form_data_from_state, form_request
+from awc.benchmarks.harness import BenchmarkCase, env_sizes
+from awc.models import Submission
+from awc.utils import Utils
+
+class ParseBenchmark(BenchmarkCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.corpus = cls.generator.corpus(env_sizes())
+
+    def test_parse_challenge_code(self):
+        for entry in self.corpus:
+            submission = Submission(challenge=entry.challenge)
+
+            # Requirements are loaded once per request by the edit page, so they are not timed here
+            requirements = list(entry.challenge.requirement_set.all())
+
+            self.benchmark('parse_challenge_code/' + entry.name,
+                           lambda comment: Utils.parse_challenge_code(submission, comment, requirements),
+                           entry.comments)
+
+    def test_round_trip(self):
+        for entry in self.corpus:
+            submission = Submission(challenge=entry.challenge)
+
+            for form, comment in zip(entry.forms, entry.comments):
+                with self.subTest(entry.name):
+                    parsed = Utils.parse_challenge_code(submission, comment)
+
+                    self.assertFalse(parsed.failed, parsed.error)
+
+                    # Every field of the submitted form comes back from the code it rendered
+                    parsed_form = form_data_from_state(parsed)
+
+                    for field, value in form.items():
+                        self.assertEquals(parsed_form.get(field, '').strip(), value.strip(), field)
+
+                    rendered = Utils.create_comment_string(form_request(parsed_form), entry.challenge, self.generator.get_user())
+
+                    self.assertEquals(rendered, comment)
@@ -0,0 +1,26 @@
+from awc.benchmarks.corpus import form_request
+from awc.benchmarks.harness import BenchmarkCase, env_sizes
+from awc.utils import Utils
+
+class RenderBenchmark(BenchmarkCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.corpus = cls.generator.corpus(env_sizes())
+
+    def test_create_comment_string(self):
+        user = self.generator.get_user()
+
+        for entry in self.corpus:
+            requests = [form_request(form) for form in entry.forms]
+
+            self.benchmark('create_comment_string/' + entry.name,
+                           lambda request: Utils.create_comment_string(request, entry.challenge, user),
+                           requests)
+
+    def test_rendering_is_deterministic(self):
+        user = self.generator.get_user()
+
+        for entry in self.corpus:
+            with self.subTest(entry.name):
+                self.assertEquals([Utils.create_comment_string(form_request(form), entry.challenge, user) for form in entry.forms],
+                                  entry.comments)
@@ -0,0 +1,291 @@
+import random
+
+from collections import namedtuple
+
+from django.test import RequestFactory
+
+from awc.models import Challenge, Requirement, Submission, User
+from awc.layouts import MODE_HEADERS
+from awc.parser import mock_requirement_set
+from awc.utils import Utils
+
+# Sizes are requirement counts. Classic and Seasonal challenges are recognised by name and always
+# use their mock requirements, so size does not apply to them.
+CLASSIC = 'classic'
+SEASONAL = 'seasonal'
+
+KINDS = {
+    'genre': (Challenge.GENRE, 'Action Genre Challenge'),
+    'timed': (Challenge.TIMED, 'Timed Challenge'),
+    'tier': (Challenge.TIER, 'Tier Challenge'),
+    'collection': (Challenge.COLLECTION, 'Collection Challenge'),
+    CLASSIC: (Challenge.CLASSIC, 'Classic Challenge'),
+    'puzzle': (Challenge.PUZZLE, 'Puzzle Challenge'),
+    'special': (Challenge.SPECIAL, 'Special Challenge'),
+    SEASONAL: (Challenge.SPECIAL, 'Winter 2021 Seasonal Challenge'),
+}
+
+FORMATS = ('old', 'new')
+
+# Kinds generated with a prerequisite challenge
+PREREQUISITE_KINDS = ('timed', 'tier')
+
+# A challenge in one code format, with filled in edit forms and the comments they render to
+CorpusEntry = namedtuple('CorpusEntry', ['name', 'challenge', 'post_format', 'forms', 'comments'])
+
+DEFAULT_LEGEND = {'Completed': 'X', 'Not Completed': 'O'}
+UP_TO_DATE_LEGEND = {'Completed': 'X', 'Not Completed': 'O', 'Up to Date': 'U'}
+
+WORDS = ['Watch', 'an', 'anime', 'with', 'a', 'female', 'lead', 'set', 'in', 'space', 'school', 'over', '24', 'episodes',
+         'aired', 'before', '2000', 'that', 'is', 'adapted', 'from', 'manga', 'by', 'Kyoto', 'Animation', 'sports', 'mecha']
+TITLES = ['Cowboy Bebop', 'K-On!', 'Mushishi', 'Planetes', 'Haikyuu!!', 'Made in Abyss', 'Ping Pong the Animation',
+          'Kaiba', 'Texhnolyze', 'Kids on the Slope', 'Mob Psycho 100', 'Sound! Euphonium']
+EXTRAS = ['', '', 'Ep 12/24', 'Rewatch', 'Tag: Space', 'Episodes: 13 // Source: Manga', '[Screenshot](https://i.imgur.com/abc.png)']
+
+class CorpusGenerator(object):
+    '''Seeded challenges and filled in edit forms covering each challenge category and code format
+
+    The same seed always generates the same corpus, so benchmark timings stay comparable between runs.
+    Challenges and requirements are saved to the database, as the functions being timed read them from there.
+    '''
+
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+        self.user = None
+
+    def text(self, words=6):
+        return ' '.join(self.rng.choice(WORDS) for i in range(words)).capitalize()
+
+    def date(self):
+        if self.rng.random() < 0.3:
+            return 'YYYY-MM-DD'
+
+        return '20{:02}-{:02}-{:02}'.format(self.rng.randint(15, 22), self.rng.randint(1, 12), self.rng.randint(1, 28))
+
+    def challenge(self, kind, size=10, prerequisites=False, raw_ratio=0.1, extra=True):
+        """Returns a saved challenge of a kind from KINDS with size requirements"""
+        category, name = KINDS[kind]
+
+        if kind in (CLASSIC, SEASONAL):
+            # Only one of each can exist, as they are found by name
+            Challenge.objects.filter(name=name).delete()
+        else:
+            name = '{} {}'.format(name.replace('Challenge', 'Bench'), Challenge.objects.count() + 1)
+
+        challenge = Challenge.objects.create(name=name,
+                                             thread_id=self.rng.randint(1000, 9999),
+                                             category=category,
+                                             allows_up_to_date=kind == SEASONAL,
+                                             extra=self.text() if extra else '')
+
+        if prerequisites:
+            self.add_prerequisite(challenge)
+
+        if kind not in (CLASSIC, SEASONAL):
+            Requirement.objects.bulk_create(self.requirements(challenge, size, raw_ratio))
+
+        return challenge
+
+    def corpus(self, sizes, count=5):
+        """Returns a CorpusEntry with count forms for every kind, size and format"""
+        entries = []
+
+        for kind in KINDS:
+            for size in ([None] if kind in (CLASSIC, SEASONAL) else sizes):
+                challenge = self.challenge(kind, size or 0, prerequisites=kind in PREREQUISITE_KINDS)
+
+                for post_format in FORMATS:
+                    forms = [self.form_data(challenge, post_format) for i in range(count)]
+                    comments = [Utils.create_comment_string(form_request(form), challenge, self.get_user()) for form in forms]
+                    name = '/'.join(str(part) for part in (kind, post_format, size) if part is not None)
+
+                    entries.append(CorpusEntry(name, challenge, post_format, forms, comments))
+
+        return entries
+
+    def requirements(self, challenge, size, raw_ratio):
+        if challenge.category == Challenge.GENRE:
+            # A bonus for every ten requirements, with the rest split between the three modes
+            bonus_count = max(size // 10, 1)
+            modes = [Requirement.EASY, Requirement.NORMAL, Requirement.HARD]
+            numbered = [(number, modes[min((number - 1) * 3 // max(size - bonus_count, 1), 2)], False)
+                        for number in range(1, size - bonus_count + 1)]
+            numbered += [(number, Requirement.BONUS, True) for number in range(1, bonus_count + 1)]
+        else:
+            numbered = [(number, Requirement.DEFAULT, False) for number in range(1, size + 1)]
+
+        requirements = []
+
+        for number, mode, bonus in numbered:
+            requirement = Requirement(challenge=challenge, number=number, mode=mode, bonus=bonus, text=self.text(),
+                                      extra_newline=self.rng.random() < 0.1)
+
+            if not bonus and self.rng.random() < raw_ratio:
+                requirement.text = ''
+                requirement.force_raw_edit = True
+                requirement.raw_requirement = '{:02}) {}'.format(number, self.text())
+            elif self.rng.random() < 0.2:
+                anime_id = self.rng.randint(1, 99999)
+                requirement.anime_title = self.rng.choice(TITLES)
+                requirement.anime_link = 'https://anilist.co/anime/{}'.format(anime_id)
+
+            requirements.append(requirement)
+
+        return requirements
+
+    def add_prerequisite(self, challenge):
+        prerequisite = Challenge.objects.create(name='Prerequisite {}'.format(Challenge.objects.count() + 1),
+                                                thread_id=self.rng.randint(1000, 9999),
+                                                category=Challenge.TIMED)
+
+        challenge.prerequisites.add(prerequisite)
+        Submission.objects.create(user=self.get_user(), challenge=prerequisite, thread_id=prerequisite.thread_id,
+                                  comment_id=self.rng.randint(10000, 99999))
+
+    def get_user(self):
+        """Returns the user that fills in every generated form"""
+        if self.user is None:
+            self.user = User.objects.create(name='Benchmark', user_id=self.rng.randint(1, 99999), avatar_url='')
+
+        return self.user
+
+    def form_data(self, challenge, post_format='old'):
+        """Returns random edit form data for a challenge, as the edit page would submit it"""
+        legend = UP_TO_DATE_LEGEND if challenge.allows_up_to_date else DEFAULT_LEGEND
+
+        data = {
+            'format': post_format,
+            'legend': str(legend),
+            'challenge-start': self.date(),
+            'challenge-finish': self.date(),
+            # Old format codes have no rule to end the requirements, so their last requirement would take the extra
+            'challenge-extra': challenge.extra if post_format == 'new' else '',
+        }
+
+        for prerequisite in challenge.prerequisites.all():
+            data['prerequisite-{}-finish'.format(prerequisite.name)] = self.date()
+
+        for requirement in form_requirements(challenge):
+            key = field_key(requirement)
+
+            if requirement.force_raw_edit:
+                # Only the new format keeps a raw requirement's later lines with it
+                if post_format == 'new':
+                    data['requirement-raw-' + key] = '{}\n{}'.format(requirement.raw_requirement, self.text(3))
+                else:
+                    data['requirement-raw-' + key] = requirement.raw_requirement
+
+                continue
+
+            data['completed-' + key] = self.rng.choice(list(legend.values()))
+            data['requirement-start-' + key] = self.date()
+            data['requirement-finish-' + key] = self.date()
+
+            # A requirement that names its anime has no fields to pick one
+            if not requirement.anime_title:
+                data['requirement-anime-' + key] = self.rng.choice(TITLES)
+                data['requirement-link-' + key] = 'https://anilist.co/anime/{}'.format(self.rng.randint(1, 99999))
+
+            # Seasonal requirements left without an extra are given an episode count, and an empty extra on its own
+            # line would leave a blank line that ends the requirements
+            data['requirement-extra-' + key] = self.rng.choice(EXTRAS[2:] if challenge.layout.default_extra or requirement.extra_newline else EXTRAS)
+            data['mode-' + key] = requirement.mode
+
+        return data
+
+    def thread_code(self, kind, size=10):
+        """Returns the blank challenge code of a forum thread, as the add challenge page takes it, and the
+        (number, mode, bonus, text, extra) of each requirement it should create"""
+        category, name = KINDS[kind]
+
+        if kind not in (CLASSIC, SEASONAL):
+            name = '{} {}'.format(name.replace('Challenge', 'Thread'), self.rng.randint(1, 10 ** 9))
+
+        code = "# __{}__\n\nChallenge Start Date: YYYY-MM-DD\nChallenge Finish Date: YYYY-MM-DD\nLegend: [X] = Completed [O] = Not Completed\n\n<hr>\n\n".format(name)
+
+        if kind in (CLASSIC, SEASONAL):
+            return code, []
+
+        if category == Challenge.GENRE:
+            bonus_count = max(size // 10, 1)
+            third = (size - bonus_count) // 3
+            sections = [(Requirement.EASY, third), (Requirement.NORMAL, third),
+                        (Requirement.HARD, size - bonus_count - third * 2), (Requirement.BONUS, bonus_count)]
+        else:
+            sections = [(Requirement.DEFAULT, size)]
+
+        headers = {mode: header for header, mode in MODE_HEADERS.items()}
+        requirements = []
+        number = 0
+
+        for mode, count in sections:
+            bonus = mode == Requirement.BONUS
+
+            if mode != Requirement.DEFAULT:
+                code += "---\n{}\n\n".format(headers[mode])
+
+                number = 0 if bonus else number
+
+            for i in range(count):
+                number += 1
+                text = self.text()
+                extra = self.rng.choice(EXTRAS)
+
+                code += "{}) [O] __{}__\n[Anime_Title](https://anilist.co/anime/00000/)\nStart: YYYY-MM-DD Finish: YYYY-MM-DD{}\n\n".format(
+                    'B{}'.format(number) if bonus else '{:02}'.format(number), text, ' // ' + extra if extra else '')
+
+                requirements.append((number, mode, bonus, text, extra))
+
+        # Genre challenges have no challenge extra to take
+        if category != Challenge.GENRE:
+            code += "<hr>\n\n" + self.text()
+
+        return code, requirements
+
+def form_requirements(challenge):
+    """Returns the requirements that the edit form has fields for"""
+    if not challenge.layout.needs_requirements:
+        return mock_requirement_set(challenge.layout.mock_count)
+
+    return challenge.requirement_set.all()
+
+def field_key(requirement):
+    """Returns the suffix of a requirement's edit form fields"""
+    if requirement.bonus:
+        return 'bonus-{}'.format(int(requirement.number))
+
+    return str(requirement.number).zfill(2)
+
+def form_data_from_state(state, post_format=None):
+    """Returns the edit form data that the edit page fills in from a parsed challenge code"""
+    data = {
+        'format': post_format or ('new' if state.is_new_format else 'old'),
+        'legend': str(state.legend),
+        'challenge-start': state.start,
+        'challenge-finish': state.finish,
+        'challenge-extra': state.extra,
+    }
+
+    for name, finish in (state.prerequisites or {}).items():
+        data['prerequisite-{}-finish'.format(name)] = finish
+
+    for requirement in state.requirements:
+        key = field_key(requirement)
+
+        if requirement.force_raw_edit:
+            data['requirement-raw-' + key] = requirement.raw_requirement
+            continue
+
+        data['completed-' + key] = requirement.completed
+        data['requirement-start-' + key] = requirement.start
+        data['requirement-finish-' + key] = requirement.finish
+        data['requirement-anime-' + key] = requirement.anime
+        data['requirement-link-' + key] = requirement.link
+        data['requirement-extra-' + key] = requirement.extra
+        data['mode-' + key] = requirement.mode
+
+    return data
+
+def form_request(data):
+    """Returns a POST request carrying edit form data"""
+    return RequestFactory().post('/', data)
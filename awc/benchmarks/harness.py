@@ -0,0 +1,115 @@
+import json
+import os
+import sys
+import time
+
+from django.test import TestCase
+
+from .corpus import CorpusGenerator
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), 'baselines.json')
+
+def env_sizes():
+    """Returns the requirement counts to generate challenges with, from AWC_BENCHMARK_SIZES"""
+    return [int(size) for size in os.environ.get('AWC_BENCHMARK_SIZES', '10,40,100').split(',') if size.strip()]
+
+def measure(function, inputs, repeat):
+    """Returns the fastest mean milliseconds per call of function over inputs, out of repeat runs"""
+    best = None
+
+    for i in range(repeat):
+        started = time.perf_counter()
+
+        for value in inputs:
+            function(value)
+
+        elapsed = time.perf_counter() - started
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return best * 1000 / len(inputs)
+
+class Baselines(object):
+    '''Milliseconds per call of each benchmark, as last recorded on a reference run of this machine
+
+    Timings only compare on the machine that recorded them, so the file is not committed.
+    '''
+
+    def __init__(self, path=BASELINES_PATH):
+        self.path = path
+        self.exists = os.path.exists(path)
+
+        if self.exists:
+            with open(path) as baselines_file:
+                self.timings = json.load(baselines_file)
+        else:
+            self.timings = {}
+
+    def get(self, name):
+        return self.timings.get(name)
+
+    def record(self, name, ms):
+        self.timings[name] = round(ms, 4)
+
+    def save(self):
+        with open(self.path, 'w') as baselines_file:
+            json.dump(self.timings, baselines_file, indent=2, sort_keys=True)
+            baselines_file.write('\n')
+
+class BenchmarkCase(TestCase):
+    '''Times functions over a generated corpus and fails when they get slower than their baseline
+
+    AWC_BENCHMARK_REPEAT sets how many times each benchmark is run, keeping the fastest. A benchmark fails
+    when it takes more than AWC_BENCHMARK_TOLERANCE times its baseline. The first run on a machine, or a
+    run with AWC_BENCHMARK_UPDATE=1, records the timings as the new baselines instead.
+    '''
+
+    seed = 0
+    baselines = None
+
+    @classmethod
+    def setUpClass(cls):
+        cls.generator = CorpusGenerator(cls.seed)
+        cls.repeat = int(os.environ.get('AWC_BENCHMARK_REPEAT', 5))
+        cls.tolerance = float(os.environ.get('AWC_BENCHMARK_TOLERANCE', 2.0))
+        cls.results = []
+
+        if BenchmarkCase.baselines is None:
+            BenchmarkCase.baselines = Baselines()
+
+        cls.update = os.environ.get('AWC_BENCHMARK_UPDATE', '') not in ('', '0') or not BenchmarkCase.baselines.exists
+
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        for name, ms, baseline in cls.results:
+            if baseline:
+                sys.stderr.write("\n{:<45} {:>10.4f} ms  baseline {:>10.4f} ms  {:.2f}x".format(name, ms, baseline, ms / baseline))
+            else:
+                sys.stderr.write("\n{:<45} {:>10.4f} ms  no baseline".format(name, ms))
+
+        sys.stderr.write("\n")
+
+        if cls.update:
+            BenchmarkCase.baselines.save()
+
+        super().tearDownClass()
+
+    def benchmark(self, name, function, inputs, repeat=None):
+        """Times function over each of inputs, checking the result against the benchmark's baseline"""
+        ms = measure(function, inputs, repeat or self.repeat)
+        baseline = self.baselines.get(name)
+
+        self.results.append((name, ms, baseline))
+
+        if self.update:
+            self.baselines.record(name, ms)
+        elif baseline is not None:
+            # Each benchmark is reported on its own, so one regression does not hide the rest
+            with self.subTest(name):
+                self.assertLessEqual(ms, baseline * self.tolerance,
+                                     "{} took {:.4f} ms per call, over {}x its {:.4f} ms baseline".format(name, ms, self.tolerance, baseline))
+
+        return ms
@@ -0,0 +1,305 @@
+import collections
+import hashlib
+import threading
+import time
+
+from django.core.cache import caches
+
+def normalise_search(search):
+    return ' '.join(search.lower().split())
+
+def user_scope(access_token):
+    """Returns a stable, non-reversible key part for a user's access token"""
+    return hashlib.sha256(access_token.encode()).hexdigest()[:32]
+
+class MediaCache(object):
+    '''Bounded TTL/LRU cache of Anilist media backed by a Django cache
+
+    Titles, covers and episode counts are shared by every user and are kept under the media id.
+    The viewer's mediaListEntry is private, so it is stored separately under their token scope
+    with a much shorter TTL.
+    '''
+
+    MEDIA_KEY = 'awc:media:{}'
+    ENTRY_KEY = 'awc:media-entry:{}:{}'
+    SEARCH_KEY = 'awc:search:{}'
+
+    def __init__(self, cache_alias='default', max_entries=5000, media_ttl=24 * 60 * 60, entry_ttl=60, search_ttl=60 * 60):
+        self.cache_alias = cache_alias
+        self.max_entries = max_entries
+        self.media_ttl = media_ttl
+        self.entry_ttl = entry_ttl
+        self.search_ttl = search_ttl
+
+        self.hits = 0
+        self.misses = 0
+        self.search_hits = 0
+        self.search_misses = 0
+        self.evictions = 0
+
+        # Least recently used keys first, with their expiry times
+        self._keys = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def _touch(self, keys):
+        with self._lock:
+            for key in keys:
+                if key in self._keys:
+                    self._keys.move_to_end(key)
+
+    def _set_many(self, values, ttl):
+        now = time.time()
+        evicted = []
+
+        with self._lock:
+            for key in values:
+                self._keys[key] = now + ttl
+                self._keys.move_to_end(key)
+
+            # Expired keys go first, then the least recently used ones
+            for key, expiry in list(self._keys.items()):
+                if expiry < now:
+                    del self._keys[key]
+
+            while len(self._keys) > self.max_entries:
+                key, expiry = self._keys.popitem(last=False)
+                evicted.append(key)
+
+            self.evictions += len(evicted)
+
+        self.cache.set_many(values, ttl)
+
+        if evicted:
+            self.cache.delete_many(evicted)
+
+    def get_media(self, ids, access_token=None):
+        """Returns the cached media by id and the list of ids that need to be fetched"""
+        keys = {}
+
+        for media_id in ids:
+            if access_token:
+                entry_key = self.ENTRY_KEY.format(user_scope(access_token), media_id)
+            else:
+                entry_key = None
+
+            keys[media_id] = (self.MEDIA_KEY.format(media_id), entry_key)
+
+        found = self.cache.get_many([key for pair in keys.values() for key in pair if key])
+
+        media = {}
+        missing = []
+
+        for media_id, (media_key, entry_key) in keys.items():
+            if media_key not in found or (entry_key and entry_key not in found):
+                missing.append(media_id)
+                continue
+
+            media[media_id] = dict(found[media_key])
+
+            if entry_key:
+                media[media_id]['mediaListEntry'] = found[entry_key]['entry']
+
+        with self._lock:
+            self.hits += len(media)
+            self.misses += len(missing)
+
+        self._touch(found)
+
+        return media, missing
+
+    def set_media(self, media_list, access_token=None):
+        metadata = {}
+        entries = {}
+
+        for media in media_list:
+            metadata[self.MEDIA_KEY.format(media['id'])] = {key: value for key, value in media.items() if key != 'mediaListEntry'}
+
+            if access_token:
+                # Wrapped so that "not on the user's list" is cached too
+                entries[self.ENTRY_KEY.format(user_scope(access_token), media['id'])] = {'entry': media.get('mediaListEntry')}
+
+        self._set_many(metadata, self.media_ttl)
+
+        if entries:
+            self._set_many(entries, self.entry_ttl)
+
+    def get_search(self, search, access_token=None):
+        """Returns the cached media list for a search, or None on a miss"""
+        key = self.SEARCH_KEY.format(hashlib.sha1(normalise_search(search).encode()).hexdigest())
+        ids = self.cache.get(key)
+
+        if ids is not None:
+            self._touch([key])
+
+            media, missing = self.get_media(ids, access_token)
+
+            if not missing:
+                with self._lock:
+                    self.search_hits += 1
+
+                return [media[media_id] for media_id in ids]
+
+        with self._lock:
+            self.search_misses += 1
+
+        return None
+
+    def set_search(self, search, media_list, access_token=None):
+        key = self.SEARCH_KEY.format(hashlib.sha1(normalise_search(search).encode()).hexdigest())
+
+        self.set_media(media_list, access_token)
+        self._set_many({key: [media['id'] for media in media_list]}, self.search_ttl)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            searches = self.search_hits + self.search_misses
+
+            return {
+                'entries': len(self._keys),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'search_hits': self.search_hits,
+                'search_misses': self.search_misses,
+                'search_hit_rate': self.search_hits / searches if searches else 0.0,
+                'evictions': self.evictions,
+            }
+
+class ResponseCache(object):
+    '''Last known good Anilist responses, served with a staleness marker when Anilist is down'''
+
+    RESPONSE_KEY = 'awc:response:{}'
+
+    def __init__(self, cache_alias='default', ttl=24 * 60 * 60):
+        self.cache_alias = cache_alias
+        self.ttl = ttl
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def _key(self, request_key):
+        return self.RESPONSE_KEY.format(hashlib.sha1(repr(request_key).encode()).hexdigest())
+
+    def get(self, request_key):
+        """Returns the (response, stored_at) pair for a request, or None"""
+        return self.cache.get(self._key(request_key))
+
+    def set(self, request_key, response):
+        self.cache.set(self._key(request_key), (response, time.time()), self.ttl)
+
+class ParseCache(object):
+    '''Parsed challenge codes keyed by a hash of the comment and the challenge's version
+
+    Versions are stored on the challenge's row, so a challenge saved in one worker is parsed again
+    in every other worker once it loads the challenge.
+    '''
+
+    PARSED_KEY = 'awc:parsed:{}:{}:{}'
+
+    def __init__(self, cache_alias='default', ttl=60 * 60):
+        self.cache_alias = cache_alias
+        self.ttl = ttl
+
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def get_or_parse(self, challenge, comment, parse):
+        """Returns the cached parse of a comment for a challenge, calling parse() on a miss"""
+        key = self.PARSED_KEY.format(challenge.id, challenge.version, hashlib.sha256(comment.encode()).hexdigest())
+        parsed = self.cache.get(key)
+
+        if parsed is not None:
+            with self._lock:
+                self.hits += 1
+
+            return parsed
+
+        with self._lock:
+            self.misses += 1
+
+        parsed = parse()
+        self.cache.set(key, parsed, self.ttl)
+
+        return parsed
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+class SkeletonCache(object):
+    '''Compiled comment skeletons of each challenge, one per code format
+
+    Skeletons are keyed by the version stored on the challenge's row, like parses, so a challenge
+    saved in one worker is compiled again in every other worker once it loads the challenge. The key
+    also carries the revision of the skeleton layout, so skeletons compiled by older code are not
+    read from a shared backend.
+    '''
+
+    SKELETON_KEY = 'awc:skeleton:{}:{}:{}:{}'
+
+    def __init__(self, cache_alias='default', ttl=24 * 60 * 60, revision=1):
+        self.cache_alias = cache_alias
+        self.ttl = ttl
+        self.revision = revision
+
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def _key(self, challenge, post_format):
+        return self.SKELETON_KEY.format(self.revision, challenge.id, challenge.version, post_format)
+
+    def set(self, challenge, post_format, skeleton):
+        self.cache.set(self._key(challenge, post_format), skeleton, self.ttl)
+
+    def get_or_compile(self, challenge, post_format, compile):
+        """Returns the cached skeleton of a challenge in a format, calling compile() on a miss"""
+        key = self._key(challenge, post_format)
+        skeleton = self.cache.get(key)
+
+        if skeleton is not None:
+            with self._lock:
+                self.hits += 1
+
+            return skeleton
+
+        with self._lock:
+            self.misses += 1
+
+        skeleton = compile()
+        self.cache.set(key, skeleton, self.ttl)
+
+        return skeleton
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,260 @@
+import asyncio
+import atexit
+import collections
+import gzip
+import hashlib
+import http.client
+import json
+import threading
+import time
+
+from datetime import timedelta
+
+import httpx
+import requests
+
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from .cache import user_scope
+
+# Secrets in OAuth token requests never reach the cassette file
+REDACTED_FIELDS = ('client_secret', 'code')
+
+RECORDED_HEADERS = ('Content-Type', 'X-RateLimit-Limit', 'X-RateLimit-Remaining', 'Retry-After')
+
+RECORDED_TOKEN_PREFIX = 'recorded-'
+
+class CassetteMiss(requests.ConnectionError):
+    '''Raised when replaying a request that was never recorded'''
+
+def _decode_body(body):
+    if isinstance(body, bytes):
+        body = body.decode()
+
+    try:
+        return json.loads(body) if body else None
+    except ValueError:
+        return body
+
+class Cassette(object):
+    '''Gzipped JSON lines of recorded Anilist requests and responses, with their timings
+
+    Requests are matched on their method, path, canonical body and the user the access token
+    belongs to. Repeated identical requests replay their recorded responses in order, and the
+    last one is reused once they run out. Access tokens handed out by the OAuth endpoint are
+    replaced with a "recorded-" token naming the same user, so no credentials are written.
+    '''
+
+    RECORD = 'record'
+    REPLAY = 'replay'
+
+    RECORDED = 'recorded'
+    NO_LATENCY = 'none'
+
+    def __init__(self, path, mode=REPLAY, latency=RECORDED):
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+
+        self._interactions = collections.defaultdict(list)
+        self._positions = collections.defaultdict(int)
+        self._lock = threading.Lock()
+        self._file = None
+
+        if mode == self.REPLAY:
+            self._load()
+        else:
+            atexit.register(self.close)
+
+    def _load(self):
+        try:
+            with gzip.open(self.path, 'rt') as cassette_file:
+                for line in cassette_file:
+                    interaction = json.loads(line)
+                    self._interactions[interaction['key']].append(interaction)
+        except FileNotFoundError:
+            pass
+        except EOFError:
+            # A recording that was not closed cleanly still replays everything flushed before it stopped
+            pass
+
+    @staticmethod
+    def request_key(method, url, body, authorization=None):
+        """Returns the matching key and the redacted request details stored alongside a response"""
+        request_body = _decode_body(body)
+
+        if isinstance(request_body, dict):
+            request_body = {name: '[redacted]' if name in REDACTED_FIELDS else value for name, value in request_body.items()}
+
+        scope = ''
+
+        if authorization:
+            token = authorization.split(' ', 1)[-1]
+            scope = token[len(RECORDED_TOKEN_PREFIX):] if token.startswith(RECORDED_TOKEN_PREFIX) else user_scope(token)
+
+        details = {
+            'method': method,
+            'path': requests.utils.urlparse(url).path or '/',
+            'body': request_body,
+            'scope': scope,
+        }
+
+        # The redacted fields still tell apart requests, e.g. two different authorisation codes
+        key_body = json.dumps([details, _decode_body(body)], sort_keys=True)
+
+        return hashlib.sha1(key_body.encode()).hexdigest(), details
+
+    @staticmethod
+    def redact_response(content):
+        response_data = _decode_body(content)
+
+        if isinstance(response_data, dict) and 'access_token' in response_data:
+            response_data['access_token'] = RECORDED_TOKEN_PREFIX + user_scope(response_data['access_token'])
+
+            return json.dumps(response_data)
+
+        return content.decode() if isinstance(content, bytes) else content
+
+    def record(self, key, details, status, headers, content, elapsed):
+        interaction = {
+            'key': key,
+            'request': details,
+            'status': status,
+            'headers': {name: headers[name] for name in RECORDED_HEADERS if name in headers},
+            'body': self.redact_response(content),
+            'elapsed': round(elapsed, 6),
+        }
+
+        with self._lock:
+            if self._file is None:
+                self._file = gzip.open(self.path, 'at')
+
+            self._file.write(json.dumps(interaction) + '\n')
+            self._file.flush()
+
+            self.recorded += 1
+
+    def play(self, key):
+        """Returns the next recorded interaction for a key, or None if there is none"""
+        with self._lock:
+            interactions = self._interactions.get(key)
+
+            if not interactions:
+                self.misses += 1
+                return None
+
+            position = self._positions[key]
+            self._positions[key] = position + 1
+            self.hits += 1
+
+            return interactions[min(position, len(interactions) - 1)]
+
+    def replay_delay(self, interaction):
+        return interaction['elapsed'] if self.latency == self.RECORDED else 0
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'mode': self.mode,
+                'interactions': sum(len(interactions) for interactions in self._interactions.values()),
+                'recorded': self.recorded,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+class CassetteAdapter(HTTPAdapter):
+    '''requests adapter that records responses to, or replays them from, a Cassette'''
+
+    def __init__(self, cassette, **kwargs):
+        self.cassette = cassette
+
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        key, details = self.cassette.request_key(request.method, request.url, request.body, request.headers.get('Authorization'))
+
+        if self.cassette.mode == Cassette.REPLAY:
+            interaction = self.cassette.play(key)
+
+            if interaction is None:
+                raise CassetteMiss("No recorded response for {} {}".format(request.method, request.path_url), request=request)
+
+            delay = self.cassette.replay_delay(interaction)
+
+            if delay:
+                time.sleep(delay)
+
+            return self.build_replayed_response(request, interaction)
+
+        started = time.perf_counter()
+
+        response = super().send(request, **kwargs)
+        content = response.content
+
+        self.cassette.record(key, details, response.status_code, response.headers, content, time.perf_counter() - started)
+
+        return response
+
+    @staticmethod
+    def build_replayed_response(request, interaction):
+        response = requests.Response()
+        response.status_code = interaction['status']
+        response.reason = http.client.responses.get(interaction['status'], '')
+        response.headers = CaseInsensitiveDict(interaction['headers'])
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        response.elapsed = timedelta(seconds=interaction['elapsed'])
+        response._content = interaction['body'].encode()
+
+        return response
+
+class AsyncCassetteTransport(httpx.AsyncBaseTransport):
+    '''httpx transport that records responses to, or replays them from, a Cassette'''
+
+    def __init__(self, cassette, transport=None):
+        self.cassette = cassette
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request):
+        key, details = self.cassette.request_key(request.method, str(request.url), request.content, request.headers.get('Authorization'))
+
+        if self.cassette.mode == Cassette.REPLAY:
+            interaction = self.cassette.play(key)
+
+            if interaction is None:
+                raise httpx.ConnectError("No recorded response for {} {}".format(request.method, request.url.path), request=request)
+
+            delay = self.cassette.replay_delay(interaction)
+
+            if delay:
+                await asyncio.sleep(delay)
+
+            return httpx.Response(interaction['status'], headers=interaction['headers'], content=interaction['body'].encode(), request=request)
+
+        started = time.perf_counter()
+
+        response = await self.transport.handle_async_request(request)
+
+        # Decoded here so the recorded body and the returned response no longer need Content-Encoding
+        content = await httpx.Response(response.status_code, headers=response.headers, stream=response.stream, request=request).aread()
+
+        self.cassette.record(key, details, response.status_code, response.headers, content, time.perf_counter() - started)
+
+        headers = [(name, value) for name, value in response.headers.items() if name.lower() not in ('content-encoding', 'content-length')]
+
+        return httpx.Response(response.status_code, headers=headers, content=content, request=request)
+
+    async def aclose(self):
+        await self.transport.aclose()
@@ -0,0 +1,52 @@
+from dataclasses import dataclass, field
+
+@dataclass(slots=True)
+class ParsedRequirement:
+    '''One requirement of a challenge code, as parsed from a comment or filled in on the edit page
+
+    Raw requirements only use raw_requirement. Fields that a layout does not set keep their
+    empty defaults, which templates render the same way as a missing value.
+    '''
+
+    number: str
+    mode: str
+    bonus: bool = False
+    force_raw_edit: bool = False
+    raw_requirement: str = ''
+    completed: str = ''
+    start: str = ''
+    finish: str = ''
+    text: str = ''
+    anime: str = ''
+    link: str = ''
+    has_set_anime: bool = False
+    anime_id: int = None
+    extra_newline: bool = False
+    extra: str = ''
+
+    # The viewer's Anilist media for the anime, attached by the edit view
+    media: object = None
+
+@dataclass(slots=True)
+class ChallengeState:
+    '''A parsed challenge code, or the reason it could not be parsed'''
+
+    failed: bool = False
+    error: str = ''
+    comment: str = ''
+    legend: dict = None
+    prerequisites: dict = None
+    category: str = ''
+    start: str = ''
+    finish: str = ''
+    is_new_format: bool = False
+    format: tuple = None
+    extra: str = ''
+    requirements: list = field(default_factory=list)
+
+    def fail(self, error, comment):
+        self.failed = True
+        self.error = error
+        self.comment = comment
+
+        return self
@@ -0,0 +1,505 @@
+import gzip
+import json
+import random
+import re
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TOKEN_PATTERN = re.compile(r'"(?:[^"\\]|\\.)*"|\$?[\w.-]+|[{}():\[\]=!]')
+
+MEDIA_STATUSES = ['COMPLETED', 'CURRENT', 'PLANNING', 'PAUSED', 'DROPPED']
+
+TITLE_WORDS = ['Sword', 'Star', 'Spring', 'Summer', 'Ghost', 'Dragon', 'Academy', 'Magical', 'Girl', 'Knight',
+               'Shadow', 'Sky', 'Ocean', 'Idol', 'Cafe', 'Detective', 'Robot', 'Festival', 'Club', 'Legend']
+
+class GraphQLSyntaxError(ValueError):
+    '''Raised for documents the fake server's small GraphQL parser does not understand'''
+
+class _Tokens(object):
+    def __init__(self, query):
+        self.tokens = TOKEN_PATTERN.findall(query)
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self, expected=None):
+        token = self.peek()
+
+        if token is None or (expected is not None and token != expected):
+            raise GraphQLSyntaxError("Expected {} but found {}".format(expected or 'a token', token))
+
+        self.position += 1
+
+        return token
+
+    def skip(self, token):
+        if self.peek() == token:
+            self.position += 1
+            return True
+
+        return False
+
+def _parse_value(tokens):
+    token = tokens.take()
+
+    if token == '[':
+        values = []
+
+        while not tokens.skip(']'):
+            values.append(_parse_value(tokens))
+
+        return values
+
+    if token.startswith('$'):
+        return ('$', token[1:])
+
+    if token.startswith('"'):
+        return json.loads(token)
+
+    if re.fullmatch(r'-?[0-9]+', token):
+        return int(token)
+
+    return {'true': True, 'false': False, 'null': None}.get(token, token)
+
+def _parse_type(tokens):
+    if tokens.skip('['):
+        _parse_type(tokens)
+        tokens.take(']')
+    else:
+        tokens.take()
+
+    tokens.skip('!')
+
+def _parse_selections(tokens):
+    selections = []
+
+    tokens.take('{')
+
+    while not tokens.skip('}'):
+        name = tokens.take()
+        alias = name
+
+        if tokens.skip(':'):
+            name = tokens.take()
+
+        arguments = {}
+
+        if tokens.skip('('):
+            while not tokens.skip(')'):
+                argument = tokens.take()
+                tokens.take(':')
+                arguments[argument] = _parse_value(tokens)
+
+        children = _parse_selections(tokens) if tokens.peek() == '{' else None
+
+        selections.append({'alias': alias, 'name': name, 'arguments': arguments, 'selections': children})
+
+    return selections
+
+def parse_document(query):
+    """Returns the (operation, variable defaults, root selections) of the subset of GraphQL Mion sends"""
+    tokens = _Tokens(query)
+    operation = 'query'
+    defaults = {}
+
+    if tokens.peek() in ('query', 'mutation'):
+        operation = tokens.take()
+
+        if tokens.peek() not in ('(', '{'):
+            tokens.take()
+
+    if tokens.skip('('):
+        while not tokens.skip(')'):
+            variable = tokens.take()[1:]
+            tokens.take(':')
+            _parse_type(tokens)
+
+            if tokens.skip('='):
+                defaults[variable] = _parse_value(tokens)
+
+    return operation, defaults, _parse_selections(tokens)
+
+def bind(selections, variables):
+    """Returns the selections with variable references in their arguments replaced by values"""
+    def resolve(value):
+        if isinstance(value, tuple):
+            return variables.get(value[1])
+
+        if isinstance(value, list):
+            return [resolve(item) for item in value]
+
+        return value
+
+    return [dict(selection,
+                 arguments={name: resolve(value) for name, value in selection['arguments'].items()},
+                 selections=bind(selection['selections'], variables) if selection['selections'] else selection['selections'])
+            for selection in selections]
+
+def project(value, selections):
+    """Returns only the selected fields of a resolved value"""
+    if selections is None or value is None:
+        return value
+
+    if isinstance(value, list):
+        return [project(item, selections) for item in value]
+
+    return {selection['alias']: project(value.get(selection['name']), selection['selections']) for selection in selections}
+
+class FakeAnilistData(object):
+    '''Seeded users, media, list entries and forum comments for the fake Anilist server
+
+    The same seed always generates the same data, so benchmarks against the fake server are reproducible.
+    Access tokens are "token-<user id>" and authorisation codes are "code-<user id>".
+    '''
+
+    def __init__(self, seed=0, users=10, media=500, threads=20, comments_per_user=30, list_ratio=0.6):
+        rng = random.Random(seed)
+
+        self.users = {}
+        self.media = {}
+        self.list_entries = {}
+        self.comments = {}
+
+        self._next_comment_id = 1
+        self._lock = threading.Lock()
+
+        for user_id in range(1, users + 1):
+            self.users[user_id] = {
+                'id': user_id,
+                'name': 'User{}'.format(user_id),
+                'avatar': {'medium': 'https://s4.anilist.co/avatar/{}.png'.format(user_id)},
+            }
+
+        for media_id in range(1, media + 1):
+            self.media[media_id] = {
+                'id': media_id,
+                'title': {'userPreferred': ' '.join(rng.sample(TITLE_WORDS, 3))},
+                'coverImage': {'large': 'https://s4.anilist.co/cover/{}.png'.format(media_id)},
+                'episodes': rng.choice([1, 12, 13, 24, 26, 50]),
+            }
+
+        for user_id in self.users:
+            for media_id in self.media:
+                if rng.random() < list_ratio:
+                    self.list_entries[(user_id, media_id)] = self._generate_list_entry(rng, user_id, media_id)
+
+        thread_ids = [4000 + i for i in range(threads)]
+
+        for user_id in self.users:
+            for i in range(comments_per_user):
+                self.add_comment(rng.choice(thread_ids), user_id, 'Comment {} by User{}'.format(i, user_id))
+
+    @staticmethod
+    def _generate_list_entry(rng, user_id, media_id):
+        status = rng.choice(MEDIA_STATUSES)
+        started = {'year': rng.randint(2015, 2022), 'month': rng.randint(1, 12), 'day': rng.randint(1, 28)}
+        completed = {'year': started['year'] + 1, 'month': started['month'], 'day': started['day']}
+
+        return {
+            'id': user_id * 1000000 + media_id,
+            'status': status,
+            'progress': 0,
+            'repeat': 0,
+            'startedAt': started if status != 'PLANNING' else {'year': None, 'month': None, 'day': None},
+            'completedAt': completed if status == 'COMPLETED' else {'year': None, 'month': None, 'day': None},
+        }
+
+    def add_comment(self, thread_id, user_id, comment):
+        with self._lock:
+            comment_id = self._next_comment_id
+            self._next_comment_id += 1
+
+            self.comments[comment_id] = {'id': comment_id, 'threadId': thread_id, 'userId': user_id, 'comment': comment}
+
+        return self.comments[comment_id]
+
+    def user_for_token(self, access_token):
+        try:
+            return self.users.get(int(access_token.rsplit('-', 1)[1]))
+        except (AttributeError, IndexError, ValueError):
+            return None
+
+    def media_for(self, media, user):
+        entry = self.list_entries.get((user['id'], media['id'])) if user else None
+
+        return dict(media, mediaListEntry=entry)
+
+class FakeAnilistHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+
+        self.server.request_count += 1
+
+        status, headers = self.server.before_request()
+
+        if status is not None:
+            return self.send_json(status, {'errors': [{'message': 'Injected failure', 'status': status}]}, headers)
+
+        if self.path.rstrip('/').endswith('oauth/token'):
+            status, payload = self.server.exchange_token(body)
+        else:
+            authorisation = self.headers.get('Authorization', '')
+            access_token = authorisation[len('Bearer '):] if authorisation.startswith('Bearer ') else None
+
+            status, payload = self.server.execute(body.get('query', ''), body.get('variables') or {}, access_token)
+
+        self.send_json(status, payload, headers)
+
+    def send_json(self, status, payload, headers):
+        data = json.dumps(payload).encode()
+
+        self.send_response(status)
+
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            data = gzip.compress(data)
+            self.send_header('Content-Encoding', 'gzip')
+
+        for name, value in headers.items():
+            self.send_header(name, str(value))
+
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+class FakeAnilistServer(ThreadingHTTPServer):
+    '''Local stand-in for the parts of the Anilist API and OAuth endpoint that Mion uses
+
+    latency and jitter are in seconds, failure_rate is the fraction of requests answered with
+    failure_status, and rate_limit requests are allowed per 60 second window before 429s.
+    '''
+
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), data=None, latency=0, jitter=0, failure_rate=0, failure_status=500,
+                 rate_limit=90, seed=0, verbose=False):
+        super().__init__(address, FakeAnilistHandler)
+
+        self.data = data or FakeAnilistData(seed=seed)
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.rate_limit = rate_limit
+        self.verbose = verbose
+
+        self.request_count = 0
+        self.failures_queued = 0
+
+        self._rng = random.Random(seed)
+        self._window_start = time.time()
+        self._window_requests = 0
+        self._lock = threading.Lock()
+
+        self._thread = None
+
+    @property
+    def api_url(self):
+        return 'http://{}:{}/'.format(*self.server_address[:2])
+
+    @property
+    def auth_url(self):
+        return self.api_url + 'api/v2/oauth/token'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def fail_next(self, count=1):
+        with self._lock:
+            self.failures_queued += count
+
+    def before_request(self):
+        """Returns an injected failure status, if any, and the rate limit headers for a request"""
+        with self._lock:
+            now = time.time()
+
+            if now - self._window_start >= 60:
+                self._window_start = now
+                self._window_requests = 0
+
+            self._window_requests += 1
+
+            headers = {
+                'X-RateLimit-Limit': self.rate_limit,
+                'X-RateLimit-Remaining': max(0, self.rate_limit - self._window_requests),
+            }
+
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0)
+            status = None
+
+            if self.rate_limit and self._window_requests > self.rate_limit:
+                status = 429
+                headers['Retry-After'] = max(1, int(60 - (now - self._window_start)))
+            elif self.failures_queued:
+                self.failures_queued -= 1
+                status = self.failure_status
+            elif self.failure_rate and self._rng.random() < self.failure_rate:
+                status = self.failure_status
+
+        if delay:
+            time.sleep(delay)
+
+        return status, headers
+
+    def exchange_token(self, body):
+        code = body.get('code', '')
+
+        if not code.startswith('code-') or self.data.user_for_token(code) is None:
+            return 400, {'error': 'invalid_request', 'message': 'Invalid authorisation code'}
+
+        return 200, {'token_type': 'Bearer', 'expires_in': 31536000, 'access_token': 'token-' + code.rsplit('-', 1)[1]}
+
+    def execute(self, query, variables, access_token=None):
+        """Returns the HTTP status and GraphQL response for a document"""
+        try:
+            operation, defaults, selections = parse_document(query)
+        except GraphQLSyntaxError as err:
+            return 400, {'errors': [{'message': str(err), 'status': 400}], 'data': None}
+
+        selections = bind(selections, dict(defaults, **variables))
+        user = self.data.user_for_token(access_token) if access_token else None
+
+        if access_token and user is None:
+            return 400, {'errors': [{'message': 'Invalid token', 'status': 400}], 'data': None}
+
+        data = {}
+        errors = []
+
+        for selection in selections:
+            resolver = getattr(self, '_resolve_' + selection['name'], None)
+
+            try:
+                if resolver is None:
+                    raise LookupError(404, "Cannot query field \"{}\"".format(selection['name']))
+
+                if operation == 'mutation' and user is None:
+                    raise LookupError(401, 'Unauthorized.')
+
+                data[selection['alias']] = project(resolver(selection['arguments'], user, selection), selection['selections'])
+            except LookupError as err:
+                status, message = err.args
+                data[selection['alias']] = None
+                errors.append({'message': message, 'status': status, 'path': [selection['alias']]})
+
+        response = {'data': data}
+
+        if errors:
+            response['errors'] = errors
+
+            # Like Anilist, a document that produced nothing is answered with the first error's status
+            if not any(value is not None for value in data.values()):
+                return errors[0]['status'], response
+
+        return 200, response
+
+    def _resolve_Viewer(self, arguments, user, selection):
+        if user is None:
+            raise LookupError(401, 'Unauthorized.')
+
+        return user
+
+    def _resolve_ThreadComment(self, arguments, user, selection):
+        comment = self.data.comments.get(arguments.get('id'))
+
+        if comment is None or (arguments.get('threadId') and comment['threadId'] != arguments['threadId']):
+            raise LookupError(404, 'Not Found.')
+
+        return [comment]
+
+    def _resolve_SaveThreadComment(self, arguments, user, selection):
+        if arguments.get('id'):
+            comment = self.data.comments.get(arguments['id'])
+
+            if comment is None:
+                raise LookupError(404, 'Not Found.')
+
+            if comment['userId'] != user['id']:
+                raise LookupError(401, 'Unauthorized.')
+
+            comment['comment'] = arguments.get('comment', comment['comment'])
+
+            return comment
+
+        return self.data.add_comment(arguments.get('threadId'), user['id'], arguments.get('comment', ''))
+
+    def _resolve_DeleteThreadComment(self, arguments, user, selection):
+        comment = self.data.comments.get(arguments.get('id'))
+
+        if comment is None:
+            raise LookupError(404, 'Not Found.')
+
+        if comment['userId'] != user['id']:
+            raise LookupError(401, 'Unauthorized.')
+
+        del self.data.comments[comment['id']]
+
+        return {'deleted': True}
+
+    def _resolve_Media(self, arguments, user, selection):
+        media = self.data.media.get(arguments.get('id'))
+
+        if media is None:
+            raise LookupError(404, 'Not Found.')
+
+        return self.data.media_for(media, user)
+
+    def _resolve_Page(self, arguments, user, selection):
+        page = arguments.get('page') or 1
+        per_page = min(arguments.get('perPage') or 50, 50)
+
+        result = {}
+        items = []
+
+        for child in selection['selections']:
+            if child['name'] == 'media':
+                items = self._page_media(child['arguments'], user)
+            elif child['name'] == 'threadComments':
+                items = self._page_thread_comments(child['arguments'])
+            else:
+                continue
+
+            result[child['name']] = items[(page - 1) * per_page:page * per_page]
+
+        last_page = max(1, (len(items) + per_page - 1) // per_page)
+
+        result['pageInfo'] = {
+            'total': len(items),
+            'currentPage': page,
+            'lastPage': last_page,
+            'hasNextPage': page < last_page,
+            'perPage': per_page,
+        }
+
+        return result
+
+    def _page_media(self, arguments, user):
+        if arguments.get('id_in') is not None:
+            media = [self.data.media[media_id] for media_id in arguments['id_in'] if media_id in self.data.media]
+        elif arguments.get('search'):
+            words = arguments['search'].lower().split()
+            media = [item for item in self.data.media.values() if all(word in item['title']['userPreferred'].lower() for word in words)]
+        else:
+            media = list(self.data.media.values())
+
+        return [self.data.media_for(item, user) for item in media]
+
+    def _page_thread_comments(self, arguments):
+        return sorted((comment for comment in self.data.comments.values()
+                       if arguments.get('userId') is None or comment['userId'] == arguments['userId']),
+                      key=lambda comment: comment['id'])
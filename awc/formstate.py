@@ -0,0 +1,165 @@
+import json
+
+from dataclasses import dataclass, field
+
+DEFAULT_LEGEND = '{"Completed": "X", "Not Completed": "O"}'
+
+# Requirement fields named "requirement-<word>-<key>", besides raw requirements
+REQUIREMENT_WORDS = ('start', 'finish', 'anime', 'link', 'extra')
+
+# Fields that the form writes as given, rather than stripped
+DATE_FIELDS = ('start', 'finish')
+
+PREREQUISITE_FINISH = '-finish'
+
+# What a field name sets, as (target, attribute, key, whether its value is stripped)
+REQUIREMENT = 'requirement'
+RAW = 'raw'
+PREREQUISITE = 'prerequisite'
+CHALLENGE = 'challenge'
+IGNORED = (None, None, None, False)
+
+CHALLENGE_FIELDS = {
+    'format': 'post_format',
+    'legend': 'legend',
+    'challenge-start': 'start',
+    'challenge-finish': 'finish',
+    'challenge-extra': 'extra',
+}
+
+# Edit forms of the same challenge send the same names, so each is only read once. Names come
+# from the client, so the table is emptied rather than left to grow past MAX_FIELD_NAMES.
+FIELD_NAMES = {}
+MAX_FIELD_NAMES = 10000
+
+def read_field_name(name):
+    """Returns what a field sets, remembering it for the next form"""
+    head, separator, rest = name.partition('-')
+
+    if name in CHALLENGE_FIELDS:
+        target = (CHALLENGE, CHALLENGE_FIELDS[name], None, name == 'challenge-extra')
+    elif head == 'requirement':
+        word, separator, key = rest.partition('-')
+
+        if word == 'raw':
+            target = (RAW, None, key, True)
+        elif word in REQUIREMENT_WORDS:
+            target = (REQUIREMENT, word, key, word not in DATE_FIELDS)
+        else:
+            target = IGNORED
+    elif head == 'completed' or head == 'mode':
+        target = (REQUIREMENT, head, rest, True)
+    elif head == 'prerequisite' and rest.endswith(PREREQUISITE_FINISH):
+        target = (PREREQUISITE, None, rest[:-len(PREREQUISITE_FINISH)], False)
+    else:
+        target = IGNORED
+
+    if len(FIELD_NAMES) >= MAX_FIELD_NAMES:
+        FIELD_NAMES.clear()
+
+    FIELD_NAMES[name] = target
+
+    return target
+
+@dataclass(slots=True)
+class RequirementFields:
+    '''The edit form's fields for one requirement, with None for those the form left out
+
+    Dates are kept as submitted, every other field is stripped.
+    '''
+
+    completed: str = None
+    start: str = None
+    finish: str = None
+    anime: str = None
+    link: str = None
+    extra: str = None
+    mode: str = None
+
+    @classmethod
+    def from_requirement(cls, requirement):
+        """Returns the fields that the edit page fills in from a ParsedRequirement, as the form would submit them"""
+        return cls(requirement.completed.strip(), requirement.start, requirement.finish, requirement.anime.strip(),
+                   requirement.link.strip(), requirement.extra.strip(), requirement.mode.strip())
+
+    def updated(self, changes):
+        """Returns these fields with every field that changes sets replaced"""
+        return RequirementFields(*(getattr(self, name) if getattr(changes, name) is None else getattr(changes, name)
+                                   for name in self.__slots__))
+
+NO_FIELDS = RequirementFields()
+
+@dataclass(slots=True)
+class FormState:
+    '''The whole edit form, decoded in one pass over its fields
+
+    Requirements are keyed like their field names, so "01" or "bonus-1". Raw requirements are
+    keyed by their number alone, as the form names them.
+    '''
+
+    post_format: str = 'old'
+    legend: dict = None
+    start: str = None
+    finish: str = None
+    extra: str = None
+    prerequisites: dict = field(default_factory=dict)
+    requirements: dict = field(default_factory=dict)
+    raw_requirements: dict = field(default_factory=dict)
+
+    def requirement(self, key):
+        """Returns the fields of a requirement, all None if the form has none for it"""
+        return self.requirements.get(key, NO_FIELDS)
+
+    @classmethod
+    def decode(cls, data):
+        """Returns the state of edit form data, from a QueryDict or any mapping with items"""
+        state = cls()
+        requirements = state.requirements
+        legend = DEFAULT_LEGEND
+
+        for name, value in form_items(data):
+            target, attribute, key, strip = FIELD_NAMES.get(name) or read_field_name(name)
+
+            if strip:
+                value = value.strip()
+
+            if target is REQUIREMENT:
+                fields = requirements.get(key)
+
+                if fields is None:
+                    fields = requirements[key] = RequirementFields()
+
+                setattr(fields, attribute, value)
+            elif target is RAW:
+                state.raw_requirements[key] = value
+            elif target is PREREQUISITE:
+                state.prerequisites[key] = value
+            elif target is CHALLENGE:
+                if attribute == 'post_format':
+                    # The edit form only offers the two formats, so anything else is written as the old one
+                    state.post_format = 'new' if value == 'new' else 'old'
+                elif attribute == 'legend':
+                    legend = value
+                else:
+                    setattr(state, attribute, value)
+
+        state.legend = json.loads(legend.replace("'", '"'))
+
+        return state
+
+def form_items(data):
+    """Yields the (name, last value) of each form field"""
+    if hasattr(data, 'lists'):
+        # Going through a QueryDict's lists skips looking each name up again
+        for name, values in data.lists():
+            if values:
+                yield name, values[-1]
+    else:
+        yield from data.items()
+
+def decode_form(data):
+    """Returns the FormState of edit form data, which may already be decoded"""
+    if isinstance(data, FormState):
+        return data
+
+    return FormState.decode(data)
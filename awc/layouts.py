@@ -0,0 +1,198 @@
+import functools
+
+from dataclasses import dataclass, field, replace
+
+from .models import Challenge, Requirement
+
+# How the requirements under a section are ordered in a comment
+SAVED_ORDER = 'saved'
+NUMBER_ORDER = 'number'
+BONUS_LAST_ORDER = 'bonus-last'
+
+def ordinal(n):
+    n = int(n)
+
+    suffix = ['th', 'st', 'nd', 'rd', 'th'][min(n % 10, 4)]
+
+    if 11 <= (n % 100) <= 13:
+        suffix = 'th'
+
+    return str(n) + suffix
+
+@dataclass(frozen=True, slots=True)
+class Section:
+    '''A headed run of requirements in a challenge code
+
+    Mode sections hold the requirements of one mode. Season sections have no mode of their own and
+    start at a requirement number instead.
+    '''
+
+    header: str
+    mode: str = Requirement.DEFAULT
+    first_number: int = None
+    name: str = ''
+
+    # Written before the header, and in new format comments if that differs
+    lead: str = ''
+    new_lead: str = None
+    order: str = NUMBER_ORDER
+
+    def opening(self, post_format):
+        """Returns the text that starts the section in a comment"""
+        lead = self.new_lead if post_format == 'new' and self.new_lead is not None else self.lead
+
+        return lead + self.header + '\n'
+
+    def ordered(self, requirements):
+        """Returns the section's requirements in the order they are written"""
+        if self.order == SAVED_ORDER:
+            return requirements
+
+        number = lambda requirement: requirement.number
+
+        if self.order == BONUS_LAST_ORDER:
+            return (sorted([requirement for requirement in requirements if not requirement.bonus], key=number) +
+                    sorted([requirement for requirement in requirements if requirement.bonus], key=number))
+
+        return sorted(requirements, key=number)
+
+@dataclass(frozen=True, slots=True)
+class ChallengeLayout:
+    '''How a challenge's code is laid out, compiled once per category and named challenge
+
+    Mode sections split a code by requirement mode, while number sections interrupt a single run of
+    requirements with headers. Challenges recognised by name have mock_count requirements that are
+    not in the database.
+    '''
+
+    name: str
+    sections: tuple = ()
+    implemented: bool = True
+    pad_bonus_numbers: bool = True
+
+    # Requirement text templates by code format, given the requirement's ordinal and season
+    requirement_text: dict = field(default_factory=dict)
+
+    mock_count: int = None
+    default_extra: str = ''
+    challenge_extra: str = ''
+    allows_up_to_date: bool = False
+
+    # Built from sections by compile_layout
+    mode_sections: tuple = ()
+    number_sections: dict = field(default_factory=dict)
+
+    @property
+    def needs_requirements(self):
+        return self.mock_count is None
+
+    def format_number(self, number, bonus):
+        """Returns a requirement number as a comment writes it"""
+        if bonus and not self.pad_bonus_numbers:
+            return str(number)
+
+        return str(number).zfill(2)
+
+    def season_for(self, number):
+        """Returns the number section that a requirement number falls in, or None"""
+        season = None
+
+        for first_number, section in self.number_sections.items():
+            if first_number <= int(number):
+                season = section
+
+        return season
+
+    def text_for(self, requirement, number, post_format):
+        """Returns the text written for a requirement, filling in a template if the layout has one"""
+        template = self.requirement_text.get(post_format)
+
+        if template is None:
+            return requirement.text
+
+        season = self.season_for(number)
+
+        return template.format(ordinal=ordinal(number),
+                               season=season.name if season else '',
+                               season_ordinal=ordinal(int(number) - season.first_number + 1 if season else number))
+
+def compile_layout(layout):
+    """Returns a layout with its section lookups built"""
+    return replace(layout,
+                   mode_sections=tuple(section for section in layout.sections if section.first_number is None),
+                   number_sections={section.first_number: section for section in layout.sections if section.first_number is not None})
+
+FLAT = ChallengeLayout('flat')
+
+GENRE = ChallengeLayout('genre', pad_bonus_numbers=False, sections=(
+    Section("__Mode: Easy__", Requirement.EASY, order=BONUS_LAST_ORDER),
+    Section("__Mode: Normal__", Requirement.NORMAL, lead='\n---\n', order=BONUS_LAST_ORDER),
+    Section("__Mode: Hard__", Requirement.HARD, lead='\n---\n', order=BONUS_LAST_ORDER),
+    Section("__Bonus__", Requirement.BONUS, lead='\n---\n'),
+    Section("__Misc__", Requirement.DEFAULT, lead='\n---\n'),
+))
+
+CLASSIC = ChallengeLayout('classic', requirement_text={'new': '{season_ordinal} {season} Anime'}, sections=(
+    Section("### __Winter__", first_number=1, name='Winter'),
+    Section("### __Spring__", first_number=11, name='Spring', lead='\n', new_lead='\n<hr>\n\n'),
+    Section("### __Summer__", first_number=21, name='Summer', lead='\n', new_lead='\n<hr>\n\n'),
+    Section("### __Fall__", first_number=31, name='Fall', lead='\n', new_lead='\n<hr>\n\n'),
+))
+
+CATEGORY_LAYOUTS = {
+    Challenge.GENRE: GENRE,
+    Challenge.TIMED: FLAT,
+    Challenge.TIER: FLAT,
+    Challenge.COLLECTION: FLAT,
+    Challenge.CLASSIC: CLASSIC,
+    Challenge.PUZZLE: FLAT,
+    Challenge.SPECIAL: FLAT,
+}
+
+UNKNOWN = ChallengeLayout('unknown', implemented=False)
+
+# Challenges recognised by a word in their name, checked in order, and what they change about their category's layout
+NAMED_LAYOUTS = (
+    ('Seasonal', {
+        'mock_count': 7,
+        'requirement_text': {'old': '{ordinal} Anime', 'new': '{ordinal} Anime'},
+        'default_extra': 'Ep: XX/XX',
+        'challenge_extra': "Seasonal Badge Vote (Optional): [Anime_Title](https://anilist.co/anime/00000/)",
+        'allows_up_to_date': True,
+    }),
+    ('Classic', {
+        'mock_count': 40,
+    }),
+)
+
+def compile_layouts():
+    """Returns every layout by (category, name word), with None for challenges not recognised by name"""
+    layouts = {}
+
+    for category, layout in list(CATEGORY_LAYOUTS.items()) + [(None, UNKNOWN)]:
+        layouts[(category, None)] = compile_layout(layout)
+
+        for word, changes in NAMED_LAYOUTS:
+            # A category's own text templates win over a named challenge's
+            requirement_text = dict(changes.get('requirement_text', {}), **layout.requirement_text)
+
+            layouts[(category, word)] = compile_layout(replace(layout, **dict(changes, requirement_text=requirement_text)))
+
+    return layouts
+
+LAYOUTS = compile_layouts()
+
+# Headers that any code may contain, for parsers that do not know the layout yet
+MODE_HEADERS = {section.header: section.mode for section in GENRE.sections if section.mode != Requirement.DEFAULT}
+SEASON_HEADERS = [section.header for section in CLASSIC.sections]
+SEASON_PREFIXES = tuple(header[:-len('__')] for header in SEASON_HEADERS)
+
+@functools.lru_cache(maxsize=256)
+def get_layout(name, category):
+    """Returns the compiled layout of a challenge"""
+    word = next((word for word, changes in NAMED_LAYOUTS if word in name), None)
+
+    if category not in CATEGORY_LAYOUTS:
+        category = None
+
+    return LAYOUTS[(category, word)]
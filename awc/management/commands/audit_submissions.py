@@ -0,0 +1,192 @@
+import itertools
+import json
+import os
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+
+from awc.audit import MAX_FAILED_SUBMISSIONS, PARSED, AuditSummary, SnapshotReader, SnapshotWriter, challenge_table, init_worker, parse_batch
+from awc.models import Challenge, Submission
+from awc.ratelimit import RateLimiter
+from awc.resilience import AnilistUnavailable
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+
+    while True:
+        batch = list(itertools.islice(iterator, size))
+
+        if not batch:
+            return
+
+        yield batch
+
+class Command(BaseCommand):
+    help = 'Parses the challenge code of every stored submission and summarises failures, formats and parse times per challenge'
+
+    # The views' shared client is used unless one is set here
+    anilist = None
+
+    def add_arguments(self, parser):
+        parser.add_argument('--challenge', action='append', dest='challenges', help='Only audit this challenge, can be repeated')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Parse worker processes')
+        parser.add_argument('--batch-size', type=int, default=50, help='Submissions fetched from Anilist and parsed together')
+        parser.add_argument('--snapshot', help='Gzipped comment snapshot to read instead of Anilist, written first if it does not exist')
+        parser.add_argument('--output', help='Write the full summary as JSON to this path')
+        parser.add_argument('--max-failed', type=int, default=MAX_FAILED_SUBMISSIONS,
+                            help='Failed submission ids listed for each challenge, beyond which only the count grows')
+        parser.add_argument('--skip-unchanged', action='store_true',
+                            help='Skip comments unchanged since they were last posted or parsed, and remember the ones that parse now')
+
+    def handle(self, *args, **options):
+        if self.anilist is None:
+            from awc.views import anilist
+            self.anilist = anilist
+
+        challenges = Challenge.objects.all()
+
+        if options['challenges']:
+            challenges = challenges.filter(name__in=options['challenges'])
+
+        table = challenge_table(challenges)
+        summary = AuditSummary({challenge_id: details['name'] for challenge_id, details in table.items()}, options['max_failed'])
+
+        submissions = (Submission.objects.filter(challenge_id__in=list(table))
+                                         .order_by('id')
+                                         .values_list('id', 'challenge_id', 'thread_id', 'comment_id', 'comment_fingerprint')
+                                         .iterator(chunk_size=2000))
+
+        snapshot = options['snapshot']
+        reader = SnapshotReader(snapshot) if snapshot and os.path.exists(snapshot) else None
+        writer = SnapshotWriter(snapshot) if snapshot and reader is None else None
+
+        workers = max(options['workers'], 1)
+
+        # New fingerprints of the comments being parsed, by submission id, kept if they parse
+        fingerprints = {} if options['skip_unchanged'] else None
+
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(table,)) as executor:
+                pending = set()
+
+                for batch in batched(submissions, options['batch_size']):
+                    jobs = []
+
+                    for (submission_id, challenge_id, thread_id, comment_id, fingerprint), comment in zip(batch, self.get_comments(batch, reader, writer)):
+                        if comment is None:
+                            summary.add_missing(submission_id, challenge_id)
+                            continue
+
+                        if fingerprints is not None:
+                            new_fingerprint = Submission.fingerprint(comment)
+
+                            if new_fingerprint == fingerprint:
+                                summary.add_unchanged(submission_id, challenge_id)
+                                continue
+
+                            fingerprints[submission_id] = new_fingerprint
+
+                        jobs.append((submission_id, challenge_id, comment))
+
+                    if jobs:
+                        pending.add(executor.submit(parse_batch, jobs))
+
+                    # Only a few batches are in flight, so memory stays flat however many submissions there are
+                    if len(pending) >= workers * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+                        for future in done:
+                            self.add_results(summary, future.result(), fingerprints)
+
+                for future in pending:
+                    self.add_results(summary, future.result(), fingerprints)
+        finally:
+            if reader:
+                reader.close()
+
+        if writer:
+            writer.close()
+
+        result = summary.to_dict()
+
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                json.dump(result, output_file, indent=2)
+
+        self.write_summary(result)
+
+    def add_results(self, summary, results, fingerprints):
+        summary.add(results)
+
+        if fingerprints is None:
+            return
+
+        parsed = []
+
+        for submission_id, challenge_id, status, code_format, error, seconds in results:
+            fingerprint = fingerprints.pop(submission_id)
+
+            # Failed comments keep their old fingerprint, so they are parsed again next time
+            if status == PARSED:
+                parsed.append(Submission(id=submission_id, comment_fingerprint=fingerprint))
+
+        Submission.objects.bulk_update(parsed, ['comment_fingerprint'])
+
+    def get_comments(self, batch, reader, writer):
+        """Returns the comment text of each submission in a batch, or None if it could not be found"""
+        comments = [None] * len(batch)
+        to_fetch = []
+
+        for i, (submission_id, challenge_id, thread_id, comment_id, fingerprint) in enumerate(batch):
+            found = False
+
+            if reader:
+                found, comments[i] = reader.get(submission_id, thread_id, comment_id)
+
+            if not found:
+                to_fetch.append(i)
+
+        if not to_fetch:
+            return comments
+
+        try:
+            posts = self.anilist.get_posts([(batch[i][2], batch[i][3]) for i in to_fetch], priority=RateLimiter.BULK)
+        except AnilistUnavailable as err:
+            self.stderr.write("Anilist is unavailable, {} submissions were not audited: {}".format(len(to_fetch), err))
+
+            return comments
+
+        for i, post in zip(to_fetch, posts):
+            comments[i] = post.comment if post else None
+
+            if writer:
+                writer.write(batch[i][0], batch[i][2], batch[i][3], comments[i])
+
+        return comments
+
+    def write_summary(self, result):
+        self.stdout.write("{:<40} {:>8} {:>8} {:>8} {:>8} {:>9} {:>10}  {}".format('Challenge', 'Total', 'Parsed', 'Failed', 'Missing', 'Unchanged', 'Mean ms', 'Formats'))
+
+        for challenge in result['challenges']:
+            formats = ', '.join('{} {}'.format(name, count) for name, count in sorted(challenge['formats'].items()))
+
+            self.stdout.write("{:<40} {:>8} {:>8} {:>8} {:>8} {:>9} {:>10}  {}".format(challenge['name'][:40],
+                                                                                     challenge['submissions'],
+                                                                                     challenge['parsed'],
+                                                                                     challenge['failed'],
+                                                                                     challenge['missing'],
+                                                                                     challenge['unchanged'],
+                                                                                     challenge['parse_ms']['mean'],
+                                                                                     formats))
+
+            for error, count in challenge['errors'].items():
+                self.stdout.write("    {} x {}".format(count, error))
+
+        totals = result['totals']
+
+        self.stdout.write("{} submissions: {} parsed, {} failed, {} missing, {} unchanged".format(totals.get('submissions', 0),
+                                                                                                totals.get('parsed', 0),
+                                                                                                totals.get('failed', 0),
+                                                                                                totals.get('missing', 0),
+                                                                                                totals.get('unchanged', 0)))
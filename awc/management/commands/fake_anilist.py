@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from awc.fakeanilist import FakeAnilistData, FakeAnilistServer
+
+class Command(BaseCommand):
+    help = 'Runs a local fake Anilist API seeded with generated data, for offline development and benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8001)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--media', type=int, default=500)
+        parser.add_argument('--latency', type=float, default=0, help='Seconds added to every response')
+        parser.add_argument('--jitter', type=float, default=0, help='Up to this many extra random seconds per response')
+        parser.add_argument('--failure-rate', type=float, default=0, help='Fraction of requests that fail')
+        parser.add_argument('--failure-status', type=int, default=500)
+        parser.add_argument('--rate-limit', type=int, default=90, help='Requests allowed per minute before 429s')
+
+    def handle(self, *args, **options):
+        data = FakeAnilistData(seed=options['seed'], users=options['users'], media=options['media'])
+
+        server = FakeAnilistServer((options['host'], options['port']), data=data,
+                                   latency=options['latency'],
+                                   jitter=options['jitter'],
+                                   failure_rate=options['failure_rate'],
+                                   failure_status=options['failure_status'],
+                                   rate_limit=options['rate_limit'],
+                                   seed=options['seed'],
+                                   verbose=options['verbosity'] > 1)
+
+        self.stdout.write("Fake Anilist running, set ANILIST_API_URL={} and ANILIST_AUTH_URL={}".format(server.api_url, server.auth_url))
+        self.stdout.write("Log in with authorisation codes code-1 to code-{}".format(options['users']))
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
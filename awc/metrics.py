@@ -0,0 +1,196 @@
+import bisect
+import contextlib
+import contextvars
+import threading
+
+from dataclasses import asdict, dataclass
+
+# Upper bounds of each bucket; anything larger lands in the overflow bucket
+LATENCY_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+_request_calls = contextvars.ContextVar('anilist_request_calls', default=None)
+_cache_status = contextvars.ContextVar('anilist_cache_status', default=None)
+
+def _header_int(headers, name):
+    try:
+        return int(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+def start_request():
+    """Starts collecting the Anilist calls made in the current context, returning a token for end_request"""
+    return _request_calls.set([])
+
+def end_request(token):
+    """Returns the calls collected since start_request and stops collecting"""
+    calls = _request_calls.get()
+    _request_calls.reset(token)
+
+    return calls or []
+
+def request_calls():
+    return list(_request_calls.get() or [])
+
+@contextlib.contextmanager
+def cache_status(status):
+    """Tags Anilist calls made inside the block with a cache 'hit' or 'miss'"""
+    token = _cache_status.set(status)
+
+    try:
+        yield
+    finally:
+        _cache_status.reset(token)
+
+@dataclass(slots=True)
+class AnilistCall:
+    operation: str
+    latency_ms: float = 0.0
+    response_bytes: int = 0
+    status: int = None
+    retries: int = 0
+    cache: str = None
+    rate_limit_limit: int = None
+    rate_limit_remaining: int = None
+    retry_after: int = None
+
+    def __post_init__(self):
+        if self.cache is None:
+            self.cache = _cache_status.get()
+
+    def observe_response(self, status_code, headers, response_bytes):
+        self.status = status_code
+        self.response_bytes = response_bytes
+        self.rate_limit_limit = _header_int(headers, 'X-RateLimit-Limit')
+        self.rate_limit_remaining = _header_int(headers, 'X-RateLimit-Remaining')
+        self.retry_after = _header_int(headers, 'Retry-After')
+
+    def to_dict(self):
+        return asdict(self)
+
+class Histogram(object):
+    '''Fixed bucket histogram, cheap enough to update on every Anilist call'''
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, percent):
+        """Returns the upper bound of the bucket holding the given percentile"""
+        if not self.count:
+            return 0
+
+        rank = self.count * percent / 100
+        seen = 0
+
+        for i, count in enumerate(self.counts):
+            seen += count
+
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else self.max
+
+        return self.max
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'mean': self.total / self.count if self.count else 0,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'buckets': dict(zip([str(bound) for bound in self.buckets] + ['+Inf'], self.counts)),
+        }
+
+class _OperationStats(object):
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.statuses = {}
+        self.rate_limit_remaining = None
+
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.response_bytes = Histogram(SIZE_BUCKETS)
+
+    def observe(self, call):
+        if call.cache == 'hit':
+            self.cache_hits += 1
+            return
+
+        if call.cache == 'miss':
+            self.cache_misses += 1
+
+        self.calls += 1
+        self.retries += call.retries
+        self.latency.observe(call.latency_ms)
+        self.response_bytes.observe(call.response_bytes)
+
+        self.statuses[call.status] = self.statuses.get(call.status, 0) + 1
+
+        if call.status is None or call.status >= 400:
+            self.errors += 1
+
+        if call.rate_limit_remaining is not None:
+            self.rate_limit_remaining = call.rate_limit_remaining
+
+    def snapshot(self):
+        lookups = self.cache_hits + self.cache_misses
+
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'retries': self.retries,
+            'statuses': {str(status): count for status, count in self.statuses.items()},
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'cache_hit_rate': self.cache_hits / lookups if lookups else 0.0,
+            'rate_limit_remaining': self.rate_limit_remaining,
+            'latency_ms': self.latency.snapshot(),
+            'response_bytes': self.response_bytes.snapshot(),
+        }
+
+class AnilistMetrics(object):
+    '''In-process histograms of outbound Anilist calls, per operation
+
+    Every call is also appended to the current request's call list when one was started,
+    so a single view can be broken down separately from the worker totals.
+    '''
+
+    def __init__(self):
+        self._operations = {}
+        self._lock = threading.Lock()
+
+    def record(self, call):
+        with self._lock:
+            stats = self._operations.get(call.operation)
+
+            if stats is None:
+                stats = self._operations[call.operation] = _OperationStats()
+
+            stats.observe(call)
+
+        calls = _request_calls.get()
+
+        if calls is not None:
+            calls.append(call)
+
+    def snapshot(self):
+        with self._lock:
+            return {operation: stats.snapshot() for operation, stats in sorted(self._operations.items())}
+
+    def reset(self):
+        with self._lock:
+            self._operations.clear()
@@ -0,0 +1,25 @@
+from .metrics import end_request, start_request
+
+class AnilistMetricsMiddleware:
+    '''Collects the Anilist calls made while handling a request and reports them in a Server-Timing header'''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = start_request()
+
+        try:
+            response = self.get_response(request)
+        finally:
+            calls = end_request(token)
+
+        request.anilist_calls = calls
+
+        if calls:
+            latency = sum(call.latency_ms for call in calls)
+            hits = sum(1 for call in calls if call.cache == 'hit')
+
+            response['Server-Timing'] = 'anilist;dur={:.1f};desc="{} calls, {} cached"'.format(latency, len(calls), hits)
+
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('awc', '0014_submission_submission_thread_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='comment_fingerprint',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2 on 2026-10-18 12:00
+
+import awc.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('awc', '0015_submission_comment_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='challenge',
+            name='version',
+            field=models.CharField(default=awc.models.new_version, editable=False, max_length=32),
+        ),
+    ]
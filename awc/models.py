@@ -1,7 +1,13 @@
+import hashlib
+import uuid
+
 from django.db import models
 
 from core.models import User
 
+def new_version():
+    return uuid.uuid4().hex
+
 # Challenge Defaults Models
 class Challenge(models.Model):
     GENRE = 'GEN'
@@ -36,10 +42,21 @@ class Challenge(models.Model):
     allows_up_to_date = models.BooleanField(default=False)
     
     archived = models.BooleanField(default=False)
+
+    # Replaced whenever the challenge, its requirements or its prerequisites change (see signals.py),
+    # so every worker stops reading what it cached for the challenge before
+    version = models.CharField(max_length=32, default=new_version, editable=False)
     
     def __str__(self):
         return self.name
 
+    @property
+    def layout(self):
+        """Returns the compiled layout of the challenge's code"""
+        from .layouts import get_layout
+
+        return get_layout(self.name, self.category)
+
 class Requirement(models.Model):
     # Difficulty mode stuff
     DEFAULT = 'D'
@@ -102,5 +119,24 @@ class Submission(models.Model):
     submission_comment_id = models.IntegerField(blank=True, null=True)
     submission_thread_id = models.IntegerField(default=4446) # default set to old submission thread id since field did not previously exist
 
+    # Of the comment last posted to Anilist, or fetched from it and parsed, so unchanged comments are not sent again
+    comment_fingerprint = models.CharField(max_length=64, blank=True, default='')
+
     def __str__(self):
         return "{} Submission".format(self.challenge)
+
+    @staticmethod
+    def fingerprint(comment):
+        return hashlib.sha256(comment.encode()).hexdigest()
+
+    def is_unchanged(self, comment):
+        """Returns whether a comment is the one last posted or parsed for this submission"""
+        return self.comment_fingerprint == Submission.fingerprint(comment)
+
+    def remember_comment(self, comment):
+        """Stores the fingerprint of a comment that was posted or parsed, if it is new"""
+        fingerprint = Submission.fingerprint(comment)
+
+        if fingerprint != self.comment_fingerprint:
+            self.comment_fingerprint = fingerprint
+            self.save(update_fields=['comment_fingerprint'])
@@ -0,0 +1,474 @@
+import collections
+import functools
+import re
+import traceback
+
+from dataclasses import dataclass
+from datetime import date, datetime
+
+from .challengestate import ChallengeState, ParsedRequirement
+from .layouts import MODE_HEADERS, SEASON_HEADERS, SEASON_PREFIXES
+from .models import Requirement
+
+# Line kinds, decided once per line by Line
+TEXT = 'text'
+REQUIREMENT = 'requirement'
+MODE = 'mode'
+SEPARATOR = 'separator'
+RULE = 'rule'
+
+# When a group holds more than one mode header, only the first of these is treated as one
+MODE_PRIORITY = list(MODE_HEADERS)
+
+# The first mode header also marks where new format requirements start
+FIRST_MODE = MODE_PRIORITY[0].strip('_')
+
+# Requirement layouts, told apart by where a requirement's dates are
+OLD = 'old'
+NEW = 'new'
+
+NUMBER_PATTERN = re.compile(r'([0-9]+)[.\)]')
+LEGEND_PATTERN = re.compile(r'(\[.?\]) = ([a-zA-Z0-9\- ]+)')
+PREREQUISITE_PATTERN = re.compile(r'\[(.+?)\]')
+START_DATE_PATTERN = re.compile(r'Start Date: ([DMY0-9/\-]+)')
+FINISH_DATE_PATTERN = re.compile(r'Finish Date: ([DMY0-9/\-]+)')
+ISO_DATE_PATTERN = re.compile(r'[0-9]{4}-[0-9]{2}-[0-9]{2}')
+
+# Old format: "01) [X] Start: YYYY-MM-DD Finish: YYYY-MM-DD __Text__ [Anime](link) extra" on one line
+COMPLETED_PATTERN = re.compile(r'[0-9]+\) \[(.+?)\]')
+START_PATTERN = re.compile(r'Start: ([DMY0-9/\-]+)\s')
+FINISH_PATTERN = re.compile(r'Finish: ([DMY0-9/\-]+)')
+ANIME_PATTERN = re.compile(r'\[.+?\].*?\[(.+?)\]')
+EXTRA_PATTERN = re.compile(r'\(https:\/\/anilist\.co\/anime\/[a-zA-Z0-9-\/]+\)(.*)')
+
+# New format: the same requirement over three lines, with the extra after "//" on the dates line
+NEW_COMPLETED_PATTERN = re.compile(r'\[([XOU])\]')
+NEW_ANIME_PATTERN = re.compile(r'\[(.+?)\]')
+
+LINK_PATTERN = re.compile(r'\((https:\/\/anilist\.co\/anime\/[0-9]+)')
+ANIME_ID_PATTERN = re.compile(r'https:\/\/anilist\.co\/anime\/([0-9]+)')
+
+class ParseError(ValueError):
+    '''Raised when a challenge code does not follow the AWC format'''
+
+@functools.lru_cache(maxsize=1024)
+def convert_date(raw_date):
+    raw_date = raw_date.strip()
+
+    if "DD" in raw_date:
+        return raw_date
+
+    # Most dates are already ISO, which skips trying the other formats first
+    if ISO_DATE_PATTERN.fullmatch(raw_date):
+        try:
+            return date.fromisoformat(raw_date).isoformat()
+        except ValueError:
+            pass
+
+    for date_format in ('%d/%m/%Y', '%m/%d/%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(raw_date, date_format).strftime('%Y-%m-%d')
+        except ValueError:
+            pass
+
+    raise ParseError("Unrecognised date: {}".format(raw_date))
+
+def search(pattern, text):
+    match = pattern.search(text)
+
+    if match is None:
+        raise ParseError("Expected {} in: {}".format(pattern.pattern, text))
+
+    return match.group(1)
+
+@dataclass(frozen=True, slots=True)
+class MockRequirement:
+    '''Non-functional requirement class for challenges without database requirements'''
+
+    number: int
+    mode: str = Requirement.DEFAULT
+    text: str = ''
+    bonus: bool = False
+    extra: str = ''
+    extra_newline: bool = False
+    anime_title: str = ''
+    anime_list: str = ''
+    force_raw_edit: bool = False
+    raw_requirement: str = ''
+
+class MockRequirementSet(tuple):
+    '''Non-functional requirements list class'''
+
+    def __new__(cls, item_count):
+        return super().__new__(cls, (MockRequirement(i + 1) for i in range(item_count)))
+
+@functools.lru_cache(maxsize=None)
+def mock_requirement_set(item_count):
+    """Returns the shared mock requirements for a challenge without database requirements"""
+    return MockRequirementSet(item_count)
+
+class Line(object):
+    '''A comment line with its kind, classified once up front'''
+
+    __slots__ = ('text', 'kind', 'bonus')
+
+    def __init__(self, text):
+        self.text = text
+        self.bonus = False
+
+        first = text[:1]
+
+        if first == 'B' and len(text) > 1 and text[1].isdigit():
+            self.kind = REQUIREMENT
+            self.bonus = True
+        elif first.isdigit():
+            self.kind = REQUIREMENT
+        elif text in MODE_HEADERS:
+            self.kind = MODE
+        elif text == '---':
+            self.kind = SEPARATOR
+        elif text == '<hr>':
+            self.kind = RULE
+        else:
+            self.kind = TEXT
+
+    def check_bonus(self):
+        # A lone "B" used to fail the whole parse when checked for a bonus number
+        if self.text == 'B':
+            raise ParseError("Incomplete bonus requirement line")
+
+CodeFormat = collections.namedtuple('CodeFormat', ['layout', 'prerequisites', 'seasons'])
+
+class Tokens(object):
+    '''A comment split into classified lines and blank-line separated groups in a single pass
+
+    The same pass finds the requirement layout: old format requirements have their dates on the
+    requirement line, while new format ones have them on a line of their own starting with
+    "Start: ". Comments with neither, e.g. only raw requirements, are read as the old format.
+    '''
+
+    def __init__(self, comment):
+        self.comment = comment
+        self.lines = []
+        self.legend_index = None
+        self.new_format_index = None
+        self.layout = None
+        self.has_seasons = False
+
+        for i, text in enumerate(comment.splitlines()):
+            line = Line(text)
+            self.lines.append(line)
+
+            if self.legend_index is None and 'Legend' in text:
+                self.legend_index = i
+
+            # Only requirement lines count, as prerequisite links can end in "01)" too
+            if self.new_format_index is None and ((line.kind == REQUIREMENT and '01)' in text) or FIRST_MODE in text):
+                self.new_format_index = i
+
+            if self.layout is None:
+                if line.kind == REQUIREMENT and START_PATTERN.search(text):
+                    self.layout = OLD
+                elif text.startswith('Start: '):
+                    self.layout = NEW
+
+            if not self.has_seasons and text.startswith(SEASON_PREFIXES):
+                self.has_seasons = True
+
+        if self.layout is None:
+            self.layout = OLD
+
+    def groups(self, start=0):
+        groups = []
+        group = []
+
+        for line in self.lines[start:]:
+            if line.text == '':
+                if group:
+                    groups.append(group)
+                    group = []
+            else:
+                group.append(line)
+
+        if group:
+            groups.append(group)
+
+        return groups
+
+def remove_first(group, text):
+    for i, line in enumerate(group):
+        if line.text == text:
+            del group[i]
+            return True
+
+    return False
+
+def take_mode(group, mode):
+    """Removes the group's "---" and mode header lines, returning the mode that now applies"""
+    remove_first(group, '---')
+
+    headers = set(line.text for line in group if line.kind == MODE)
+
+    for header in MODE_PRIORITY:
+        if header in headers:
+            remove_first(group, header)
+            return MODE_HEADERS[header]
+
+    return mode
+
+class ChallengeCodeParser(object):
+    '''Parses a user's challenge code comment for a challenge into a ChallengeState
+
+    Comments come in two layouts. The old format keeps each requirement on one line, with its
+    extra info on the lines after it; the new format spreads a requirement over three lines and
+    separates requirements with blank lines. Both share the header, and the layout is detected
+    while tokenising so each comment goes down one path only.
+    '''
+
+    def __init__(self, challenge, requirements=None, has_prerequisites=None):
+        self.challenge = challenge
+        self.has_prerequisites = has_prerequisites
+        self._requirements = requirements
+        self._index = None
+        self._count = None
+
+    def requirement_index(self):
+        """Returns the challenge's requirements by (number, bonus), loading them on first use"""
+        if self._index is None:
+            mock_count = self.challenge.layout.mock_count
+
+            if mock_count is not None:
+                requirements = mock_requirement_set(mock_count)
+            elif self._requirements is not None:
+                requirements = self._requirements
+            else:
+                requirements = self.challenge.requirement_set.all()
+
+            self._index = {}
+            self._count = 0
+
+            for requirement in requirements:
+                self._index[(requirement.number, requirement.bonus)] = requirement
+                self._count += 1
+
+        return self._index
+
+    def requirement(self, number, bonus):
+        key = (int(number), bonus)
+        requirement = self.requirement_index().get(key)
+
+        if requirement is not None:
+            return requirement
+
+        # Mock challenges accept any requirement number
+        if not self.challenge.layout.needs_requirements:
+            return MockRequirement(number=key[0])
+
+        raise Requirement.DoesNotExist("{} has no requirement {}{}".format(self.challenge.name, 'B' if bonus else '', number))
+
+    def requirement_count(self):
+        self.requirement_index()
+
+        return self._count
+
+    def parse(self, comment):
+        """Returns the ChallengeState of a challenge code"""
+        try:
+            return self._parse(Tokens(comment))
+        except Exception:
+            return ChallengeState().fail(traceback.format_exc(), comment)
+
+    def parse_new(self, comment, tokens=None, state=None):
+        """Returns the ChallengeState of the new format requirements, filling in state if given"""
+        state = state or ChallengeState()
+
+        try:
+            return self._parse_new(tokens or Tokens(comment), state)
+        except Exception:
+            return state.fail(traceback.format_exc(), comment)
+
+    def detect_format(self, tokens):
+        """Returns the format of a tokenised comment"""
+        if self.has_prerequisites is None:
+            self.has_prerequisites = self.challenge.prerequisites.exists()
+
+        return CodeFormat(tokens.layout, self.has_prerequisites, tokens.has_seasons)
+
+    def _parse(self, tokens):
+        state = ChallengeState()
+        groups = tokens.groups()
+        code_format = self.detect_format(tokens)
+
+        if tokens.legend_index is None:
+            raise ParseError("No legend found")
+
+        state.legend = {}
+
+        for symbol, name in LEGEND_PATTERN.findall(tokens.lines[tokens.legend_index].text):
+            state.legend[name.strip()] = symbol[1:-1]
+
+        if code_format.prerequisites:
+            state.prerequisites = {}
+
+            for line in groups.pop(1):
+                prerequisite_finish = FINISH_DATE_PATTERN.search(line.text)
+
+                state.prerequisites[search(PREREQUISITE_PATTERN, line.text)] = convert_date(prerequisite_finish.group(1) if prerequisite_finish else 'YYYY-MM-DD')
+
+        state.category = self.challenge.category
+
+        # The dates are their own group, or follow the title when there is no blank line between them
+        try:
+            state.start = convert_date(search(START_DATE_PATTERN, groups[1][0].text))
+            state.finish = convert_date(search(FINISH_DATE_PATTERN, groups[1][1].text))
+            requirement_groups = groups[2:]
+        except (IndexError, ParseError):
+            state.start = convert_date(search(START_DATE_PATTERN, groups[0][1].text))
+            state.finish = convert_date(search(FINISH_DATE_PATTERN, groups[0][2].text))
+            requirement_groups = groups[1:]
+
+        state.is_new_format = code_format.layout == NEW
+        state.format = code_format
+
+        if code_format.layout == NEW:
+            return self.parse_new(tokens.comment, tokens, state)
+
+        requirements = []
+        previous = None
+        mode = Requirement.DEFAULT
+        last = len(requirement_groups) - 1
+
+        for i, group in enumerate(requirement_groups):
+            mode = take_mode(group, mode)
+
+            # The challenge extra is only recognised at the group it lands on in a generated comment
+            if i == last and i == (1 if mode == Requirement.DEFAULT else 4):
+                state.extra = '\n'.join(line.text for line in group)
+                break
+
+            for line in group:
+                line.check_bonus()
+
+                if line.kind == REQUIREMENT:
+                    previous = self._parse_old_requirement(line, mode)
+                    requirements.append(previous)
+                elif previous and not any(prefix in line.text for prefix in SEASON_PREFIXES):
+                    # Any other line is extra info for the requirement above it
+                    if previous.force_raw_edit:
+                        previous.raw_requirement += '\n' + line.text
+                    elif previous.extra.isspace() or previous.extra == '':
+                        previous.extra = line.text
+                    else:
+                        previous.extra += '\n' + line.text
+
+        state.requirements = requirements
+
+        return state
+
+    def _parse_old_requirement(self, line, mode):
+        """Returns the requirement on an old format line"""
+        text = line.text
+        number = search(NUMBER_PATTERN, text)
+
+        requirement = ParsedRequirement(number if line.bonus else number.zfill(2), mode, line.bonus)
+
+        req_from_db = self.requirement(requirement.number, line.bonus)
+
+        requirement.force_raw_edit = req_from_db.force_raw_edit
+
+        if req_from_db.force_raw_edit:
+            requirement.raw_requirement = text
+
+            return requirement
+
+        requirement.completed = search(COMPLETED_PATTERN, text)
+
+        requirement.start = convert_date(search(START_PATTERN, text))
+        requirement.finish = convert_date(search(FINISH_PATTERN, text))
+        requirement.text = req_from_db.text
+
+        self._set_anime(requirement, req_from_db, ANIME_PATTERN, text)
+
+        requirement.extra_newline = req_from_db.extra_newline
+
+        extra = EXTRA_PATTERN.search(text)
+        requirement.extra = extra.group(1) if extra else ''
+
+        return requirement
+
+    def _parse_new(self, tokens, state):
+        if tokens.new_format_index is None:
+            raise ParseError("No requirements found")
+
+        requirements = []
+
+        groups = [group for group in tokens.groups(tokens.new_format_index) if not (len(group) == 1 and group[0].text == '<hr>')]
+
+        mode = Requirement.DEFAULT
+        last = len(groups) - 1
+        requirement_count = None
+
+        for i, group in enumerate(groups):
+            mode = take_mode(group, mode)
+
+            for header in SEASON_HEADERS:
+                if remove_first(group, header):
+                    break
+
+            if i == last:
+                if requirement_count is None:
+                    requirement_count = self.requirement_count()
+
+                # A group past the challenge's requirements is the challenge extra
+                if len(groups) != requirement_count:
+                    state.extra = '\n'.join(line.text for line in group)
+                    break
+
+            if not group:
+                raise ParseError("Empty requirement")
+
+            first = group[0]
+            first.check_bonus()
+
+            requirement = ParsedRequirement(search(NUMBER_PATTERN, first.text), mode, first.bonus)
+
+            req_from_db = self.requirement(requirement.number, first.bonus)
+
+            requirement.force_raw_edit = req_from_db.force_raw_edit
+
+            if req_from_db.force_raw_edit:
+                requirement.raw_requirement = '\n'.join(line.text for line in group)
+            else:
+                if len(group) < 3:
+                    raise ParseError("Requirement {} is missing lines".format(requirement.number))
+
+                requirement.completed = search(NEW_COMPLETED_PATTERN, first.text)
+
+                # "Start: YYYY-MM-DD Finish: YYYY-MM-DD"
+                requirement.start = convert_date(group[2].text[7:17])
+                requirement.finish = convert_date(group[2].text[26:36])
+                requirement.text = req_from_db.text
+
+                self._set_anime(requirement, req_from_db, NEW_ANIME_PATTERN, group[1].text)
+
+                extra = group[2].text.split('//', 1)
+                requirement.extra = extra[1] if len(extra) > 1 else ''
+
+            requirements.append(requirement)
+
+        state.requirements = requirements
+
+        return state
+
+    @staticmethod
+    def _set_anime(requirement, req_from_db, anime_pattern, text):
+        if req_from_db.anime_title:
+            requirement.anime = req_from_db.anime_title
+            requirement.link = req_from_db.anime_link
+            requirement.has_set_anime = True
+        else:
+            requirement.anime = search(anime_pattern, text)
+            requirement.link = search(LINK_PATTERN, text)
+            requirement.has_set_anime = False
+
+        requirement.anime_id = int(search(ANIME_ID_PATTERN, requirement.link))
@@ -0,0 +1,83 @@
+import re
+
+from .formstate import FormState, RequirementFields
+from .skeletons import RAW_REQUIREMENT, fill_slot, skeleton_cache, compile_skeleton
+
+# Links to an anime, with anything after its id, as the parser only keeps the id
+ANIME_LINK_PATTERN = re.compile(r'\((https:\/\/anilist\.co\/anime\/[0-9]+)[^)]*\)')
+
+class PatchError(ValueError):
+    '''Raised when a requirement cannot be rewritten on its own, so the whole edit form has to be sent'''
+
+def requirement_key(requirement):
+    """Returns the suffix of a parsed requirement's edit form fields"""
+    return 'bonus-' + requirement.number if requirement.bonus else requirement.number
+
+def find_requirement(state, key):
+    for requirement in state.requirements:
+        if requirement_key(requirement) == key:
+            return requirement
+
+    raise PatchError("Requirement {} is not in your challenge code".format(key))
+
+def comparable_line(line):
+    """Returns a line as the parser reads it, with Anilist links cut down to their id and no trailing spaces"""
+    return ANIME_LINK_PATTERN.sub(r'(\1)', line).rstrip()
+
+def replace_block(comment, old, new):
+    """Returns comment with the lines that read as old replaced by new"""
+    old_lines = [comparable_line(line) for line in old.rstrip('\n').split('\n')]
+    new_lines = new.rstrip('\n').split('\n')
+
+    # Lines are only compared in full where they start with the requirement's number
+    number = old_lines[0][:old_lines[0].find(')') + 1]
+
+    lines = comment.split('\n')
+    size = len(old_lines)
+    matches = [i for i, line in enumerate(lines)
+               if line.startswith(number) and [comparable_line(line) for line in lines[i:i + size]] == old_lines]
+
+    if len(matches) != 1:
+        raise PatchError("Your challenge code has been changed outside of this page")
+
+    start = matches[0]
+
+    return '\n'.join(lines[:start] + new_lines + lines[start + size:])
+
+def patch_requirement(challenge, comment, state, key, form, user=None):
+    """Returns a comment with one requirement rewritten from a FormState, and the requirement's new
+    text, where state is the comment's parse
+
+    Only that requirement's slot of the challenge's skeleton is filled in, once with the fields the
+    comment has now and once with the form's changes, and the old text is swapped for the new.
+    """
+    if state.failed:
+        raise PatchError(state.error)
+
+    requirement = find_requirement(state, key)
+    post_format = 'new' if state.is_new_format else 'old'
+
+    skeleton = skeleton_cache.get_or_compile(challenge, post_format, lambda: compile_skeleton(challenge, post_format))
+    slot = skeleton.requirement_slot(key)
+
+    if slot is None or (slot[0] == RAW_REQUIREMENT) != requirement.force_raw_edit:
+        raise PatchError("Requirement {} is not written the way this challenge writes it".format(key))
+
+    if requirement.force_raw_edit:
+        raw = form.raw_requirements.get(key)
+
+        before = FormState(raw_requirements={key: requirement.raw_requirement})
+        after = FormState(raw_requirements={key: requirement.raw_requirement if raw is None else raw})
+    else:
+        fields = RequirementFields.from_requirement(requirement)
+
+        before = FormState(requirements={key: fields})
+        after = FormState(requirements={key: fields.updated(form.requirement(key))})
+
+        # Another mode moves the requirement to another section, which only the whole comment can do
+        if not skeleton.fits(after):
+            raise PatchError("Changing the mode of requirement {} needs the whole challenge code to be updated".format(key))
+
+    text = fill_slot(slot, after, user)
+
+    return replace_block(comment, fill_slot(slot, before, user), text), text
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError: # Windows has no flock, so only threads are coordinated there
+    fcntl = None
+
+class RateLimitTimeout(Exception):
+    '''Raised when a request could not get a token before its deadline'''
+
+class RateLimiter(object):
+    '''Token bucket for outbound Anilist calls shared by every worker through a locked state file'''
+
+    INTERACTIVE = 'interactive'
+    BULK = 'bulk'
+
+    def __init__(self, path, capacity=90, period=60, bulk_reserve=0.3):
+        self.path = path
+        self.capacity = capacity
+        self.period = period
+        self.bulk_reserve = bulk_reserve
+
+        self._thread_lock = threading.Lock()
+
+    def _load(self, state_file, now):
+        state_file.seek(0)
+
+        try:
+            state = json.loads(state_file.read())
+        except ValueError:
+            state = {}
+
+        state.setdefault('capacity', self.capacity)
+        state.setdefault('tokens', state['capacity'])
+        state.setdefault('updated', now)
+        state.setdefault('blocked_until', 0)
+
+        # Refills the bucket for the time that has passed since the last call
+        elapsed = max(0, now - state['updated'])
+        state['tokens'] = min(state['capacity'], state['tokens'] + elapsed * state['capacity'] / self.period)
+        state['updated'] = now
+
+        return state
+
+    def _save(self, state_file, state):
+        state_file.seek(0)
+        state_file.truncate()
+        state_file.write(json.dumps(state))
+        state_file.flush()
+
+    def _locked(self, callback):
+        with self._thread_lock:
+            with open(self.path, 'a+') as state_file:
+                if fcntl:
+                    fcntl.flock(state_file, fcntl.LOCK_EX)
+
+                try:
+                    now = time.time()
+                    state = self._load(state_file, now)
+                    result = callback(state, now)
+                    self._save(state_file, state)
+                finally:
+                    if fcntl:
+                        fcntl.flock(state_file, fcntl.LOCK_UN)
+
+        return result
+
+    def reserve(self, priority=INTERACTIVE):
+        """Takes a token if one is free and returns 0, otherwise returns the seconds to wait"""
+        def take(state, now):
+            if state['blocked_until'] > now:
+                return state['blocked_until'] - now
+
+            # Bulk calls leave part of the bucket for interactive pages
+            if priority == self.BULK:
+                needed = 1 + self.bulk_reserve * state['capacity']
+            else:
+                needed = 1
+
+            if state['tokens'] >= needed:
+                state['tokens'] -= 1
+                return 0
+
+            return (needed - state['tokens']) * self.period / state['capacity']
+
+        return self._locked(take)
+
+    def acquire(self, priority=INTERACTIVE, timeout=None):
+        deadline = None if timeout is None else time.time() + timeout
+
+        while True:
+            wait = self.reserve(priority)
+
+            if not wait:
+                return
+
+            if deadline is not None and time.time() + wait > deadline:
+                raise RateLimitTimeout("Anilist rate limit wait of {:.1f}s exceeds the deadline".format(wait))
+
+            time.sleep(wait)
+
+    async def acquire_async(self, priority=INTERACTIVE, timeout=None):
+        deadline = None if timeout is None else time.time() + timeout
+
+        while True:
+            wait = self.reserve(priority)
+
+            if not wait:
+                return
+
+            if deadline is not None and time.time() + wait > deadline:
+                raise RateLimitTimeout("Anilist rate limit wait of {:.1f}s exceeds the deadline".format(wait))
+
+            await asyncio.sleep(wait)
+
+    def update(self, status_code, headers):
+        """Syncs the bucket with the rate limit headers Anilist sent back"""
+        limit = headers.get('X-RateLimit-Limit')
+        remaining = headers.get('X-RateLimit-Remaining')
+        retry_after = headers.get('Retry-After')
+
+        if limit is None and remaining is None and retry_after is None and status_code != 429:
+            return
+
+        def sync(state, now):
+            if limit is not None and limit.isdigit():
+                state['capacity'] = int(limit)
+
+            # Anilist's count is authoritative, but other workers may have spent tokens since
+            if remaining is not None and remaining.isdigit():
+                state['tokens'] = min(state['tokens'], int(remaining))
+
+            if status_code == 429:
+                state['tokens'] = 0
+
+                try:
+                    wait = float(retry_after)
+                except (TypeError, ValueError):
+                    wait = self.period
+
+                state['blocked_until'] = max(state['blocked_until'], now + wait)
+
+        self._locked(sync)
+
+    def status(self):
+        return self._locked(lambda state, now: dict(state))
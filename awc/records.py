@@ -0,0 +1,137 @@
+import json
+
+from dataclasses import dataclass
+from datetime import date
+
+try:
+    import orjson
+except ImportError: # The standard library decoder is used when orjson is not installed
+    orjson = None
+
+if orjson:
+    loads = orjson.loads
+else:
+    loads = json.loads
+
+class GraphQLError(Exception):
+    '''Raised when Anilist answers a query with errors instead of data'''
+
+    def __init__(self, errors):
+        self.errors = errors
+        self.status = errors[0].get('status') if errors else None
+
+        super().__init__('; '.join(error.get('message', 'Unknown error') for error in errors))
+
+def decode_response(response):
+    """Returns the (data, extensions) of a GraphQL response, raising GraphQLError if there is no data"""
+    response_data = loads(response)
+
+    data = response_data.get('data')
+    errors = response_data.get('errors')
+
+    if not data or (errors and not any(data.values())):
+        raise GraphQLError(errors or [{'message': 'Anilist returned no data'}])
+
+    return data, response_data.get('extensions') or {}
+
+def decode_data(response):
+    return decode_response(response)[0]
+
+@dataclass(slots=True)
+class FuzzyDate:
+    year: int = None
+    month: int = None
+    day: int = None
+
+    @classmethod
+    def from_dict(cls, data):
+        if not data:
+            return cls()
+
+        return cls(data.get('year'), data.get('month'), data.get('day'))
+
+    def isoformat(self):
+        if self.year is None or self.month is None or self.day is None:
+            return 'YYYY-MM-DD'
+
+        return date(self.year, self.month, self.day).isoformat()
+
+    def __str__(self):
+        return self.isoformat()
+
+@dataclass(slots=True)
+class MediaListEntry:
+    id: int
+    status: str = None
+    progress: int = None
+    repeat: int = None
+    started_at: FuzzyDate = None
+    completed_at: FuzzyDate = None
+
+    @classmethod
+    def from_dict(cls, data):
+        if data is None:
+            return None
+
+        return cls(data['id'],
+                   data.get('status'),
+                   data.get('progress'),
+                   data.get('repeat'),
+                   FuzzyDate.from_dict(data.get('startedAt')),
+                   FuzzyDate.from_dict(data.get('completedAt')))
+
+@dataclass(slots=True)
+class Media:
+    id: int
+    title: str = ''
+    cover_image: str = ''
+    episodes: int = None
+    media_list_entry: MediaListEntry = None
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['id'],
+                   (data.get('title') or {}).get('userPreferred', ''),
+                   (data.get('coverImage') or {}).get('large', ''),
+                   data.get('episodes'),
+                   MediaListEntry.from_dict(data.get('mediaListEntry')))
+
+    def to_json(self):
+        """Returns the compact form sent to the anime search modal"""
+        entry = self.media_list_entry
+
+        return {
+            'id': self.id,
+            'title': self.title,
+            'cover_image': self.cover_image,
+            'status': entry.status if entry else None,
+            'started_at': entry.started_at.isoformat() if entry else None,
+            'completed_at': entry.completed_at.isoformat() if entry else None,
+        }
+
+@dataclass(slots=True)
+class ThreadComment:
+    id: int
+    thread_id: int = None
+    comment: str = ''
+    stale: bool = False
+
+    @classmethod
+    def from_dict(cls, data, stale=False):
+        return cls(data['id'], data.get('threadId'), data.get('comment', ''), stale)
+
+@dataclass(slots=True)
+class PageInfo:
+    current_page: int = 1
+    last_page: int = 1
+    has_next_page: bool = False
+    per_page: int = None
+    total: int = None
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get('currentPage') or 1,
+                   data.get('lastPage') or 1,
+                   data.get('hasNextPage') or False,
+                   data.get('perPage'),
+                   data.get('total'))
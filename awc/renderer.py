@@ -0,0 +1,244 @@
+from string import Formatter
+
+from .challengestate import ParsedRequirement
+from .formstate import DEFAULT_LEGEND, decode_form
+from .layouts import LAYOUTS
+from .models import Requirement
+from .parser import mock_requirement_set
+
+FORMATS = ('old', 'new')
+
+DEFAULT_DATE = 'YYYY-MM-DD'
+DEFAULT_ANIME = 'Anime_Title'
+DEFAULT_LINK = 'https://anilist.co/anime/00000/'
+PLACEHOLDER_POST_LINK = 'https://anilist.co/forum/thread/0000/comment/00000'
+
+def compile_template(template):
+    """Returns a template as (literal text, field name or None) pieces, so filling it in skips parsing it again"""
+    return tuple((literal, field) for literal, field, format_spec, conversion in Formatter().parse(template))
+
+def fill(out, pieces, values):
+    for literal, field in pieces:
+        out.append(literal)
+
+        if field is not None:
+            out.append(getattr(values, field))
+
+# Requirement lines by (format, has text), before the extra
+REQUIREMENT_TEMPLATES = {
+    ('old', False): compile_template("{number}) [{completed}] Start: {start} Finish: {finish} [{anime}]({link})"),
+    ('old', True): compile_template("{number}) [{completed}] Start: {start} Finish: {finish} __{text}__ [{anime}]({link})"),
+    ('new', False): compile_template("{number}) [{completed}]\n[{anime}]({link})\nStart: {start} Finish: {finish}"),
+    ('new', True): compile_template("{number}) [{completed}] __{text}__\n[{anime}]({link})\nStart: {start} Finish: {finish}"),
+}
+
+# What ends a raw requirement in each format
+RAW_ENDINGS = {'old': '\n', 'new': '\n\n'}
+
+# Section openings of every compiled layout, keyed by the section and format
+SECTION_OPENINGS = {(section, post_format): section.opening(post_format)
+                    for layout in LAYOUTS.values() for section in layout.sections for post_format in FORMATS}
+
+def convert_extra(raw_extra):
+    # Splits the old extra into parts
+    raw_extra = raw_extra.replace(', ', '\n')
+    extras = raw_extra.split('\n')
+
+    extras = [extra.strip('_') for extra in extras]
+
+    extra = ' // '.join(extras)
+
+    # Replaces old wrappers
+    extra = extra.replace('~!', '').replace('!~', '')
+
+    # Replaces old screenshots with new screenshots
+    extra = extra.replace('Screenshot:', '').replace('Screenshots:', '')
+    extra = extra.replace('img(', '[Screenshot](')
+
+    extra = extra.strip() # Removes any weird lingering spaces
+
+    return extra
+
+def write_requirement_line(out, requirement, post_format):
+    """Appends a requirement as a comment writes it to out, up to its extra"""
+    if requirement.bonus:
+        out.append('B')
+
+    has_text = requirement.text != '' and requirement.text != ' '
+
+    fill(out, REQUIREMENT_TEMPLATES[(post_format, has_text)], requirement)
+
+def write_requirement(out, requirement, post_format):
+    """Appends a requirement as a comment writes it to out"""
+    if requirement.force_raw_edit:
+        out.append(requirement.raw_requirement)
+        out.append(RAW_ENDINGS[post_format])
+        return
+
+    write_requirement_line(out, requirement, post_format)
+
+    if post_format == 'old':
+        if requirement.extra_newline:
+            out.append('\n')
+        else:
+            out.append(' ')
+
+        out.append(requirement.extra)
+        out.append('\n')
+    elif requirement.extra:
+        out.append(' // ')
+        out.append(convert_extra(requirement.extra))
+        out.append('\n\n')
+    else:
+        out.append('\n\n')
+
+def date_field(value):
+    # Empty dates are written as the placeholder, like missing ones
+    return value or DEFAULT_DATE
+
+def field_value(value, default):
+    # Fields left out of the form fall back to their default, stripped like submitted ones
+    return default.strip() if value is None else value
+
+def prerequisite_link(user, name):
+    """Returns the link to the user's submission for a prerequisite challenge, or a placeholder"""
+    try:
+        submission = user.submission_set.get(challenge__name=name)
+        return "https://anilist.co/forum/thread/{}/comment/{}".format(submission.challenge.thread_id, submission.comment_id)
+    except Exception:
+        return PLACEHOLDER_POST_LINK
+
+def legend_entries(form):
+    return ''.join("[" + str(value) + "] = " + str(key) + " " for key, value in form.legend.items())
+
+class CommentRenderer(object):
+    '''Renders a challenge code comment from the edit form's fields
+
+    The comment is collected in a list of pieces and joined once, so rendering time grows
+    linearly with the number of requirements. Form data can be a request's POST, any mapping
+    with items or an already decoded FormState, so comments can be rendered outside of a request too.
+    '''
+
+    def __init__(self, challenge, requirements=None):
+        self.challenge = challenge
+        self.layout = challenge.layout
+        self._requirements = requirements
+
+    def challenge_requirements(self):
+        """Returns the challenge's requirements in the order they were saved"""
+        if not self.layout.needs_requirements:
+            return mock_requirement_set(self.layout.mock_count)
+
+        if self._requirements is None:
+            self._requirements = list(self.challenge.requirement_set.all().order_by('id'))
+
+        return self._requirements
+
+    def requirements(self, form, post_format):
+        """Returns each requirement filled in from a FormState"""
+        layout = self.layout
+        requirements = []
+
+        for requirement in self.challenge_requirements():
+            number = layout.format_number(requirement.number, requirement.bonus)
+            key = 'bonus-' + number if requirement.bonus else number
+
+            req = ParsedRequirement(number, requirement.mode, requirement.bonus)
+            req.text = layout.text_for(requirement, number, post_format)
+            req.extra_newline = requirement.extra_newline
+
+            fields = form.requirement(key)
+
+            if requirement.force_raw_edit:
+                req.force_raw_edit = True
+                req.raw_requirement = field_value(form.raw_requirements.get(number), requirement.raw_requirement)
+            else:
+                req.completed = field_value(fields.completed, Requirement.NOT_COMPLETED)
+                req.start = date_field(fields.start)
+                req.finish = date_field(fields.finish)
+
+                if requirement.anime_title:
+                    req.anime = requirement.anime_title
+                    req.link = requirement.anime_link
+                else:
+                    req.anime = field_value(fields.anime, DEFAULT_ANIME)
+                    req.link = field_value(fields.link, DEFAULT_LINK)
+
+                # Only requirements outside the bonus get the layout's default extra
+                if layout.default_extra and not requirement.bonus and not fields.extra:
+                    req.extra = layout.default_extra
+                else:
+                    req.extra = field_value(fields.extra, requirement.extra)
+
+            req.mode = field_value(fields.mode, requirement.mode)
+
+            requirements.append(req)
+
+        return requirements
+
+    def render(self, data, user=None):
+        """Returns the comment for the form data, linking prerequisites to the user's submissions"""
+        challenge = self.challenge
+        form = decode_form(data)
+
+        post_format = form.post_format
+        out = ["# __", challenge.name, "__\n\n"]
+
+        # Add prerequisites section
+        prerequisites = list(challenge.prerequisites.all())
+
+        for prerequisite in prerequisites:
+            out += ["[", prerequisite.name, "](", prerequisite_link(user, prerequisite.name), ") Finish Date: ",
+                    date_field(form.prerequisites.get(prerequisite.name)), "\n"]
+
+        if prerequisites:
+            out.append('\n')
+
+        # Dates Section
+        out += ["Challenge Start Date: ", date_field(form.start), "\nChallenge Finish Date: ", date_field(form.finish), "\n"]
+
+        out += ["Legend: ", legend_entries(form), "\n\n"]
+
+        # Rule Tag for new format
+        if post_format == 'new':
+            out.append('<hr>\n\n')
+
+        self.write_requirements(out, self.requirements(form, post_format), post_format)
+
+        extra = field_value(form.extra, challenge.extra)
+
+        if extra:
+            out += ['\n<hr>\n\n', extra]
+
+        return ''.join(out)
+
+    def arrange(self, requirements):
+        """Yields (section, requirement) in the order a comment writes the requirements, where section
+        is the one opened before the requirement, if any"""
+        layout = self.layout
+        by_mode = {}
+
+        for requirement in requirements:
+            by_mode.setdefault(requirement.mode, []).append(requirement)
+
+        if not layout.implemented:
+            print("Not implemented...")
+        elif layout.mode_sections:
+            for section in layout.mode_sections:
+                if by_mode.get(section.mode):
+                    opening = section
+
+                    for requirement in section.ordered(by_mode[section.mode]):
+                        yield opening, requirement
+
+                        opening = None
+        else:
+            for requirement in by_mode.get(Requirement.DEFAULT, []):
+                yield layout.number_sections.get(int(requirement.number)), requirement
+
+    def write_requirements(self, out, requirements, post_format):
+        for section, requirement in self.arrange(requirements):
+            if section:
+                out.append(SECTION_OPENINGS[(section, post_format)])
+
+            write_requirement(out, requirement, post_format)
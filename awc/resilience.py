@@ -0,0 +1,96 @@
+import json
+import random
+import threading
+import time
+
+class AnilistUnavailable(Exception):
+    '''Raised when Anilist could not be reached or kept failing after retries'''
+
+class CircuitOpen(AnilistUnavailable):
+    '''Raised without calling Anilist while the circuit breaker is open'''
+
+def backoff_delay(attempt, base_delay=0.25, max_delay=4):
+    """Returns a full jitter exponential backoff delay for a zero-based retry attempt"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+def is_retryable_status(status_code):
+    # 429s are retried separately, once the rate limiter has taken in Retry-After
+    return status_code >= 500
+
+def mark_stale(response, stored_at):
+    """Adds a GraphQL extensions marker to a cached response served in place of a live one"""
+    try:
+        response_data = json.loads(response)
+    except ValueError:
+        return response
+
+    if not isinstance(response_data, dict):
+        return response
+
+    extensions = response_data.setdefault('extensions', {})
+    extensions['stale'] = True
+    extensions['age'] = int(time.time() - stored_at)
+
+    return json.dumps(response_data)
+
+def is_stale(response):
+    try:
+        response_data = json.loads(response)
+    except ValueError:
+        return False
+
+    return isinstance(response_data, dict) and bool(response_data.get('extensions', {}).get('stale'))
+
+class CircuitBreaker(object):
+    '''Fails fast after repeated Anilist failures, letting a trial call through once reset_timeout passes'''
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0
+
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.time() - self.opened_at < self.reset_timeout:
+                    raise CircuitOpen("Anilist circuit is open after {} failures".format(self.failures))
+
+                # Only the first caller after the timeout gets to test Anilist
+                self.state = self.HALF_OPEN
+            elif self.state == self.HALF_OPEN:
+                raise CircuitOpen("Anilist circuit is waiting on a trial call")
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def release(self):
+        """Gives back a call that never reached Anilist, so another caller can make the trial call"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.time()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'failures': self.failures,
+            }
@@ -0,0 +1,39 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Challenge, Requirement, new_version
+
+def bump(challenge_id, challenge=None):
+    """Replaces a challenge's version, and that of its instance if one is given
+
+    Updates that skip model signals, such as QuerySet.update(), need to call this themselves.
+    """
+    version = new_version()
+
+    # Other connections keep reading the old version until the change commits
+    Challenge.objects.filter(id=challenge_id).update(version=version)
+
+    if challenge is not None:
+        challenge.version = version
+
+@receiver(post_save, sender=Challenge)
+def challenge_changed(sender, instance, **kwargs):
+    bump(instance.id, instance)
+
+@receiver(post_save, sender=Requirement)
+@receiver(post_delete, sender=Requirement)
+def requirement_changed(sender, instance, **kwargs):
+    bump(instance.challenge_id, instance.challenge if Requirement.challenge.is_cached(instance) else None)
+
+@receiver(m2m_changed, sender=Challenge.prerequisites.through)
+def prerequisites_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            bump(instance.id, instance)
+    elif action == 'pre_clear':
+        # Clearing from the prerequisite's side does not say which challenges required it
+        for challenge_id in instance.challenge_set.values_list('id', flat=True):
+            bump(challenge_id)
+    elif action in ('post_add', 'post_remove'):
+        for challenge_id in pk_set:
+            bump(challenge_id)
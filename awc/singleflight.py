@@ -0,0 +1,118 @@
+import asyncio
+import json
+import threading
+
+from .cache import user_scope
+
+def request_key(query, variables, access_token=None):
+    """Returns the coalescing key for a query, scoped to the user for authorised calls"""
+    scope = user_scope(access_token) if access_token else ''
+
+    return (scope, query, json.dumps(variables, sort_keys=True))
+
+def is_mutation(query):
+    return query.lstrip().startswith('mutation')
+
+class _Call(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight(object):
+    '''Lets concurrent threads asking for the same key share one call and its result'''
+
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function):
+        with self._lock:
+            call = self._in_flight.get(key)
+            leader = call is None
+
+            if leader:
+                call = _Call()
+                self._in_flight[key] = call
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+
+            if call.error:
+                raise call.error
+
+            return call.result
+
+        try:
+            call.result = function()
+        except Exception as err:
+            call.error = err
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+            call.done.set()
+
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'shared': self.shared,
+                'in_flight': len(self._in_flight),
+            }
+
+class AsyncSingleFlight(object):
+    '''Lets concurrent tasks asking for the same key share one awaited call and its result'''
+
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+
+        self._in_flight = {}
+
+    async def do(self, key, function):
+        future = self._in_flight.get(key)
+
+        if future is not None:
+            self.shared += 1
+
+            # Shielded so one cancelled waiter does not cancel the call for everyone
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        self.calls += 1
+
+        try:
+            result = await function()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as err:
+            future.set_exception(err)
+
+            # Marks the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            del self._in_flight[key]
+
+        return result
+
+    def stats(self):
+        return {
+            'calls': self.calls,
+            'shared': self.shared,
+            'in_flight': len(self._in_flight),
+        }
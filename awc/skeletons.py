@@ -0,0 +1,250 @@
+import os
+
+from dataclasses import dataclass
+
+from django.db import transaction
+
+from .cache import SkeletonCache
+from .challengestate import ParsedRequirement
+from .models import Requirement
+from .renderer import (FORMATS, DEFAULT_ANIME, DEFAULT_LINK, RAW_ENDINGS, SECTION_OPENINGS, CommentRenderer,
+                       convert_extra, date_field, field_value, legend_entries, prerequisite_link,
+                       write_requirement_line)
+from .formstate import NO_FIELDS, decode_form
+
+# Bumped whenever the slots or the text around them change, so older skeletons are compiled again
+SKELETON_REVISION = 2
+
+# Compiled when a challenge is created or saved in the admin, and otherwise on first use
+skeleton_cache = SkeletonCache('anilist', ttl=int(os.environ.get('ANILIST_CACHE_SKELETON_TTL', 24 * 60 * 60)), revision=SKELETON_REVISION)
+
+# Slots are (kind, *arguments) tuples, so skeletons pickle into any cache backend
+REQUIREMENT = 'requirement'
+RAW_REQUIREMENT = 'raw-requirement'
+CHALLENGE_DATE = 'challenge-date'
+PREREQUISITE_DATE = 'prerequisite-date'
+PREREQUISITE_LINK = 'prerequisite-link'
+LEGEND = 'legend'
+CHALLENGE_EXTRA = 'challenge-extra'
+
+# Marks the requirement's extra among the pieces of a requirement slot
+EXTRA = 'extra'
+
+def fill_requirement(form, user, key, pieces):
+    """Returns a requirement's text, from its literal pieces and (field, default) pieces, where dates have no default"""
+    fields = form.requirements.get(key, NO_FIELDS)
+    out = []
+
+    for piece in pieces:
+        if piece.__class__ is str:
+            out.append(piece)
+            continue
+
+        name, default = piece[0], piece[1]
+
+        if name == EXTRA:
+            out.append(fill_extra(fields.extra, *piece[1:]))
+        elif default is None:
+            out.append(date_field(getattr(fields, name)))
+        else:
+            value = getattr(fields, name)
+            out.append(default if value is None else value)
+
+    return ''.join(out)
+
+def fill_extra(extra, default, default_extra, post_format, extra_newline):
+    if default_extra and not extra:
+        extra = default_extra
+    elif extra is None:
+        extra = default
+
+    if post_format == 'old':
+        return ('\n' if extra_newline else ' ') + extra + '\n'
+
+    if extra:
+        return ' // ' + convert_extra(extra) + '\n\n'
+
+    return '\n\n'
+
+def challenge_extra(form, user, default):
+    extra = field_value(form.extra, default)
+
+    if extra:
+        return '\n<hr>\n\n' + extra
+
+    return ''
+
+SLOTS = {
+    REQUIREMENT: fill_requirement,
+    RAW_REQUIREMENT: lambda form, user, number, default: field_value(form.raw_requirements.get(number), default),
+    CHALLENGE_DATE: lambda form, user, name: date_field(getattr(form, name)),
+    PREREQUISITE_DATE: lambda form, user, name: date_field(form.prerequisites.get(name)),
+    PREREQUISITE_LINK: lambda form, user, name: prerequisite_link(user, name),
+    LEGEND: lambda form, user: legend_entries(form),
+    CHALLENGE_EXTRA: challenge_extra,
+}
+
+REQUIREMENT_SLOTS = (REQUIREMENT, RAW_REQUIREMENT)
+
+def merge_literals(pieces):
+    """Returns pieces with each run of literal text joined into one string"""
+    merged = []
+
+    for piece in pieces:
+        if isinstance(piece, str):
+            if not piece:
+                continue
+
+            if merged and isinstance(merged[-1], str):
+                merged[-1] += piece
+                continue
+
+        merged.append(piece)
+
+    return tuple(merged)
+
+@dataclass(frozen=True, slots=True)
+class CommentSkeleton:
+    '''A challenge's comment in one code format, as literal text and slots for the edit form's fields
+
+    The modes are the (key, mode) of each requirement when the skeleton was compiled. A form that
+    moves a requirement to another mode changes its section, so it cannot be filled into the skeleton.
+    '''
+
+    post_format: str
+    pieces: tuple
+    modes: tuple = ()
+
+    def fits(self, form):
+        """Returns whether a FormState keeps every requirement in its compiled mode"""
+        requirements = form.requirements
+
+        for key, mode in self.modes:
+            fields = requirements.get(key)
+
+            if fields is not None and fields.mode is not None and fields.mode != mode:
+                return False
+
+        return True
+
+    def render(self, form, user=None):
+        """Returns the comment for a FormState, linking prerequisites to the user's submissions"""
+        out = []
+
+        for piece in self.pieces:
+            if piece.__class__ is str:
+                out.append(piece)
+            else:
+                out.append(SLOTS[piece[0]](form, user, *piece[1:]))
+
+        return ''.join(out)
+
+    def requirement_slot(self, key):
+        """Returns the slot that writes a requirement, keyed like its form fields, or None"""
+        for piece in self.pieces:
+            if piece.__class__ is not str and piece[0] in REQUIREMENT_SLOTS and piece[1] == key:
+                return piece
+
+        return None
+
+def fill_slot(slot, form, user=None):
+    """Returns the text of one slot of a skeleton for a FormState"""
+    return SLOTS[slot[0]](form, user, *slot[1:])
+
+def compile_skeleton(challenge, post_format, requirements=None):
+    """Returns the skeleton of a challenge's comment in a code format"""
+    renderer = CommentRenderer(challenge, requirements)
+    layout = renderer.layout
+
+    out = ["# __", challenge.name, "__\n\n"]
+
+    prerequisites = [prerequisite.name for prerequisite in challenge.prerequisites.all()]
+
+    for name in prerequisites:
+        out += ["[", name, "](", (PREREQUISITE_LINK, name), ") Finish Date: ", (PREREQUISITE_DATE, name), "\n"]
+
+    if prerequisites:
+        out.append('\n')
+
+    out += ["Challenge Start Date: ", (CHALLENGE_DATE, 'start'), "\nChallenge Finish Date: ", (CHALLENGE_DATE, 'finish'), "\n",
+            "Legend: ", (LEGEND,), "\n\n"]
+
+    if post_format == 'new':
+        out.append('<hr>\n\n')
+
+    # Requirements whose fields are slots, written by the renderer's own templates
+    slotted = []
+    modes = []
+
+    for requirement in renderer.challenge_requirements():
+        number = layout.format_number(requirement.number, requirement.bonus)
+        key = 'bonus-' + number if requirement.bonus else number
+
+        req = ParsedRequirement(number, requirement.mode, requirement.bonus)
+        req.text = layout.text_for(requirement, number, post_format)
+        req.extra_newline = requirement.extra_newline
+
+        if requirement.force_raw_edit:
+            req.force_raw_edit = True
+            req.raw_requirement = (RAW_REQUIREMENT, number, requirement.raw_requirement)
+        else:
+            req.completed = ('completed', Requirement.NOT_COMPLETED)
+            req.start = ('start', None)
+            req.finish = ('finish', None)
+
+            if requirement.anime_title:
+                req.anime = requirement.anime_title
+                req.link = requirement.anime_link
+            else:
+                req.anime = ('anime', DEFAULT_ANIME)
+                req.link = ('link', DEFAULT_LINK)
+
+            # Only requirements outside the bonus get the layout's default extra
+            default_extra = '' if requirement.bonus else layout.default_extra
+            req.extra = (EXTRA, requirement.extra.strip(), default_extra, post_format, requirement.extra_newline)
+
+        slotted.append(req)
+        modes.append((key, requirement.mode))
+
+    for section, req in renderer.arrange(slotted):
+        if section:
+            out.append(SECTION_OPENINGS[(section, post_format)])
+
+        if req.force_raw_edit:
+            out += [req.raw_requirement, RAW_ENDINGS[post_format]]
+            continue
+
+        pieces = []
+        write_requirement_line(pieces, req, post_format)
+        pieces.append(req.extra)
+
+        out.append((REQUIREMENT, 'bonus-' + req.number if req.bonus else req.number, merge_literals(pieces)))
+
+    out.append((CHALLENGE_EXTRA, challenge.extra))
+
+    return CommentSkeleton(post_format, merge_literals(out), tuple(modes))
+
+def compile_skeletons(challenge):
+    """Compiles and caches a challenge's skeleton in every code format, once the current transaction commits"""
+    def compile():
+        # Saves of the challenge's requirements and prerequisites replace the version on its row
+        challenge.refresh_from_db(fields=['version'])
+
+        requirements = CommentRenderer(challenge).challenge_requirements()
+
+        for post_format in FORMATS:
+            skeleton_cache.set(challenge, post_format, compile_skeleton(challenge, post_format, requirements))
+
+    # A transaction that rolls back would leave skeletons of changes that never happened
+    transaction.on_commit(compile)
+
+def render_comment(challenge, data, user=None):
+    """Returns the comment for a challenge's edit form data, filling in its cached skeleton when the form allows"""
+    form = decode_form(data)
+    post_format = form.post_format
+    skeleton = skeleton_cache.get_or_compile(challenge, post_format, lambda: compile_skeleton(challenge, post_format))
+
+    if not skeleton.fits(form):
+        return CommentRenderer(challenge).render(form, user)
+
+    return skeleton.render(form, user)
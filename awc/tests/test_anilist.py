@@ -0,0 +1,226 @@
+import asyncio
+import gzip
+import json
+import re
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.test import SimpleTestCase
+
+from awc.anilist import Anilist, AsyncAnilist, build_batched_query, split_batched_response
+
+class GraphQLHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+
+        self.server.request_count += 1
+
+        aliases = re.findall(r'(c[0-9]+): ThreadComment \(threadId: \$(\w+), id: \$(\w+)\)', body['query'])
+
+        if 'Page(' in body['query']:
+            page_number = body['variables'].get('page') or body['variables'].get('page_number')
+            items = [{'id': page_number * 100 + i, 'threadId': 4448} for i in range(2)]
+
+            data = {'Page': {'pageInfo': {'currentPage': page_number, 'lastPage': self.server.last_page},
+                             'media': items,
+                             'threadComments': items}}
+        elif aliases:
+            data = {}
+
+            for alias, thread_variable, comment_variable in aliases:
+                data[alias] = [{'comment': 'Comment {}'.format(body['variables'][comment_variable]),
+                                'threadId': body['variables'][thread_variable],
+                                'id': body['variables'][comment_variable]}]
+        else:
+            data = {'echo': body['variables']}
+
+        payload = json.dumps({'data': data}).encode()
+
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            payload = gzip.compress(payload)
+            self.send_response(200)
+            self.send_header('Content-Encoding', 'gzip')
+        else:
+            self.send_response(200)
+
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+class LocalGraphQLServerTestCase(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), GraphQLHandler)
+        cls.server.request_count = 0
+        cls.server.last_page = 1
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    @classmethod
+    def server_url(cls):
+        return 'http://127.0.0.1:{}/'.format(cls.server.server_address[1])
+
+# Create your tests here.
+class AnilistConnectionPoolTest(LocalGraphQLServerTestCase):
+    def setUp(self):
+        self.anilist = Anilist('id', 'secret', 'http://localhost/', pool_size=2, connect_timeout=1, read_timeout=1)
+        self.anilist.API_URL = self.server_url()
+
+    def test_pool_stats_empty_before_first_request(self):
+        self.assertEquals(self.anilist.pool_stats()['requests'], 0)
+
+    def test_gzip_response_is_decoded(self):
+        response = json.loads(self.anilist.post_query('query', {'id': 1}))
+        self.assertEquals(response['data']['echo'], {'id': 1})
+
+    def test_connection_is_reused(self):
+        for i in range(4):
+            self.anilist.post_authorised_query('token', 'query', {'id': i})
+
+        stats = self.anilist.pool_stats()
+        self.assertEquals(stats['requests'], 4)
+        self.assertEquals(stats['connections'], 1)
+        self.assertEquals(stats['reuse_rate'], 0.75)
+
+    def test_session_is_shared(self):
+        self.assertIs(self.anilist.session, self.anilist.session)
+
+    def test_timeout_is_configured(self):
+        self.assertEquals(self.anilist.timeout, (1, 1))
+
+class AnilistBatchingTest(LocalGraphQLServerTestCase):
+    def setUp(self):
+        self.anilist = Anilist('id', 'secret', 'http://localhost/')
+        self.anilist.API_URL = self.server_url()
+
+        self.server.request_count = 0
+
+    def test_build_batched_query_uses_aliases(self):
+        query, variables, aliases = build_batched_query('ThreadComment', {'threadId': 'Int', 'id': 'Int'}, 'id',
+                                                        [{'threadId': 4448, 'id': 1}, {'threadId': 4448, 'id': 2}])
+
+        self.assertIn('c1: ThreadComment (threadId: $threadId_1, id: $id_1) {id}', query)
+        self.assertIn('c2: ThreadComment (threadId: $threadId_2, id: $id_2) {id}', query)
+        self.assertEquals(variables, {'threadId_1': 4448, 'id_1': 1, 'threadId_2': 4448, 'id_2': 2})
+        self.assertEquals(aliases, ['c1', 'c2'])
+
+    def test_split_batched_response_marks_errors(self):
+        response = json.dumps({'data': {'c1': [{'id': 1}], 'c2': None},
+                               'errors': [{'message': 'Not Found.', 'path': ['c2']}]})
+
+        self.assertEquals(split_batched_response(response, ['c1', 'c2']), [[{'id': 1}], None])
+
+    def test_get_posts_in_one_request(self):
+        comments = self.anilist.get_posts([(4448, comment_id) for comment_id in range(1, 31)])
+
+        self.assertEquals(self.server.request_count, 1)
+        self.assertEquals([comment.id for comment in comments], list(range(1, 31)))
+
+    def test_get_posts_chunks_by_complexity(self):
+        comments = self.anilist.get_posts([(4448, comment_id) for comment_id in range(1, 121)])
+
+        self.assertEquals(self.server.request_count, 3)
+        self.assertEquals(comments[-1].comment, 'Comment 120')
+
+class AnilistPaginationTest(LocalGraphQLServerTestCase):
+    def setUp(self):
+        self.anilist = Anilist('id', 'secret', 'http://localhost/', pool_size=3)
+        self.anilist.API_URL = self.server_url()
+
+        self.server.request_count = 0
+        self.server.last_page = 5
+
+    def tearDown(self):
+        self.server.last_page = 1
+
+    def test_pages_are_merged_in_order(self):
+        media = list(self.anilist.paginate_items(self.anilist.GET_ANIME_FROM_ID_QUERY, {'ids': []}, 'media', access_token='token'))
+
+        self.assertEquals([item['id'] for item in media], [100, 101, 200, 201, 300, 301, 400, 401, 500, 501])
+        self.assertEquals(self.server.request_count, 5)
+
+    def test_page_variable_is_configurable(self):
+        pages = self.anilist.paginate(self.anilist.GET_USER_POSTS_QUERY, {'user_id': 1}, page_variable='page_number')
+
+        self.assertEquals([page['pageInfo']['currentPage'] for page in pages], [1, 2, 3, 4, 5])
+
+    def test_later_pages_are_fetched_while_the_first_is_used(self):
+        pages = self.anilist.paginate(self.anilist.GET_ANIME_FROM_ID_QUERY, {'ids': []})
+        next(pages)
+
+        deadline = time.time() + 5
+
+        while self.server.request_count < 5 and time.time() < deadline:
+            time.sleep(0.01)
+
+        self.assertEquals(self.server.request_count, 5)
+        self.assertEquals([page['pageInfo']['currentPage'] for page in pages], [2, 3, 4, 5])
+
+    def test_single_page(self):
+        self.server.last_page = 1
+
+        pages = list(self.anilist.paginate(self.anilist.GET_ANIME_FROM_ID_QUERY, {'ids': []}))
+
+        self.assertEquals(len(pages), 1)
+        self.assertEquals(self.server.request_count, 1)
+
+    def test_get_anime_fetches_every_page(self):
+        anime = self.anilist.get_anime('token', list(range(60)))
+
+        self.assertEquals(len(anime), 10)
+
+class AsyncAnilistTest(LocalGraphQLServerTestCase):
+    def setUp(self):
+        self.anilist = AsyncAnilist('id', 'secret', 'http://localhost/', pool_size=4, connect_timeout=1, read_timeout=1)
+        self.anilist.API_URL = self.server_url()
+
+    async def test_post_query(self):
+        response = json.loads(await self.anilist.post_query('query', {'id': 1}))
+        await self.anilist.aclose()
+
+        self.assertEquals(response['data']['echo'], {'id': 1})
+
+    async def test_concurrent_queries(self):
+        responses = await asyncio.gather(*[self.anilist.post_query(self.anilist.GET_POST_QUERY, {'thread_id': 4448, 'comment_id': comment_id}) for comment_id in range(8)])
+        await self.anilist.aclose()
+
+        comment_ids = [json.loads(response)['data']['echo']['comment_id'] for response in responses]
+        self.assertEquals(comment_ids, list(range(8)))
+
+    async def test_authorised_mutation(self):
+        response = json.loads(await self.anilist.update_post('token', 261096, 4448, 'comment'))
+        await self.anilist.aclose()
+
+        self.assertEquals(response['data']['echo'], {'id': 261096, 'thread_id': 4448, 'comment': 'comment'})
+
+    async def test_get_posts_chunks_concurrently(self):
+        comments = await self.anilist.get_posts([(4448, comment_id) for comment_id in range(1, 121)])
+        await self.anilist.aclose()
+
+        self.assertEquals([comment.id for comment in comments], list(range(1, 121)))
+
+    async def test_paginate(self):
+        self.server.last_page = 3
+
+        try:
+            pages = [page async for page in self.anilist.paginate(self.anilist.GET_ANIME_FROM_ID_QUERY, {'ids': []}, access_token='token')]
+            await self.anilist.aclose()
+        finally:
+            self.server.last_page = 1
+
+        self.assertEquals([page['pageInfo']['currentPage'] for page in pages], [1, 2, 3])
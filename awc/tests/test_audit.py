@@ -0,0 +1,125 @@
+import json
+import os
+import tempfile
+
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from awc.anilist import Anilist
+from awc.fakeanilist import FakeAnilistData, FakeAnilistServer
+from awc.management.commands.audit_submissions import Command
+from awc.models import Challenge, Requirement, Submission, User
+from awc.tests.test_parser import classic_code, genre_code
+
+# Create your tests here.
+class AuditSubmissionsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # setUpTestData posts the comments, so the server has to be up first
+        cls.server = FakeAnilistServer(data=FakeAnilistData(seed=5, users=2, media=10)).start()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        classic = Challenge.objects.create(name="Classic Challenge", thread_id=1, category=Challenge.CLASSIC)
+        genre = Challenge.objects.create(name="Action Genre Challenge", thread_id=2, category=Challenge.GENRE)
+
+        for number, mode in ((1, Requirement.EASY), (2, Requirement.EASY), (3, Requirement.NORMAL), (4, Requirement.NORMAL)):
+            Requirement.objects.create(challenge=genre, number=number, mode=mode, text='Text {}'.format(number))
+
+        Requirement.objects.create(challenge=genre, number=1, mode=Requirement.BONUS, bonus=True, text='Bonus')
+
+        user = User.objects.create(name='audit', user_id=1, avatar_url='', is_admin=False)
+
+        comments = [
+            (classic, classic_code()),
+            (genre, genre_code()),
+            (genre, genre_code('new')),
+            (genre, 'Not a challenge code'),
+            (classic, classic_code().replace('Legend', 'Key')),
+        ]
+
+        for challenge, comment in comments:
+            posted = cls.server.data.add_comment(challenge.thread_id, 1, comment)
+
+            Submission.objects.create(user=user, challenge=challenge, thread_id=challenge.thread_id, comment_id=posted['id'])
+
+        # A comment that has since been deleted
+        Submission.objects.create(user=user, challenge=genre, thread_id=genre.thread_id, comment_id=999999)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        self.directory = directory.name
+
+    def audit(self, api_url, **options):
+        command = Command(stdout=StringIO(), stderr=StringIO())
+        command.anilist = Anilist('id', 'secret', 'http://localhost/', retries=0, api_url=api_url)
+
+        output = os.path.join(self.directory, 'summary.json')
+
+        call_command(command, workers=2, batch_size=2, output=output, **options)
+
+        with open(output) as output_file:
+            return json.load(output_file)
+
+    def test_summary(self):
+        summary = self.audit(self.server.api_url)
+
+        self.assertEquals(summary['totals'], {'submissions': 6, 'parsed': 3, 'failed': 2, 'missing': 1, 'unchanged': 0})
+
+        genre, classic = summary['challenges']
+
+        self.assertEquals(genre['name'], 'Action Genre Challenge')
+        self.assertEquals(genre['formats'], {'old': 1, 'new': 1, 'unknown': 1})
+        self.assertEquals((genre['failed'], genre['missing']), (1, 1))
+        self.assertEquals(classic['formats'], {'old+seasons': 1, 'unknown': 1})
+        self.assertEquals(list(classic['errors']), ['awc.parser.ParseError: No legend found'])
+        self.assertEquals(len(classic['failed_submissions']), 1)
+        self.assertGreater(classic['parse_ms']['total'], 0)
+
+    def test_snapshot_replaces_anilist(self):
+        snapshot = os.path.join(self.directory, 'comments.jsonl.gz')
+
+        fetched = self.audit(self.server.api_url, snapshot=snapshot)
+
+        # Nothing listens here, so the second audit can only read the snapshot
+        replayed = self.audit('http://127.0.0.1:9/', snapshot=snapshot)
+
+        for summary in (fetched, replayed):
+            for challenge in summary['challenges']:
+                del challenge['parse_ms']
+
+        self.assertEquals(replayed, fetched)
+        self.assertFalse(os.path.exists(snapshot + '.partial'))
+
+    def test_only_named_challenges(self):
+        summary = self.audit(self.server.api_url, challenges=['Classic Challenge'])
+
+        self.assertEquals([challenge['name'] for challenge in summary['challenges']], ['Classic Challenge'])
+
+    def test_skip_unchanged(self):
+        first = self.audit(self.server.api_url, skip_unchanged=True)
+        second = self.audit(self.server.api_url, skip_unchanged=True)
+
+        self.assertEquals(first['totals'], {'submissions': 6, 'parsed': 3, 'failed': 2, 'missing': 1, 'unchanged': 0})
+
+        # Only comments that parsed are remembered, so the failed ones are parsed again
+        self.assertEquals(second['totals'], {'submissions': 6, 'parsed': 0, 'failed': 2, 'missing': 1, 'unchanged': 3})
+        self.assertEquals(Submission.objects.exclude(comment_fingerprint='').count(), 3)
+
+    def test_failed_submissions_are_capped(self):
+        summary = self.audit(self.server.api_url, max_failed=0)
+
+        self.assertEquals(summary['totals']['failed'], 2)
+
+        for challenge in summary['challenges']:
+            self.assertEquals(challenge['failed_submissions'], [])
@@ -0,0 +1,168 @@
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase
+
+from awc.cache import MediaCache, ParseCache, SkeletonCache
+from awc.models import Challenge, Requirement, Submission
+from awc.signals import bump
+
+def make_media(media_id, status=None):
+    return {
+        'id': media_id,
+        'title': {'userPreferred': 'Anime {}'.format(media_id)},
+        'coverImage': {'large': 'https://s4.anilist.co/{}.png'.format(media_id)},
+        'episodes': 12,
+        'mediaListEntry': {'id': media_id * 10, 'status': status} if status else None,
+    }
+
+# Create your tests here.
+class MediaCacheTest(SimpleTestCase):
+    def setUp(self):
+        caches['anilist'].clear()
+
+        self.media_cache = MediaCache('anilist', max_entries=10)
+
+    def test_miss_then_hit(self):
+        media, missing = self.media_cache.get_media([1, 2], 'token')
+        self.assertEquals(missing, [1, 2])
+
+        self.media_cache.set_media([make_media(1, 'COMPLETED'), make_media(2)], 'token')
+
+        media, missing = self.media_cache.get_media([1, 2], 'token')
+        self.assertEquals(missing, [])
+        self.assertEquals(media[1]['mediaListEntry']['status'], 'COMPLETED')
+        self.assertIsNone(media[2]['mediaListEntry'])
+
+        stats = self.media_cache.stats()
+        self.assertEquals((stats['hits'], stats['misses']), (2, 2))
+
+    def test_list_entries_are_per_user(self):
+        self.media_cache.set_media([make_media(1, 'COMPLETED')], 'token-a')
+
+        media, missing = self.media_cache.get_media([1], 'token-b')
+        self.assertEquals(missing, [1])
+
+        media, missing = self.media_cache.get_media([1])
+        self.assertNotIn('mediaListEntry', media[1])
+        self.assertEquals(media[1]['title']['userPreferred'], 'Anime 1')
+
+    def test_search_is_normalised(self):
+        self.media_cache.set_search('Cowboy  Bebop', [make_media(1), make_media(5)], 'token')
+
+        media = self.media_cache.get_search(' cowboy bebop ', 'token')
+        self.assertEquals([item['id'] for item in media], [1, 5])
+        self.assertIsNone(self.media_cache.get_search('cowboy', 'token'))
+
+        stats = self.media_cache.stats()
+        self.assertEquals((stats['search_hits'], stats['search_misses']), (1, 1))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        self.media_cache.set_media([make_media(media_id) for media_id in range(1, 11)])
+        self.media_cache.get_media([1])
+        self.media_cache.set_media([make_media(11)])
+
+        media, missing = self.media_cache.get_media([1, 2, 11])
+        self.assertEquals(missing, [2])
+        self.assertEquals(self.media_cache.stats()['evictions'], 1)
+
+class ParseCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.challenge = Challenge.objects.create(name="Timed Challenge", thread_id=1, category=Challenge.TIMED)
+        cls.prerequisite = Challenge.objects.create(name="Beginner's Challenge", thread_id=2, category=Challenge.TIER)
+
+    def setUp(self):
+        caches['anilist'].clear()
+
+        self.parse_cache = ParseCache('anilist')
+        self.parses = 0
+
+    def parse(self, comment='01) [X]'):
+        def parse():
+            self.parses += 1
+            return {'failed': False, 'parses': self.parses}
+
+        # Views load the challenge again for each request
+        self.challenge.refresh_from_db()
+
+        return self.parse_cache.get_or_parse(self.challenge, comment, parse)
+
+    def test_repeat_parses_are_cached(self):
+        self.assertEquals(self.parse(), self.parse())
+        self.parse('02) [X]')
+
+        self.assertEquals(self.parses, 2)
+        self.assertEquals(self.parse_cache.stats(), {'hits': 1, 'misses': 2, 'hit_rate': 1 / 3})
+
+    def test_challenge_changes_invalidate(self):
+        changes = [
+            lambda: Requirement.objects.create(challenge=self.challenge, number=1, text='New'),
+            lambda: (self.challenge.requirement_set.update(text='Bulk'), bump(self.challenge.id)),
+            lambda: self.challenge.requirement_set.get().delete(),
+            lambda: self.challenge.prerequisites.add(self.prerequisite),
+            lambda: self.prerequisite.challenge_set.clear(),
+            lambda: self.challenge.save(),
+        ]
+
+        self.parse()
+
+        for i, change in enumerate(changes):
+            change()
+
+            self.assertEquals(self.parse()['parses'], i + 2)
+            self.assertEquals(self.parse()['parses'], i + 2)
+
+    def test_changes_saved_by_other_workers_invalidate(self):
+        self.parse()
+
+        # Nothing in this worker's cache changes, only the row that the other worker saved
+        Challenge.objects.get(id=self.challenge.id).save()
+
+        self.assertEquals(self.parse()['parses'], 2)
+
+    def test_saved_instances_keep_their_version(self):
+        self.challenge.save()
+
+        self.assertEquals(self.challenge.version, Challenge.objects.get(id=self.challenge.id).version)
+
+    def test_other_challenges_are_unaffected(self):
+        self.parse()
+        self.prerequisite.save()
+        self.parse()
+
+        self.assertEquals(self.parses, 1)
+
+class SkeletonCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.challenge = Challenge.objects.create(name="Timed Challenge", thread_id=1, category=Challenge.TIMED)
+
+    def setUp(self):
+        caches['anilist'].clear()
+
+        self.parse_cache = ParseCache('anilist')
+        self.skeleton_cache = SkeletonCache('anilist')
+        self.compiles = 0
+
+    def compile(self):
+        def compile():
+            self.compiles += 1
+            return self.compiles
+
+        self.challenge.refresh_from_db()
+
+        return self.skeleton_cache.get_or_compile(self.challenge, 'new', compile)
+
+    def test_changes_saved_by_other_workers_invalidate(self):
+        self.assertEquals(self.compile(), self.compile())
+
+        Requirement.objects.create(challenge=Challenge.objects.get(id=self.challenge.id), number=1, text='New')
+
+        self.assertEquals(self.compile(), 2)
+
+    def test_counts_its_own_lookups(self):
+        self.compile()
+        self.compile()
+        self.parse_cache.get_or_parse(self.challenge, '01) [X]', lambda: {})
+
+        self.assertEquals(self.skeleton_cache.stats(), {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+        self.assertEquals(self.parse_cache.stats(), {'hits': 0, 'misses': 1, 'hit_rate': 0.0})
@@ -0,0 +1,126 @@
+import gzip
+import json
+import os
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from awc.anilist import Anilist, AsyncAnilist
+from awc.cassette import AsyncCassetteTransport, Cassette
+from awc.fakeanilist import FakeAnilistData, FakeAnilistServer
+from awc.resilience import AnilistUnavailable
+
+# Nothing listens here, so replayed requests prove they never touched the network
+UNREACHABLE_URL = 'http://127.0.0.1:9/'
+
+# Create your tests here.
+class CassetteTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeAnilistServer(data=FakeAnilistData(seed=2, users=2, media=80), latency=0.05).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        self.path = os.path.join(directory.name, 'anilist.jsonl.gz')
+
+    def record(self, function):
+        cassette = Cassette(self.path, mode=Cassette.RECORD)
+        anilist = Anilist('id', 'secret', 'http://localhost/', cassette=cassette,
+                          api_url=self.server.api_url, auth_url=self.server.auth_url)
+
+        result = function(anilist)
+        cassette.close()
+
+        return result
+
+    def replay(self, function, latency=Cassette.NO_LATENCY):
+        cassette = Cassette(self.path, mode=Cassette.REPLAY, latency=latency)
+        anilist = Anilist('id', 'secret', 'http://localhost/', retries=0, cassette=cassette,
+                          api_url=UNREACHABLE_URL, auth_url=UNREACHABLE_URL + 'api/v2/oauth/token')
+
+        return function(anilist), cassette
+
+    def test_replay_matches_recording(self):
+        def fetch(anilist):
+            comment = self.server.data.comments[5]
+
+            return anilist.get_post(comment['threadId'], comment['id']), anilist.get_anime('token-1', list(range(1, 61)))
+
+        recorded = self.record(fetch)
+        replayed, cassette = self.replay(fetch)
+
+        self.assertEquals(replayed, recorded)
+        self.assertEquals(cassette.stats()['hits'], 3)
+
+    def test_recorded_latency(self):
+        self.record(lambda anilist: anilist.post_query(anilist.GET_POST_QUERY, {'comment_id': 1}))
+
+        started = time.perf_counter()
+        self.replay(lambda anilist: anilist.post_query(anilist.GET_POST_QUERY, {'comment_id': 1}), latency=Cassette.RECORDED)
+        self.assertGreaterEqual(time.perf_counter() - started, 0.05)
+
+        started = time.perf_counter()
+        self.replay(lambda anilist: anilist.post_query(anilist.GET_POST_QUERY, {'comment_id': 1}))
+        self.assertLess(time.perf_counter() - started, 0.05)
+
+    def test_unrecorded_requests_miss(self):
+        self.record(lambda anilist: anilist.post_query(anilist.GET_POST_QUERY, {'comment_id': 1}))
+
+        with self.assertRaises(AnilistUnavailable):
+            self.replay(lambda anilist: anilist.post_query(anilist.GET_POST_QUERY, {'comment_id': 2}))
+
+    def test_repeated_requests_replay_in_order(self):
+        def save_twice(anilist):
+            return [json.loads(anilist.post_authorised_query('token-1', anilist.MAKE_POST_QUERY, {'thread_id': 1, 'comment': 'Hi'}))
+                    for i in range(2)]
+
+        recorded = self.record(save_twice)
+        replayed, cassette = self.replay(save_twice)
+
+        self.assertNotEqual(recorded[0], recorded[1])
+        self.assertEquals(replayed, recorded)
+
+    def test_credentials_are_not_recorded(self):
+        def log_in(anilist):
+            access_token = json.loads(anilist.authenticate('code-2', 'id', 'secret', 'http://localhost/'))['access_token']
+
+            return anilist.get_user_info(access_token)
+
+        recorded = self.record(log_in)
+
+        with gzip.open(self.path, 'rt') as cassette_file:
+            contents = cassette_file.read()
+
+        self.assertNotIn('"secret"', contents)
+        self.assertNotIn('token-2', contents)
+
+        # The redacted token still finds the same user's responses
+        replayed, cassette = self.replay(log_in)
+        self.assertEquals(replayed, recorded)
+
+    async def test_async_transport(self):
+        async def fetch(transport):
+            anilist = AsyncAnilist('id', 'secret', 'http://localhost/', retries=0, transport=transport,
+                                   api_url=self.server.api_url)
+
+            try:
+                return await anilist.get_user_info('token-1')
+            finally:
+                await anilist.aclose()
+
+        cassette = Cassette(self.path, mode=Cassette.RECORD)
+        recorded = await fetch(AsyncCassetteTransport(cassette))
+        cassette.close()
+
+        replayed = await fetch(AsyncCassetteTransport(Cassette(self.path, latency=Cassette.NO_LATENCY)))
+
+        self.assertEquals(replayed, recorded)
@@ -0,0 +1,100 @@
+import json
+
+from django.test import SimpleTestCase
+
+from awc.anilist import Anilist
+from awc.fakeanilist import FakeAnilistData, FakeAnilistServer, parse_document
+from awc.resilience import AnilistUnavailable
+
+# Create your tests here.
+class ParseDocumentTest(SimpleTestCase):
+    def test_defaults_and_nested_arguments(self):
+        operation, defaults, selections = parse_document(Anilist.GET_ANIME_FROM_ID_QUERY)
+
+        self.assertEquals(operation, 'query')
+        self.assertEquals(defaults, {'page': 1})
+        self.assertEquals(selections[0]['name'], 'Page')
+        self.assertEquals(selections[0]['selections'][1]['arguments'], {'id_in': ('$', 'ids'), 'type': 'ANIME'})
+
+    def test_aliases(self):
+        operation, defaults, selections = parse_document('query ($id_1: Int) { c1: Media (id: $id_1) { id } }')
+
+        self.assertEquals((selections[0]['alias'], selections[0]['name']), ('c1', 'Media'))
+
+class FakeAnilistDataTest(SimpleTestCase):
+    def test_seeded_data_is_reproducible(self):
+        first = FakeAnilistData(seed=3, media=50)
+        second = FakeAnilistData(seed=3, media=50)
+
+        self.assertEquals(first.media, second.media)
+        self.assertEquals(first.list_entries, second.list_entries)
+        self.assertNotEqual(first.media, FakeAnilistData(seed=4, media=50).media)
+
+class FakeAnilistServerTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeAnilistServer(data=FakeAnilistData(seed=1, users=3, media=120, comments_per_user=60)).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.anilist = Anilist('id', 'secret', 'http://localhost/', retries=1,
+                               api_url=self.server.api_url, auth_url=self.server.auth_url)
+
+    def test_authenticate_and_viewer(self):
+        response = json.loads(self.anilist.authenticate('code-2', 'id', 'secret', 'http://localhost/'))
+
+        self.assertEquals(self.anilist.get_user_info(response['access_token'])['name'], 'User2')
+
+    def test_comment_lifecycle(self):
+        thread_id = 38857
+
+        saved = json.loads(self.anilist.post_authorised_query('token-1', self.anilist.MAKE_POST_QUERY, {'thread_id': thread_id, 'comment': 'First'}))
+        comment_id = saved['data']['SaveThreadComment']['id']
+
+        self.anilist.post_authorised_query('token-1', self.anilist.UPDATE_POST_QUERY, {'id': comment_id, 'thread_id': thread_id, 'comment': 'Second'})
+        self.assertEquals(self.anilist.get_post(thread_id, comment_id).comment, 'Second')
+
+        deleted = json.loads(self.anilist.delete_post('token-1', comment_id))
+        self.assertTrue(deleted['data']['DeleteThreadComment']['deleted'])
+        self.assertEquals(self.anilist.get_posts([(thread_id, comment_id)]), [None])
+
+    def test_user_posts_are_paginated(self):
+        pages = list(self.anilist.get_user_posts(3))
+
+        self.assertEquals([len(page) for page in pages], [50, 10])
+        self.assertTrue(all(comment.thread_id for page in pages for comment in page))
+
+    def test_media_has_the_viewers_list_entries(self):
+        media = self.anilist.get_anime('token-1', list(range(1, 61)))
+
+        self.assertEquals(sorted(item.id for item in media), list(range(1, 61)))
+
+        for item in media:
+            self.assertEquals(item.media_list_entry is not None, (1, item.id) in self.server.data.list_entries)
+
+    def test_search(self):
+        title = self.server.data.media[7]['title']['userPreferred']
+
+        self.assertIn(7, [item.id for item in self.anilist.search_anime('token-1', title)])
+
+    def test_injected_failures_are_retried(self):
+        thread_id = self.server.data.comments[1]['threadId']
+
+        self.server.fail_next(1)
+        self.assertEquals(self.anilist.get_post(thread_id, 1).id, 1)
+
+        self.server.fail_next(2)
+
+        with self.assertRaises(AnilistUnavailable):
+            self.anilist.get_post(thread_id, 2)
+
+    def test_rate_limit_headers(self):
+        response = self.anilist.session.post(self.server.api_url, json={'query': Anilist.GET_POST_QUERY, 'variables': {'comment_id': 1}})
+
+        self.assertEquals(response.headers['X-RateLimit-Limit'], '90')
+        self.assertIn('X-RateLimit-Remaining', response.headers)
@@ -0,0 +1,51 @@
+from django.http import QueryDict
+from django.test import SimpleTestCase
+
+from awc.formstate import FormState, RequirementFields, decode_form
+
+# Create your tests here.
+class FormStateTest(SimpleTestCase):
+    def test_decode(self):
+        data = QueryDict(mutable=True)
+        data.update({
+            'csrfmiddlewaretoken': 'token',
+            'format': 'new',
+            'legend': "{'Completed': 'X', 'Up to Date': 'U'}",
+            'challenge-start': '2021-01-01 ',
+            'challenge-extra': ' Extra ',
+            'prerequisite-Spring-Summer Challenge-finish': '2021-02-01',
+            'completed-01': ' X ',
+            'requirement-start-01': '2021-01-02',
+            'requirement-anime-01': ' K-On! ',
+            'requirement-link-01': 'https://anilist.co/anime/5680',
+            'requirement-extra-01': '',
+            'mode-01': 'E',
+            'completed-bonus-1': 'O',
+            'requirement-raw-02': ' 02) Raw\n',
+            'requirement-unknown-03': 'Ignored',
+        })
+        data.appendlist('completed-bonus-1', 'X')
+
+        state = FormState.decode(data)
+
+        self.assertEquals(state.post_format, 'new')
+        self.assertEquals(state.legend, {'Completed': 'X', 'Up to Date': 'U'})
+        self.assertEquals((state.start, state.finish, state.extra), ('2021-01-01 ', None, 'Extra'))
+        self.assertEquals(state.prerequisites, {'Spring-Summer Challenge': '2021-02-01'})
+        self.assertEquals(state.raw_requirements, {'02': '02) Raw'})
+        self.assertEquals(state.requirements, {
+            '01': RequirementFields(completed='X', start='2021-01-02', anime='K-On!', link='https://anilist.co/anime/5680', extra='', mode='E'),
+            'bonus-1': RequirementFields(completed='X'),
+        })
+
+    def test_missing_fields(self):
+        state = FormState.decode({'format': 'html'})
+
+        self.assertEquals(state.post_format, 'old')
+        self.assertEquals(state.legend, {'Completed': 'X', 'Not Completed': 'O'})
+        self.assertEquals(state.requirement('01'), RequirementFields())
+
+    def test_decoded_forms_are_kept(self):
+        state = FormState.decode({})
+
+        self.assertIs(decode_form(state), state)
@@ -0,0 +1,53 @@
+from django.test import SimpleTestCase
+
+from awc.layouts import CLASSIC, GENRE, MODE_HEADERS, SEASON_HEADERS, SEASON_PREFIXES, get_layout
+from awc.models import Challenge, Requirement
+from awc.parser import MockRequirement
+
+# Create your tests here.
+class ChallengeLayoutTest(SimpleTestCase):
+    def test_named_challenges(self):
+        seasonal = Challenge(name="Winter 2021 Seasonal Challenge", category=Challenge.SPECIAL).layout
+        classic = Challenge(name="Classic Challenge", category=Challenge.CLASSIC).layout
+        timed = Challenge(name="Timed Challenge", category=Challenge.TIMED).layout
+
+        self.assertEquals((seasonal.mock_count, seasonal.default_extra, seasonal.allows_up_to_date), (7, 'Ep: XX/XX', True))
+        self.assertEquals(classic.mock_count, 40)
+        self.assertTrue(timed.needs_requirements)
+        self.assertEquals(seasonal.sections, ())
+
+    def test_layouts_are_compiled_once(self):
+        self.assertIs(get_layout("Classic Challenge", Challenge.CLASSIC), Challenge(name="Classic Challenge", category=Challenge.CLASSIC).layout)
+        self.assertFalse(get_layout("Unknown Challenge", 'XXX').implemented)
+
+    def test_requirement_text(self):
+        classic = get_layout("Classic Challenge", Challenge.CLASSIC)
+        seasonal = get_layout("Winter 2021 Seasonal Challenge", Challenge.SPECIAL)
+
+        self.assertEquals(classic.text_for(MockRequirement(12), '12', 'new'), '2nd Spring Anime')
+        self.assertEquals(classic.text_for(MockRequirement(12), '12', 'old'), '')
+        self.assertEquals(seasonal.text_for(MockRequirement(3), '03', 'old'), '3rd Anime')
+
+    def test_numbering(self):
+        self.assertEquals(GENRE.format_number(2, True), '2')
+        self.assertEquals(GENRE.format_number(2, False), '02')
+        self.assertEquals(CLASSIC.format_number(2, True), '02')
+
+    def test_sections(self):
+        classic = get_layout("Classic Challenge", Challenge.CLASSIC)
+        genre = get_layout("Action Genre Challenge", Challenge.GENRE)
+
+        self.assertEquals(classic.number_sections[21].opening('old'), '\n### __Summer__\n')
+        self.assertEquals(classic.number_sections[21].opening('new'), '\n<hr>\n\n### __Summer__\n')
+        self.assertEquals([section.opening('old') for section in genre.mode_sections][:2], ['__Mode: Easy__\n', '\n---\n__Mode: Normal__\n'])
+        self.assertEquals(classic.season_for(40).name, 'Fall')
+
+        requirements = [MockRequirement(3), MockRequirement(1, bonus=True), MockRequirement(2)]
+
+        self.assertEquals([(requirement.number, requirement.bonus) for requirement in genre.mode_sections[0].ordered(requirements)],
+                          [(2, False), (3, False), (1, True)])
+
+    def test_parser_headers(self):
+        self.assertEquals(list(MODE_HEADERS.values()), [Requirement.EASY, Requirement.NORMAL, Requirement.HARD, Requirement.BONUS])
+        self.assertEquals(SEASON_HEADERS[0], '### __Winter__')
+        self.assertEquals(SEASON_PREFIXES[-1], '### __Fall')
@@ -0,0 +1,100 @@
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from awc.anilist import Anilist, build_batched_query
+from awc.cache import MediaCache
+from awc.metrics import AnilistCall, AnilistMetrics, Histogram, end_request, start_request
+from awc.middleware import AnilistMetricsMiddleware
+from awc.tests.test_anilist import LocalGraphQLServerTestCase
+
+# Create your tests here.
+class HistogramTest(SimpleTestCase):
+    def test_percentiles(self):
+        histogram = Histogram((10, 100, 1000))
+
+        for value in [1] * 90 + [50] * 9 + [5000]:
+            histogram.observe(value)
+
+        snapshot = histogram.snapshot()
+
+        self.assertEquals(snapshot['p50'], 10)
+        self.assertEquals(snapshot['p95'], 100)
+        self.assertEquals(snapshot['p99'], 100)
+        self.assertEquals(histogram.percentile(100), 5000)
+        self.assertEquals(snapshot['buckets'], {'10': 90, '100': 9, '1000': 0, '+Inf': 1})
+
+class OperationNameTest(SimpleTestCase):
+    def test_named_queries(self):
+        self.assertEquals(Anilist.operation_name(Anilist.GET_POST_QUERY), 'GET_POST_QUERY')
+        self.assertEquals(Anilist.operation_name(Anilist.MAKE_POST_QUERY), 'MAKE_POST_QUERY')
+
+    def test_batched_queries(self):
+        batch = Anilist.THREAD_COMMENT_BATCH
+        query, variables, aliases = build_batched_query(batch['field'], batch['arguments'], batch['selection'], [{'threadId': 1, 'id': 2}])
+
+        self.assertEquals(Anilist.operation_name(query), 'THREAD_COMMENT_BATCH')
+
+    def test_unknown_queries(self):
+        self.assertEquals(Anilist.operation_name('query'), 'UNKNOWN')
+
+class AnilistMetricsTest(LocalGraphQLServerTestCase):
+    def setUp(self):
+        caches['anilist'].clear()
+
+        self.anilist = Anilist('id', 'secret', 'http://localhost/', media_cache=MediaCache('anilist'))
+        self.anilist.API_URL = self.server_url()
+
+    def tearDown(self):
+        self.server.last_page = 1
+
+    def test_calls_are_recorded(self):
+        self.anilist.post_query(self.anilist.GET_POST_QUERY, {'thread_id': 1, 'comment_id': 2})
+
+        stats = self.anilist.metrics.snapshot()['GET_POST_QUERY']
+
+        self.assertEquals(stats['calls'], 1)
+        self.assertEquals(stats['statuses'], {'200': 1})
+        self.assertEquals(stats['retries'], 0)
+        self.assertGreater(stats['response_bytes']['sum'], 0)
+
+    def test_calls_are_collected_per_request(self):
+        self.server.last_page = 3
+
+        token = start_request()
+        self.anilist.get_anime('token', list(range(60)))
+        calls = end_request(token)
+
+        # Pages after the first are fetched on worker threads
+        self.assertEquals(len(calls), 3)
+        self.assertEquals(set(call.cache for call in calls), {'miss'})
+
+    def test_cache_hits_are_recorded(self):
+        self.anilist.get_anime('token', list(range(60)))
+        self.anilist.get_anime('token', [100, 101])
+
+        stats = self.anilist.metrics.snapshot()['GET_ANIME_FROM_ID_QUERY']
+
+        self.assertEquals((stats['cache_hits'], stats['cache_misses']), (1, 1))
+        self.assertEquals(stats['calls'], 1)
+
+class AnilistMetricsMiddlewareTest(SimpleTestCase):
+    def test_server_timing_header(self):
+        metrics = AnilistMetrics()
+
+        def view(request):
+            metrics.record(AnilistCall('GET_POST_QUERY', latency_ms=12.5, status=200))
+            metrics.record(AnilistCall('SEARCH_ANIME_QUERY', cache='hit'))
+
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        response = AnilistMetricsMiddleware(view)(request)
+
+        self.assertEquals(response['Server-Timing'], 'anilist;dur=12.5;desc="2 calls, 1 cached"')
+        self.assertEquals(len(request.anilist_calls), 2)
+
+    def test_no_header_without_calls(self):
+        response = AnilistMetricsMiddleware(lambda request: HttpResponse())(RequestFactory().get('/'))
+
+        self.assertFalse(response.has_header('Server-Timing'))
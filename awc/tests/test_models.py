@@ -229,3 +229,25 @@ class SubmissionModelTest(TestCase):
         submission = Submission.objects.get(comment_id=261096)
         expected_object_name = f'{submission.challenge.name} Submission'
         self.assertEquals(expected_object_name, str(submission))
+
+    def test_comment_fingerprint_max_length(self):
+        submission = Submission.objects.get(comment_id=261096)
+        max_length = submission._meta.get_field('comment_fingerprint').max_length
+        self.assertEquals(max_length, 64)
+
+    def test_remembered_comment_is_unchanged(self):
+        submission = Submission.objects.get(comment_id=261096)
+        self.assertFalse(submission.is_unchanged('Comment'))
+
+        submission.remember_comment('Comment')
+
+        submission = Submission.objects.get(comment_id=261096)
+        self.assertTrue(submission.is_unchanged('Comment'))
+        self.assertFalse(submission.is_unchanged('Comment '))
+
+    def test_remembering_the_same_comment_skips_saving(self):
+        submission = Submission.objects.get(comment_id=261096)
+        submission.remember_comment('Comment')
+
+        with self.assertNumQueries(0):
+            submission.remember_comment('Comment')
@@ -0,0 +1,174 @@
+import pickle
+
+from dataclasses import FrozenInstanceError
+
+from django.test import TestCase
+
+from awc.challengestate import ParsedRequirement
+from awc.models import Challenge, Requirement
+from awc.parser import NEW, OLD, ChallengeCodeParser, CodeFormat, convert_date, mock_requirement_set
+
+SEASONS = ['Winter', 'Spring', 'Summer', 'Fall']
+
+def classic_code():
+    comment = "# __Classic Challenge__\n\nChallenge Start Date: 2021-01-01\nChallenge Finish Date: YYYY-MM-DD\nLegend: [X] = Completed [O] = Not Completed \n\n"
+
+    for number in range(1, 41):
+        if number % 10 == 1:
+            comment += "\n### __{}__\n".format(SEASONS[number // 10])
+
+        comment += "{:02}) [X] Start: 01/02/2021 Finish: 2021-02-{:02} [Anime {}](https://anilist.co/anime/{}/) Ep {}\n".format(number, number % 28 + 1, number, number * 10, number)
+
+    return comment
+
+def genre_code(post_format='old'):
+    comment = "# __Action Genre Challenge__\n\nChallenge Start Date: 2021-01-01\nChallenge Finish Date: 2021-03-01\nLegend: [X] = Completed [O] = Not Completed \n\n"
+
+    if post_format == 'new':
+        comment += '<hr>\n\n'
+
+    for header, numbers in (('__Mode: Easy__', ['01', '02']), ('__Mode: Normal__', ['03', '04']), ('__Bonus__', ['B1'])):
+        if header != '__Mode: Easy__':
+            comment += "\n---\n"
+
+        comment += header + "\n"
+
+        for number in numbers:
+            if post_format == 'old':
+                comment += "{0}) [O] Start: YYYY-MM-DD Finish: YYYY-MM-DD __Text {0}__ [Anime](https://anilist.co/anime/1/) \n".format(number)
+            else:
+                comment += "{0}) [O] __Text {0}__\n[Anime](https://anilist.co/anime/1/)\nStart: YYYY-MM-DD Finish: YYYY-MM-DD // Extra {0}\n\n".format(number)
+
+    return comment + '\n<hr>\n\nChallenge extra'
+
+# Create your tests here.
+class ChallengeCodeParserTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.classic = Challenge.objects.create(name="Classic Challenge", thread_id=1, category=Challenge.CLASSIC)
+        cls.genre = Challenge.objects.create(name="Action Genre Challenge", thread_id=2, category=Challenge.GENRE)
+        cls.timed = Challenge.objects.create(name="Timed Challenge", thread_id=3, category=Challenge.TIMED)
+        cls.timed.prerequisites.add(cls.classic)
+
+        for number, mode in ((1, Requirement.EASY), (2, Requirement.EASY), (3, Requirement.NORMAL), (4, Requirement.NORMAL)):
+            Requirement.objects.create(challenge=cls.genre, number=number, mode=mode, text='Text {}'.format(number))
+
+        Requirement.objects.create(challenge=cls.genre, number=1, mode=Requirement.BONUS, bonus=True, text='Bonus')
+        Requirement.objects.create(challenge=cls.timed, number=1, text='Raw', force_raw_edit=True)
+
+    def test_classic(self):
+        parsed = ChallengeCodeParser(self.classic).parse(classic_code())
+
+        self.assertFalse(parsed.failed)
+        self.assertEquals((parsed.start, parsed.finish), ('2021-01-01', 'YYYY-MM-DD'))
+        self.assertEquals(parsed.legend, {'Completed': 'X', 'Not Completed': 'O'})
+        self.assertEquals(len(parsed.requirements), 40)
+        self.assertEquals(parsed.format, CodeFormat(OLD, False, True))
+        self.assertEquals(parsed.requirements[39], ParsedRequirement(
+            number='40',
+            mode=Requirement.DEFAULT,
+            completed='X',
+            start='2021-02-01',
+            finish='2021-02-13',
+            anime='Anime 40',
+            link='https://anilist.co/anime/400',
+            anime_id=400,
+            extra=' Ep 40',
+        ))
+
+    def test_states_survive_caching(self):
+        parsed = ChallengeCodeParser(self.genre).parse(genre_code())
+
+        self.assertEquals(pickle.loads(pickle.dumps(parsed)), parsed)
+
+    def test_genre_modes_and_bonus(self):
+        parsed = ChallengeCodeParser(self.genre).parse(genre_code())
+
+        self.assertFalse(parsed.is_new_format)
+        self.assertEquals([(requirement.mode, requirement.number, requirement.bonus) for requirement in parsed.requirements],
+                          [('E', '01', False), ('E', '02', False), ('N', '03', False), ('N', '04', False), ('B', '1', True)])
+        self.assertEquals(parsed.requirements[1].text, 'Text 2')
+        self.assertEquals(parsed.extra, 'Challenge extra')
+
+    def test_new_format(self):
+        parsed = ChallengeCodeParser(self.genre).parse(genre_code('new'))
+
+        self.assertFalse(parsed.failed)
+        self.assertTrue(parsed.is_new_format)
+        self.assertEquals(parsed.format, CodeFormat(NEW, False, False))
+        self.assertEquals([requirement.extra for requirement in parsed.requirements],
+                          [' Extra 01', ' Extra 02', ' Extra 03', ' Extra 04', ' Extra B1'])
+        self.assertEquals(parsed.requirements[4].mode, Requirement.BONUS)
+        self.assertEquals(parsed.extra, 'Challenge extra')
+
+    def test_prerequisites_and_raw_requirements(self):
+        comment = ("# __Timed Challenge__\n\n"
+                   "[Classic Challenge](https://anilist.co/forum/thread/1/comment/2) Finish Date: 2021-05-01\n\n"
+                   "Challenge Start Date: 2021-01-01\nChallenge Finish Date: YYYY-MM-DD\nLegend: [X] = Completed [O] = Not Completed \n\n"
+                   "01) Watch anything\nNotes\n")
+
+        parsed = ChallengeCodeParser(self.timed).parse(comment)
+
+        self.assertEquals(parsed.prerequisites, {'Classic Challenge': '2021-05-01'})
+        self.assertEquals(parsed.format, CodeFormat(OLD, True, False))
+        self.assertEquals(parsed.requirements[0].raw_requirement, '01) Watch anything\nNotes')
+
+    def test_prerequisite_link_ending_in_01(self):
+        comment = genre_code('new').replace("Challenge Start Date", "[Classic Challenge](https://anilist.co/forum/thread/1/comment/301) Finish Date: 2021-05-01\n\nChallenge Start Date")
+
+        self.genre.prerequisites.add(self.classic)
+        parsed = ChallengeCodeParser(self.genre).parse(comment)
+
+        self.assertFalse(parsed.failed, parsed.error)
+        self.assertEquals(parsed.prerequisites, {'Classic Challenge': '2021-05-01'})
+        self.assertEquals(len(parsed.requirements), 5)
+
+    def test_old_format_requirement_without_dates(self):
+        comment = classic_code().replace('02) [X] Start: 01/02/2021', '02) [X]')
+
+        parsed = ChallengeCodeParser(self.classic).parse(comment)
+
+        self.assertTrue(parsed.failed)
+        self.assertIn('02) [X]', parsed.error)
+
+    def test_requirements_are_loaded_once(self):
+        for post_format in ('old', 'new'):
+            with self.assertNumQueries(2):
+                parsed = ChallengeCodeParser(self.genre).parse(genre_code(post_format))
+
+            self.assertFalse(parsed.failed)
+
+        requirements = list(self.genre.requirement_set.all())
+
+        with self.assertNumQueries(1):
+            ChallengeCodeParser(self.genre, requirements).parse(genre_code())
+
+        with self.assertNumQueries(1):
+            ChallengeCodeParser(self.classic).parse(classic_code())
+
+    def test_unknown_requirement(self):
+        parsed = ChallengeCodeParser(self.genre).parse(genre_code().replace('04) [O]', '09) [O]'))
+
+        self.assertTrue(parsed.failed)
+        self.assertIn('DoesNotExist', parsed.error)
+
+    def test_mock_requirements_are_shared(self):
+        self.assertIs(mock_requirement_set(40), mock_requirement_set(40))
+        self.assertEquals([requirement.number for requirement in mock_requirement_set(7)], list(range(1, 8)))
+
+        with self.assertRaises(FrozenInstanceError):
+            mock_requirement_set(7)[0].text = 'Changed'
+
+    def test_failures_keep_the_comment(self):
+        for comment in ('No legend here', classic_code().replace('Legend', 'Key'), classic_code() + 'B\n'):
+            parsed = ChallengeCodeParser(self.classic).parse(comment)
+
+            self.assertTrue(parsed.failed)
+            self.assertEquals(parsed.comment, comment)
+            self.assertIn('Traceback', parsed.error)
+
+    def test_convert_date(self):
+        self.assertEquals(convert_date(' 2021-03-04 '), '2021-03-04')
+        self.assertEquals(convert_date('13/02/2021'), '2021-02-13')
+        self.assertEquals(convert_date('02/13/2021'), '2021-02-13')
+        self.assertEquals(convert_date('YYYY-MM-DD'), 'YYYY-MM-DD')
@@ -0,0 +1,98 @@
+from django.core.cache import caches
+from django.test import TestCase
+
+from awc.formstate import FormState
+from awc.models import Challenge, Requirement, Submission
+from awc.patches import PatchError, patch_requirement
+from awc.skeletons import render_comment
+from awc.utils import Utils
+
+# Create your tests here.
+class PatchRequirementTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.genre = Challenge.objects.create(name="Action Genre Challenge", thread_id=2, category=Challenge.GENRE)
+
+        Requirement.objects.create(challenge=cls.genre, number=1, mode=Requirement.EASY, text='First')
+        Requirement.objects.create(challenge=cls.genre, number=2, mode=Requirement.EASY, text='Second', extra='Ep 1')
+        Requirement.objects.create(challenge=cls.genre, number=3, mode=Requirement.NORMAL, text='', force_raw_edit=True, raw_requirement='03) Raw')
+        Requirement.objects.create(challenge=cls.genre, number=1, mode=Requirement.BONUS, bonus=True, text='Bonus')
+
+    def setUp(self):
+        caches['anilist'].clear()
+
+    def form(self, post_format, **changes):
+        data = {
+            'format': post_format,
+            'challenge-start': '2021-01-01',
+            'completed-01': 'X',
+            'requirement-anime-01': 'K-On!',
+            'requirement-link-01': 'https://anilist.co/anime/5680',
+            'requirement-extra-01': 'Rewatch',
+            'requirement-anime-02': 'Mushishi',
+            'requirement-link-02': 'https://anilist.co/anime/457',
+            'requirement-extra-02': 'Ep 2',
+            'completed-bonus-1': 'O',
+            'requirement-anime-bonus-1': 'Planetes',
+            'requirement-link-bonus-1': 'https://anilist.co/anime/329',
+        }
+        data.update(changes)
+
+        return data
+
+    def patch(self, post_format, key, comment=None, **changes):
+        comment = comment or render_comment(self.genre, self.form(post_format))
+        state = Utils.parse_challenge_code(Submission(challenge=self.genre), comment)
+
+        return patch_requirement(self.genre, comment, state, key, FormState.decode(changes))
+
+    def test_matches_the_whole_comment(self):
+        cases = [
+            ('01', {'completed-01': 'O', 'requirement-finish-01': '2021-02-01'}),
+            ('02', {'requirement-extra-02': 'Ep 1, img(https://i.imgur.com/a.png)'}),
+            ('bonus-1', {'completed-bonus-1': 'X'}),
+            ('03', {'requirement-raw-03': '03) Edited'}),
+        ]
+
+        for post_format in ('old', 'new'):
+            for key, changes in cases:
+                with self.subTest(post_format=post_format, key=key):
+                    patched, text = self.patch(post_format, key, **changes)
+
+                    self.assertEquals(patched, render_comment(self.genre, self.form(post_format, **changes)))
+                    self.assertIn(text.strip(), patched)
+
+    def test_unchanged_requirements_keep_the_comment(self):
+        comment = render_comment(self.genre, self.form('new'))
+
+        self.assertEquals(self.patch('new', '01', comment, **{'completed-01': 'X'})[0], comment)
+
+    def test_stripped_endings_are_kept(self):
+        comment = render_comment(self.genre, self.form('new')).rstrip()
+
+        patched, text = self.patch('new', 'bonus-1', comment, **{'completed-bonus-1': 'X'})
+
+        self.assertTrue(patched.endswith("B1) [X] __Bonus__\n[Planetes](https://anilist.co/anime/329)\nStart: YYYY-MM-DD Finish: YYYY-MM-DD"))
+
+    def test_links_are_read_like_the_parser(self):
+        comment = render_comment(self.genre, {'format': 'old'})
+
+        patched, text = self.patch('old', '01', comment, **{'completed-01': 'X'})
+
+        self.assertEquals(text, "01) [X] Start: YYYY-MM-DD Finish: YYYY-MM-DD __First__ [Anime_Title](https://anilist.co/anime/00000) \n")
+        self.assertEquals(patched, comment.replace("01) [O] Start: YYYY-MM-DD Finish: YYYY-MM-DD __First__ [Anime_Title](https://anilist.co/anime/00000/)",
+                                                   "01) [X] Start: YYYY-MM-DD Finish: YYYY-MM-DD __First__ [Anime_Title](https://anilist.co/anime/00000)"))
+
+    def test_changed_modes_need_the_whole_comment(self):
+        with self.assertRaises(PatchError):
+            self.patch('new', '01', **{'mode-01': Requirement.HARD})
+
+    def test_missing_requirements(self):
+        with self.assertRaises(PatchError):
+            self.patch('new', '04', **{'completed-04': 'X'})
+
+    def test_edited_comments_are_not_patched(self):
+        comment = render_comment(self.genre, self.form('old')).replace('__First__ [K-On!]', '__First__  [K-On!]')
+
+        with self.assertRaises(PatchError):
+            self.patch('old', '01', comment, **{'completed-01': 'O'})
@@ -0,0 +1,62 @@
+import os
+import tempfile
+
+from django.test import SimpleTestCase
+
+from awc.ratelimit import RateLimiter, RateLimitTimeout
+
+# Create your tests here.
+class RateLimiterTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'ratelimit.json')
+
+        self.limiter = RateLimiter(self.path, capacity=10, period=60, bulk_reserve=0.5)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_interactive_uses_whole_bucket(self):
+        for i in range(10):
+            self.assertEquals(self.limiter.reserve(RateLimiter.INTERACTIVE), 0)
+
+        self.assertGreater(self.limiter.reserve(RateLimiter.INTERACTIVE), 0)
+
+    def test_bulk_leaves_reserve_for_interactive(self):
+        granted = 0
+
+        while self.limiter.reserve(RateLimiter.BULK) == 0:
+            granted += 1
+
+        self.assertEquals(granted, 5)
+        self.assertEquals(self.limiter.reserve(RateLimiter.INTERACTIVE), 0)
+
+    def test_bucket_is_shared_between_workers(self):
+        other_worker = RateLimiter(self.path, capacity=10, period=60)
+
+        for i in range(6):
+            self.limiter.reserve()
+
+        for i in range(4):
+            self.assertEquals(other_worker.reserve(), 0)
+
+        self.assertGreater(other_worker.reserve(), 0)
+
+    def test_remaining_header_drains_bucket(self):
+        self.limiter.update(200, {'X-RateLimit-Limit': '10', 'X-RateLimit-Remaining': '1'})
+
+        self.assertEquals(self.limiter.reserve(), 0)
+        self.assertGreater(self.limiter.reserve(), 0)
+
+    def test_retry_after_blocks_all_calls(self):
+        self.limiter.update(429, {'Retry-After': '30'})
+
+        self.assertGreater(self.limiter.reserve(RateLimiter.INTERACTIVE), 29)
+
+        with self.assertRaises(RateLimitTimeout):
+            self.limiter.acquire(timeout=1)
+
+    def test_limit_header_updates_capacity(self):
+        self.limiter.update(200, {'X-RateLimit-Limit': '30'})
+
+        self.assertEquals(self.limiter.status()['capacity'], 30)
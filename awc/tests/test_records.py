@@ -0,0 +1,71 @@
+import json
+
+from django.test import SimpleTestCase
+
+from awc.records import FuzzyDate, GraphQLError, Media, PageInfo, ThreadComment, decode_data, decode_response
+
+MEDIA = {
+    'id': 1,
+    'title': {'userPreferred': 'Cowboy Bebop'},
+    'coverImage': {'large': 'https://example.com/cover.jpg'},
+    'episodes': 26,
+    'mediaListEntry': {
+        'id': 2,
+        'status': 'COMPLETED',
+        'startedAt': {'year': 2020, 'month': 1, 'day': 2},
+        'completedAt': {'year': None, 'month': None, 'day': None},
+    },
+}
+
+# Create your tests here.
+class DecodeResponseTest(SimpleTestCase):
+    def test_decodes_data_and_extensions(self):
+        data, extensions = decode_response(json.dumps({'data': {'Viewer': {'id': 1}}, 'extensions': {'stale': True}}))
+
+        self.assertEquals(data, {'Viewer': {'id': 1}})
+        self.assertEquals(extensions, {'stale': True})
+
+    def test_errors_without_data_raise(self):
+        with self.assertRaises(GraphQLError) as context:
+            decode_data(json.dumps({'data': {'ThreadComment': None}, 'errors': [{'message': 'Not Found.', 'status': 404}]}))
+
+        self.assertEquals(context.exception.status, 404)
+        self.assertEquals(str(context.exception), 'Not Found.')
+
+    def test_partial_errors_keep_data(self):
+        data = decode_data(json.dumps({'data': {'c1': [{'id': 1}], 'c2': None}, 'errors': [{'message': 'Not Found.'}]}))
+
+        self.assertEquals(data['c1'], [{'id': 1}])
+
+class RecordsTest(SimpleTestCase):
+    def test_media_from_dict(self):
+        media = Media.from_dict(MEDIA)
+
+        self.assertEquals(media.title, 'Cowboy Bebop')
+        self.assertEquals(media.cover_image, 'https://example.com/cover.jpg')
+        self.assertEquals(media.media_list_entry.status, 'COMPLETED')
+        self.assertEquals(str(media.media_list_entry.started_at), '2020-01-02')
+        self.assertEquals(str(media.media_list_entry.completed_at), 'YYYY-MM-DD')
+
+    def test_media_to_json(self):
+        self.assertEquals(Media.from_dict(MEDIA).to_json(), {
+            'id': 1,
+            'title': 'Cowboy Bebop',
+            'cover_image': 'https://example.com/cover.jpg',
+            'status': 'COMPLETED',
+            'started_at': '2020-01-02',
+            'completed_at': 'YYYY-MM-DD',
+        })
+
+    def test_media_without_list_entry(self):
+        media = Media.from_dict({'id': 1, 'title': {'userPreferred': 'Trigun'}, 'mediaListEntry': None})
+
+        self.assertIsNone(media.media_list_entry)
+        self.assertIsNone(media.to_json()['status'])
+
+    def test_records_are_slotted(self):
+        self.assertFalse(hasattr(ThreadComment.from_dict({'id': 1}), '__dict__'))
+        self.assertFalse(hasattr(FuzzyDate(), '__dict__'))
+
+    def test_page_info_defaults(self):
+        self.assertEquals(PageInfo.from_dict({'currentPage': 2, 'lastPage': None}).last_page, 1)
@@ -0,0 +1,67 @@
+from django.test import RequestFactory, TestCase
+
+from awc.models import Challenge, Requirement
+from awc.renderer import CommentRenderer, compile_template
+from awc.utils import Utils
+
+# Create your tests here.
+class CommentRendererTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.classic = Challenge.objects.create(name="Classic Challenge", thread_id=1, category=Challenge.CLASSIC)
+        cls.genre = Challenge.objects.create(name="Action Genre Challenge", thread_id=2, category=Challenge.GENRE, extra='Challenge extra')
+        cls.genre.prerequisites.add(cls.classic)
+
+        Requirement.objects.create(challenge=cls.genre, number=2, mode=Requirement.EASY, text='Second')
+        Requirement.objects.create(challenge=cls.genre, number=1, mode=Requirement.EASY, text='First', extra='Ep 1, ~!Spoiler!~')
+        Requirement.objects.create(challenge=cls.genre, number=3, mode=Requirement.NORMAL, text='', force_raw_edit=True, raw_requirement='03) Raw')
+        Requirement.objects.create(challenge=cls.genre, number=1, mode=Requirement.BONUS, bonus=True, text='Bonus',
+                                   anime_title='Set', anime_link='https://anilist.co/anime/5')
+
+    def test_genre(self):
+        data = {
+            'format': 'new',
+            'challenge-start': '2021-01-01',
+            'completed-01': 'X',
+            'requirement-anime-01': 'Anime',
+            'requirement-link-01': 'https://anilist.co/anime/1',
+            'completed-bonus-1': 'X',
+            'prerequisite-Classic Challenge-finish': '2021-02-01',
+        }
+
+        self.assertEquals(CommentRenderer(self.genre).render(data),
+                          "# __Action Genre Challenge__\n\n"
+                          "[Classic Challenge](https://anilist.co/forum/thread/0000/comment/00000) Finish Date: 2021-02-01\n\n"
+                          "Challenge Start Date: 2021-01-01\nChallenge Finish Date: YYYY-MM-DD\n"
+                          "Legend: [X] = Completed [O] = Not Completed \n\n<hr>\n\n"
+                          "__Mode: Easy__\n"
+                          "01) [X] __First__\n[Anime](https://anilist.co/anime/1)\nStart: YYYY-MM-DD Finish: YYYY-MM-DD // Ep 1 // Spoiler\n\n"
+                          "02) [O] __Second__\n[Anime_Title](https://anilist.co/anime/00000/)\nStart: YYYY-MM-DD Finish: YYYY-MM-DD\n\n"
+                          "\n---\n__Mode: Normal__\n03) Raw\n\n"
+                          "\n---\n__Bonus__\n"
+                          "B1) [X] __Bonus__\n[Set](https://anilist.co/anime/5)\nStart: YYYY-MM-DD Finish: YYYY-MM-DD\n\n"
+                          "\n<hr>\n\nChallenge extra")
+
+    def test_classic_seasons(self):
+        old = CommentRenderer(self.classic).render({'completed-11': 'X'})
+        new = CommentRenderer(self.classic).render({'format': 'new'})
+
+        self.assertIn("10) [O] Start: YYYY-MM-DD Finish: YYYY-MM-DD [Anime_Title](https://anilist.co/anime/00000/) \n\n### __Spring__\n11) [X]", old)
+        self.assertIn("\n\n\n<hr>\n\n### __Spring__\n11) [O] __1st Spring Anime__\n", new)
+        self.assertTrue(new.endswith("40) [O] __10th Fall Anime__\n[Anime_Title](https://anilist.co/anime/00000/)\nStart: YYYY-MM-DD Finish: YYYY-MM-DD\n\n"))
+
+    def test_matches_requests(self):
+        data = {'format': 'old', 'mode-02': Requirement.NORMAL, 'requirement-extra-01': 'Extra', 'challenge-extra': ''}
+        request = RequestFactory().post('/', data)
+
+        self.assertEquals(Utils.create_comment_string(request, self.genre, None), CommentRenderer(self.genre).render(data))
+
+    def test_requirements_are_loaded_once(self):
+        renderer = CommentRenderer(self.genre)
+        renderer.render({})
+
+        with self.assertNumQueries(1):
+            renderer.render({'format': 'new'})
+
+    def test_compiled_templates(self):
+        self.assertEquals(compile_template("{number}) [{completed}]"), (('', 'number'), (') [', 'completed'), (']', None)))
@@ -0,0 +1,247 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.cache import caches
+from django.test import SimpleTestCase
+
+from awc.anilist import Anilist
+from awc.cache import ResponseCache
+from awc.ratelimit import RateLimiter
+from awc.resilience import AnilistUnavailable, CircuitBreaker, CircuitOpen, backoff_delay, is_stale, mark_stale
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+
+        self.server.request_count += 1
+
+        if self.server.replies:
+            status, payload = self.server.replies.pop(0)
+        elif self.server.failing:
+            status, payload = 500, b'{"errors": [{"message": "Internal Server Error"}]}'
+        else:
+            status, payload = 200, json.dumps({'data': {'ThreadComment': [{'id': self.server.request_count}]}}).encode()
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+# Create your tests here.
+class CircuitBreakerTest(SimpleTestCase):
+    def test_opens_after_threshold(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+
+        breaker.record_failure()
+        breaker.before_call()
+        breaker.record_failure()
+
+        with self.assertRaises(CircuitOpen):
+            breaker.before_call()
+
+    def test_half_open_trial_closes_on_success(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+
+        breaker.record_failure()
+        breaker.before_call()
+
+        self.assertEquals(breaker.state, CircuitBreaker.HALF_OPEN)
+
+        with self.assertRaises(CircuitOpen):
+            breaker.before_call()
+
+        breaker.record_success()
+        self.assertEquals(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_released_trial_lets_another_caller_try(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+
+        breaker.record_failure()
+        breaker.before_call()
+        breaker.release()
+
+        breaker.before_call()
+        self.assertEquals(breaker.state, CircuitBreaker.HALF_OPEN)
+
+    def test_backoff_is_bounded(self):
+        for attempt in range(10):
+            self.assertLessEqual(backoff_delay(attempt, base_delay=0.1, max_delay=1), 1)
+
+    def test_stale_marker(self):
+        response = mark_stale('{"data": {"ThreadComment": []}}', 0)
+
+        self.assertTrue(is_stale(response))
+        self.assertFalse(is_stale('{"data": {"ThreadComment": []}}'))
+        self.assertEquals(json.loads(response)['data'], {'ThreadComment': []})
+
+class AnilistResilienceTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), FlakyHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        caches['anilist'].clear()
+
+        self.server.request_count = 0
+        self.server.failing = False
+        self.server.replies = []
+
+        self.anilist = Anilist('id', 'secret', 'http://localhost/', retries=1,
+                               circuit_breaker=CircuitBreaker(failure_threshold=4, reset_timeout=60),
+                               response_cache=ResponseCache('anilist'))
+        self.anilist.API_URL = 'http://127.0.0.1:{}/'.format(self.server.server_address[1])
+
+    def tearDown(self):
+        # Background refreshes of stale responses would otherwise call the server during the next test
+        deadline = time.time() + 10
+
+        while self.anilist._refreshing and time.time() < deadline:
+            time.sleep(0.01)
+
+    def test_queries_are_retried(self):
+        self.server.failing = True
+
+        with self.assertRaises(AnilistUnavailable):
+            self.anilist.post_query(self.anilist.GET_POST_QUERY, {'comment_id': 1})
+
+        self.assertEquals(self.server.request_count, 2)
+
+        stats = self.anilist.metrics.snapshot()['GET_POST_QUERY']
+        self.assertEquals((stats['calls'], stats['errors'], stats['retries']), (1, 1, 1))
+        self.assertEquals(stats['statuses'], {'500': 1})
+
+    def test_mutations_are_not_retried(self):
+        self.server.failing = True
+
+        with self.assertRaises(AnilistUnavailable):
+            self.anilist.post_authorised_query('token', self.anilist.MAKE_POST_QUERY, {'comment': ''})
+
+        self.assertEquals(self.server.request_count, 1)
+
+    def test_circuit_fails_fast(self):
+        self.server.failing = True
+
+        for i in range(2):
+            with self.assertRaises(AnilistUnavailable):
+                self.anilist.post_query(self.anilist.GET_POST_QUERY, {'comment_id': i})
+
+        with self.assertRaises(CircuitOpen):
+            self.anilist.post_query(self.anilist.GET_POST_QUERY, {'comment_id': 3})
+
+        self.assertEquals(self.server.request_count, 4)
+
+    def test_stale_response_is_served(self):
+        fresh = self.anilist.post_query(self.anilist.GET_POST_QUERY, {'comment_id': 1}, stale=True)
+        self.assertFalse(is_stale(fresh))
+
+        self.server.failing = True
+
+        stale = self.anilist.post_query(self.anilist.GET_POST_QUERY, {'comment_id': 1}, stale=True)
+        self.assertTrue(is_stale(stale))
+        self.assertEquals(json.loads(stale)['data'], json.loads(fresh)['data'])
+
+    def blocked_rate_limiter(self, retry_after):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        rate_limiter = RateLimiter(os.path.join(directory.name, 'ratelimit.json'))
+        rate_limiter.update(429, {'Retry-After': str(retry_after)})
+
+        return rate_limiter
+
+    def test_rate_limit_waits_are_bounded(self):
+        fresh = self.anilist.post_query(self.anilist.GET_POST_QUERY, {'comment_id': 1}, stale=True)
+
+        self.anilist.rate_limiter = self.blocked_rate_limiter(600)
+        self.anilist.read_timeout = 1
+
+        started = time.time()
+
+        stale = self.anilist.post_query(self.anilist.GET_POST_QUERY, {'comment_id': 1}, stale=True)
+
+        self.assertLess(time.time() - started, 1)
+        self.assertTrue(is_stale(stale))
+        self.assertEquals(json.loads(stale)['data'], json.loads(fresh)['data'])
+
+        with self.assertRaises(AnilistUnavailable):
+            self.anilist.post_query(self.anilist.GET_POST_QUERY, {'comment_id': 2}, stale=True)
+
+        self.assertEquals(self.server.request_count, 1)
+        self.assertEquals(self.anilist.circuit_breaker.failures, 0)
+
+    def test_bulk_calls_wait_out_the_rate_limit(self):
+        self.anilist.rate_limiter = self.blocked_rate_limiter(0.2)
+        self.anilist.read_timeout = 0
+
+        self.anilist.post_query(self.anilist.GET_POST_QUERY, {'comment_id': 1}, priority=RateLimiter.BULK)
+
+        self.assertEquals(self.server.request_count, 1)
+
+    def test_rate_limited_queries_are_retried(self):
+        self.server.replies = [(429, b'{"errors": [{"message": "Too Many Requests.", "status": 429}]}')]
+
+        response = self.anilist.post_query(self.anilist.GET_POST_QUERY, {'comment_id': 1})
+
+        self.assertEquals(json.loads(response)['data'], {'ThreadComment': [{'id': 2}]})
+        self.assertEquals(self.server.request_count, 2)
+        self.assertEquals(self.anilist.circuit_breaker.failures, 0)
+
+    def test_rate_limited_mutations_are_returned(self):
+        self.server.replies = [(429, b'{"errors": [{"message": "Too Many Requests.", "status": 429}]}')]
+
+        response = self.anilist.post_authorised_query('token', self.anilist.MAKE_POST_QUERY, {'comment': ''})
+
+        self.assertEquals(json.loads(response)['errors'][0]['status'], 429)
+        self.assertEquals(self.server.request_count, 1)
+
+    def test_error_responses_are_not_kept_as_last_good(self):
+        fresh = self.anilist.post_query(self.anilist.GET_POST_QUERY, {'comment_id': 1}, stale=True)
+
+        self.server.replies = [
+            (404, b'{"errors": [{"message": "Not Found.", "status": 404}], "data": {"ThreadComment": null}}'),
+            (200, b'{"errors": [{"message": "Internal error"}], "data": null}'),
+        ]
+
+        for i in range(2):
+            self.assertIn('errors', json.loads(self.anilist.post_query(self.anilist.GET_POST_QUERY, {'comment_id': 1}, stale=True)))
+
+        self.server.failing = True
+
+        stale = self.anilist.post_query(self.anilist.GET_POST_QUERY, {'comment_id': 1}, stale=True)
+        self.assertTrue(is_stale(stale))
+        self.assertEquals(json.loads(stale)['data'], json.loads(fresh)['data'])
+
+    def test_only_interactive_reads_that_ask_are_kept(self):
+        calls = [
+            ({'comment_id': 1}, {}),
+            ({'comment_id': 2}, {'stale': True, 'priority': RateLimiter.BULK}),
+        ]
+
+        for variables, options in calls:
+            self.anilist.post_query(self.anilist.GET_POST_QUERY, variables, **options)
+
+        self.server.failing = True
+
+        for variables, options in calls:
+            with self.subTest(options=options), self.assertRaises(AnilistUnavailable):
+                self.anilist.post_query(self.anilist.GET_POST_QUERY, variables, **options)
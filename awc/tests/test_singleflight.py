@@ -0,0 +1,73 @@
+import asyncio
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from awc.anilist import Anilist
+from awc.singleflight import SingleFlight, AsyncSingleFlight, request_key
+
+# Create your tests here.
+class SingleFlightTest(SimpleTestCase):
+    def test_concurrent_calls_are_shared(self):
+        single_flight = SingleFlight()
+        calls = []
+        results = []
+
+        def fetch():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'response'
+
+        threads = [threading.Thread(target=lambda: results.append(single_flight.do('key', fetch))) for i in range(5)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEquals(len(calls), 1)
+        self.assertEquals(results, ['response'] * 5)
+        self.assertEquals(single_flight.stats(), {'calls': 1, 'shared': 4, 'in_flight': 0})
+
+    def test_errors_are_shared(self):
+        single_flight = SingleFlight()
+
+        def fail():
+            raise ValueError('Anilist is down')
+
+        with self.assertRaises(ValueError):
+            single_flight.do('key', fail)
+
+        self.assertEquals(single_flight.do('key', lambda: 'recovered'), 'recovered')
+
+    def test_keys_are_scoped_to_the_user(self):
+        self.assertNotEqual(request_key('query', {'ids': [1]}, 'token-a'), request_key('query', {'ids': [1]}, 'token-b'))
+        self.assertNotEqual(request_key('query', {'ids': [1]}, 'token-a'), request_key('query', {'ids': [1]}))
+        self.assertEquals(request_key('query', {'a': 1, 'b': 2}), request_key('query', {'b': 2, 'a': 1}))
+
+    def test_mutations_are_not_coalesced(self):
+        anilist = Anilist('id', 'secret', 'http://localhost/')
+        calls = []
+
+        anilist._coalesce('token', anilist.MAKE_POST_QUERY, {}, lambda: calls.append(1))
+        anilist._coalesce('token', anilist.MAKE_POST_QUERY, {}, lambda: calls.append(1))
+
+        self.assertEquals(len(calls), 2)
+        self.assertEquals(anilist.single_flight.stats()['calls'], 0)
+
+class AsyncSingleFlightTest(SimpleTestCase):
+    async def test_concurrent_tasks_are_shared(self):
+        single_flight = AsyncSingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return 'response'
+
+        results = await asyncio.gather(*[single_flight.do('key', fetch) for i in range(5)])
+
+        self.assertEquals(len(calls), 1)
+        self.assertEquals(results, ['response'] * 5)
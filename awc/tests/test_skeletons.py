@@ -0,0 +1,119 @@
+import pickle
+
+from django.contrib import admin
+from django.core.cache import caches
+from django.test import TestCase
+
+from awc.admin import RequirementAdmin
+from awc.formstate import FormState
+from awc.models import Challenge, Requirement
+from awc.renderer import CommentRenderer
+from awc.skeletons import compile_skeleton, render_comment, skeleton_cache
+from awc.utils import Utils
+
+# Create your tests here.
+class CommentSkeletonTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.classic = Challenge.objects.create(name="Classic Challenge", thread_id=1, category=Challenge.CLASSIC)
+        cls.seasonal = Challenge.objects.create(name="Winter 2021 Seasonal Challenge", thread_id=3, category=Challenge.SPECIAL,
+                                                extra='Badge vote')
+        cls.genre = Challenge.objects.create(name="Action Genre Challenge", thread_id=2, category=Challenge.GENRE, extra='Challenge extra')
+        cls.genre.prerequisites.add(cls.classic)
+
+        Requirement.objects.create(challenge=cls.genre, number=2, mode=Requirement.EASY, text='Second', extra_newline=True)
+        Requirement.objects.create(challenge=cls.genre, number=1, mode=Requirement.EASY, text='First', extra='Ep 1, ~!Spoiler!~')
+        Requirement.objects.create(challenge=cls.genre, number=3, mode=Requirement.NORMAL, text='', force_raw_edit=True, raw_requirement='03) Raw')
+        Requirement.objects.create(challenge=cls.genre, number=1, mode=Requirement.BONUS, bonus=True, text='Bonus',
+                                   anime_title='Set', anime_link='https://anilist.co/anime/5')
+
+    def setUp(self):
+        caches['anilist'].clear()
+
+    def forms(self, post_format):
+        return [
+            {'format': post_format},
+            {
+                'format': post_format,
+                'legend': "{'Completed': 'X', 'Up to Date': 'U'}",
+                'challenge-start': '2021-01-01',
+                'challenge-finish': '',
+                'challenge-extra': '',
+                'prerequisite-Classic Challenge-finish': '2021-02-01',
+                'completed-01': ' X ',
+                'requirement-anime-01': 'Anime',
+                'requirement-link-01': 'https://anilist.co/anime/1',
+                'requirement-extra-01': 'Ep 3, img(https://i.imgur.com/a.png)',
+                'requirement-extra-02': '',
+                'requirement-raw-03': '03) Edited\nSecond line',
+                'completed-bonus-1': 'X',
+                'mode-01': Requirement.EASY,
+                'mode-bonus-1': Requirement.BONUS,
+            },
+        ]
+
+    def test_matches_renderer(self):
+        for challenge in (self.genre, self.classic, self.seasonal):
+            for post_format in ('old', 'new'):
+                for data in self.forms(post_format):
+                    with self.subTest(challenge=challenge.name, data=data):
+                        self.assertEquals(render_comment(challenge, data), CommentRenderer(challenge).render(data))
+
+    def test_changed_modes_fall_back(self):
+        data = {'format': 'new', 'mode-02': Requirement.NORMAL}
+
+        self.assertFalse(compile_skeleton(self.genre, 'new').fits(FormState.decode(data)))
+        self.assertIn("__Mode: Normal__\n02) [O] __Second__", render_comment(self.genre, data))
+        self.assertEquals(render_comment(self.genre, data), CommentRenderer(self.genre).render(data))
+
+    def test_rendering_skips_the_database(self):
+        render_comment(self.seasonal, {})
+
+        with self.assertNumQueries(0):
+            render_comment(self.seasonal, {'completed-01': 'X'})
+
+    def test_fixed_text_is_merged(self):
+        pieces = compile_skeleton(self.genre, 'new').pieces
+
+        self.assertTrue(pieces[0].startswith("# __Action Genre Challenge__\n\n[Classic Challenge]("))
+        self.assertFalse(any(isinstance(piece, str) and isinstance(following, str) for piece, following in zip(pieces, pieces[1:])))
+        self.assertIn("] __Bonus__\n[Set](https://anilist.co/anime/5)\nStart: ", pieces[-2][2])
+
+    def test_pickles(self):
+        skeleton = compile_skeleton(self.genre, 'old')
+
+        self.assertEquals(pickle.loads(pickle.dumps(skeleton)), skeleton)
+
+    def test_changes_recompile(self):
+        render_comment(self.genre, {})
+
+        requirement = Requirement.objects.create(challenge=self.genre, number=4, mode=Requirement.HARD, text='Fourth')
+
+        self.assertIn("04) [O] Start: YYYY-MM-DD Finish: YYYY-MM-DD __Fourth__", render_comment(self.genre, {}))
+
+        requirement.text = 'Renamed'
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RequirementAdmin(Requirement, admin.site).save_model(None, requirement, None, True)
+
+        misses = skeleton_cache.stats()['misses']
+
+        self.assertIn("__Renamed__", render_comment(self.genre, {}))
+        self.assertEquals(skeleton_cache.stats()['misses'], misses)
+
+    def test_created_challenges_are_compiled(self):
+        code = ("# __Tier Challenge__\n\nChallenge Start Date: YYYY-MM-DD\nChallenge Finish Date: YYYY-MM-DD\n"
+                "Legend: [X] = Completed [O] = Not Completed\n\n<hr>\n\n"
+                "01) [O] __Watch a show__\n[Anime_Title](https://anilist.co/anime/00000/)\nStart: YYYY-MM-DD Finish: YYYY-MM-DD\n\n"
+                "<hr>\n\nTier extra")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Utils.create_challenge_from_code(4, code, Challenge.TIER)
+
+        challenge = Challenge.objects.get(name="Tier Challenge")
+        misses = skeleton_cache.stats()['misses']
+
+        for post_format in ('old', 'new'):
+            self.assertEquals(render_comment(challenge, {'format': post_format}), CommentRenderer(challenge).render({'format': post_format}))
+
+        self.assertEquals(skeleton_cache.stats()['misses'], misses)
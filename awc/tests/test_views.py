@@ -1,6 +1,108 @@
+from django.core.cache import caches
 from django.test import TestCase
 from django.urls import reverse
 
-from awc.models import User
+from awc import views
+from awc.anilist import Anilist
+from awc.fakeanilist import FakeAnilistData, FakeAnilistServer
+from awc.models import Challenge, Requirement, Submission, User
+from awc.skeletons import render_comment
 
 # Create your tests here.
+class UpdateRequirementViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Challenge.objects.create(name="Classic Challenge", thread_id=1, category=Challenge.CLASSIC)
+
+    def url(self):
+        return reverse('awc:update-requirement', args=["Classic Challenge"])
+
+    def log_in(self, **values):
+        session = self.client.session
+        session.update(values)
+        session.save()
+
+    def test_expired_sessions(self):
+        for values in ({}, {'user': {'name': 'omn0mn0m'}}):
+            with self.subTest(values=values):
+                self.log_in(**values)
+
+                response = self.client.post(self.url(), {'requirement': '01', 'completed-01': 'X'})
+
+                self.assertEquals(response.status_code, 401)
+                self.assertIn('errors', response.json())
+
+    def test_missing_submissions(self):
+        self.log_in(user={'name': 'omn0mn0m'}, access_token='token')
+
+        response = self.client.post(self.url(), {'requirement': '01', 'completed-01': 'X'})
+
+        self.assertEquals(response.status_code, 404)
+        self.assertIn('errors', response.json())
+
+    def test_only_posts(self):
+        response = self.client.get(self.url())
+
+        self.assertEquals(response.status_code, 405)
+
+class UpdateRequirementAnilistTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakeAnilistServer(data=FakeAnilistData(seed=6, users=1, media=10)).start()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.genre = Challenge.objects.create(name="Action Genre Challenge", thread_id=2, category=Challenge.GENRE)
+
+        Requirement.objects.create(challenge=cls.genre, number=1, mode=Requirement.EASY, text='First')
+        Requirement.objects.create(challenge=cls.genre, number=2, mode=Requirement.EASY, text='Second')
+
+        cls.user = User.objects.create(name='User1', user_id=1, avatar_url='', is_admin=False)
+
+    def setUp(self):
+        caches['anilist'].clear()
+
+        # The view's client is pointed at the fake server, as the audit tests do for the command's
+        client = views.anilist
+        views.anilist = Anilist('id', 'secret', 'http://localhost/', retries=0, api_url=self.server.api_url)
+        self.addCleanup(setattr, views, 'anilist', client)
+
+        comment = render_comment(self.genre, {'format': 'new', 'challenge-start': '2021-01-01'})
+        self.posted = self.server.data.add_comment(self.genre.thread_id, 1, comment)
+
+        self.submission = Submission.objects.create(user=self.user, challenge=self.genre, thread_id=self.genre.thread_id,
+                                                    comment_id=self.posted['id'])
+        self.submission.remember_comment(comment)
+
+        session = self.client.session
+        session.update({'user': {'name': 'User1'}, 'access_token': 'token-1'})
+        session.save()
+
+    def update(self):
+        return self.client.post(reverse('awc:update-requirement', args=[self.genre.name]),
+                                {'requirement': '01', 'format': 'new', 'completed-01': 'X'})
+
+    def test_updates_the_comment_on_anilist(self):
+        response = self.update()
+
+        self.assertEquals(response.status_code, 200)
+        self.assertTrue(response.json()['updated'])
+        self.assertIn("01) [X]", self.server.data.comments[self.posted['id']]['comment'])
+
+        self.submission.refresh_from_db()
+        self.assertTrue(self.submission.is_unchanged(self.server.data.comments[self.posted['id']]['comment']))
+
+    def test_comments_edited_on_anilist_are_not_overwritten(self):
+        edited = self.posted['comment'] + "\n\nEdited on Anilist"
+        self.posted['comment'] = edited
+
+        response = self.update()
+
+        self.assertEquals(response.status_code, 409)
+        self.assertEquals(self.server.data.comments[self.posted['id']]['comment'], edited)
@@ -7,6 +7,7 @@ app_name = 'awc'
 urlpatterns = [
     path('', views.index, name='index'),
     path('edit/<str:challenge_name>/', views.edit, name='edit'),
+    path('edit/<str:challenge_name>/requirement/', views.update_requirement, name='update-requirement'),
     #path('create-submission/<str:challenge_name>/', views.create_submission, name='create-submission'),
     path('add-challenge/', views.add_challenge, name='add-challenge'),
     path('add-existing-submission/', views.add_existing_submission, name='add-existing-submission'),
@@ -20,4 +21,5 @@ urlpatterns = [
     path('delete-post/<int:comment_id>/submission', views.delete_post, {'is_submission': True}, name='delete-submission'),
     path('scan', views.scan, name='scan'),
     path('search-anime', views.search_anime, name='search-anime'),
+    path('anilist-stats', views.anilist_stats, name='anilist-stats'),
 ]
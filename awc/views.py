@@ -1,8 +1,18 @@
+from django.conf import settings
 from django.http import Http404, HttpResponseRedirect, JsonResponse
 from django.shortcuts import render, get_object_or_404
 from django.urls import reverse
 
 from .anilist import Anilist
+from .cache import MediaCache, ParseCache, ResponseCache
+from .cassette import Cassette
+from .challengestate import ChallengeState
+from .formstate import FormState
+from .patches import PatchError, patch_requirement
+from .ratelimit import RateLimiter
+from .records import GraphQLError, decode_data
+from .resilience import AnilistUnavailable, CircuitBreaker
+from .skeletons import skeleton_cache
 from .models import Submission, Challenge
 from .utils import Utils
 from .forms import CreateChallengeForm, AddExistingSubmissionForm
@@ -11,6 +21,7 @@ from core.models import User
 
 import json
 import os
+import tempfile
 
 from datetime import date
 
@@ -18,7 +29,49 @@ anilist_client_id = os.environ.get('ANILIST_CLIENT_ID')
 anilist_client_secret = os.environ.get('ANILIST_CLIENT_SECRET')
 anilist_redirect_uri= os.environ.get('ANILIST_REDIRECT_URI')
 
-anilist = Anilist(anilist_client_id, anilist_client_secret, anilist_redirect_uri)
+anilist_pool_size = int(os.environ.get('ANILIST_POOL_SIZE', 10))
+anilist_connect_timeout = float(os.environ.get('ANILIST_CONNECT_TIMEOUT', 3.05))
+anilist_read_timeout = float(os.environ.get('ANILIST_READ_TIMEOUT', 10))
+
+# Every worker on the host shares this bucket through the state file
+anilist_rate_limiter = RateLimiter(os.environ.get('ANILIST_RATE_LIMIT_FILE', os.path.join(tempfile.gettempdir(), 'mion-anilist-ratelimit.json')),
+                                   capacity=int(os.environ.get('ANILIST_RATE_LIMIT', 90)))
+
+anilist_media_cache = MediaCache('anilist',
+                                 max_entries=int(os.environ.get('ANILIST_CACHE_MAX_ENTRIES', 5000)),
+                                 entry_ttl=int(os.environ.get('ANILIST_CACHE_ENTRY_TTL', 60)))
+
+# Parsed challenge codes, keyed by the version that the receivers in signals.py replace when a challenge changes
+challenge_parse_cache = ParseCache('anilist', ttl=int(os.environ.get('ANILIST_CACHE_PARSE_TTL', 60 * 60)))
+
+anilist_circuit_breaker = CircuitBreaker(failure_threshold=int(os.environ.get('ANILIST_CIRCUIT_THRESHOLD', 5)),
+                                         reset_timeout=float(os.environ.get('ANILIST_CIRCUIT_RESET', 30)))
+
+# Records Anilist traffic to, or replays it from, a cassette file when one is set
+if os.environ.get('ANILIST_CASSETTE'):
+    anilist_cassette = Cassette(os.environ['ANILIST_CASSETTE'],
+                                mode=os.environ.get('ANILIST_CASSETTE_MODE', Cassette.REPLAY),
+                                latency=os.environ.get('ANILIST_CASSETTE_LATENCY', Cassette.RECORDED))
+else:
+    anilist_cassette = None
+
+# Replayed traffic never reaches Anilist, so it is not rate limited
+if anilist_cassette and anilist_cassette.mode == Cassette.REPLAY:
+    anilist_rate_limiter = None
+
+# Shared by every view so the connection pool is reused across requests in a worker
+anilist = Anilist(anilist_client_id, anilist_client_secret, anilist_redirect_uri,
+                  pool_size=anilist_pool_size,
+                  connect_timeout=anilist_connect_timeout,
+                  read_timeout=anilist_read_timeout,
+                  rate_limiter=anilist_rate_limiter,
+                  media_cache=anilist_media_cache,
+                  retries=int(os.environ.get('ANILIST_RETRIES', 2)),
+                  circuit_breaker=anilist_circuit_breaker,
+                  response_cache=ResponseCache('anilist'),
+                  api_url=os.environ.get('ANILIST_API_URL'),
+                  auth_url=os.environ.get('ANILIST_AUTH_URL'),
+                  cassette=anilist_cassette)
 
 # Create your views here.
 def index(request):
@@ -70,14 +123,15 @@ def index(request):
                 }
 
                 # Make the HTTP Api request
-                response_data = json.loads(anilist.post_authorised_query(request.session['access_token'], anilist.MAKE_POST_QUERY, variables))
+                response_data = decode_data(anilist.post_authorised_query(request.session['access_token'], anilist.MAKE_POST_QUERY, variables))
 
-                context['comment_id'] = response_data['data']['SaveThreadComment']['id']
+                context['comment_id'] = response_data['SaveThreadComment']['id']
 
                 submission = Submission(user=User.objects.get(name=request.session['user']['name']),
                                         challenge=challenge,
                                         thread_id=challenge.thread_id,
-                                        comment_id=context['comment_id']).save()
+                                        comment_id=context['comment_id'],
+                                        comment_fingerprint=Submission.fingerprint(filled_code)).save()
 
     if 'user' in request.session:
         try:
@@ -130,6 +184,12 @@ def edit(request, challenge_name):
         try:
             filled_code = Utils.create_comment_string(request, challenge, context['user'])
 
+            # Anilist already has this comment, so there is nothing to send
+            if submission.is_unchanged(filled_code):
+                context['info_message'] = "Nothing has changed since your challenge code was last saved, so it was not updated."
+
+                return render(request, 'awc/edit.html', context)
+
             variables = {
                 'id': submission.comment_id,
                 'thread_id': challenge.thread_id,
@@ -139,53 +199,55 @@ def edit(request, challenge_name):
             # Make the HTTP Api request
             response = anilist.post_authorised_query(request.session['access_token'], anilist.UPDATE_POST_QUERY, variables)
 
+            # Raises if Anilist refused the update, so the comment is not remembered
+            decode_data(response)
+            submission.remember_comment(filled_code)
+
             return render(request, 'awc/edit.html', context)
+        except AnilistUnavailable as err:
+            context['error_message'] = "Anilist is not responding right now, so your challenge was not updated... Please try again in a few minutes."
         except Exception as err:
             print("Error: {}".format(err))
 
-    # Define our query variables and values that will be used in the query request
-    variables = {
-        'thread_id': submission.thread_id,
-        'comment_id': submission.comment_id
-    }
-
     # Make the HTTP Api request
-    response = anilist.post_query(anilist.GET_POST_QUERY, variables)
+    try:
+        comment = anilist.get_post(submission.thread_id, submission.comment_id)
 
-    parsed_response = Utils.parse_challenge_code(submission, response)
+        parsed_response = challenge_parse_cache.get_or_parse(challenge, comment.comment,
+                                                             lambda: Utils.parse_challenge_code(submission, comment.comment, requirements))
 
-    anime_ids = []
+        context['is_stale'] = comment.stale
 
-    if parsed_response['failed']:
-        context['error_message'] = "Failed to parse your challenge code... Make sure that your comment follows the AWC challenge code format for this challenge."
-    else:
-        for requirement in parsed_response['requirements']:
-            if not requirement['force_raw_edit']:
-                anime_ids.append(int(requirement['anime_id']))
-        
-        variables = {
-            'ids': anime_ids
-        }
+        # A stale comment may have changed on Anilist since
+        if not parsed_response.failed and not comment.stale:
+            submission.remember_comment(comment.comment)
+    except (AnilistUnavailable, GraphQLError) as err:
+        comment = None
 
-        anime = json.loads(anilist.post_authorised_query(request.session['access_token'], anilist.GET_ANIME_FROM_ID_QUERY, variables))
+        parsed_response = ChallengeState().fail(str(err), 'Your challenge code could not be loaded from Anilist...')
 
-        for i, requirement in enumerate(parsed_response['requirements']):
-            if not requirement['force_raw_edit']:
-                media = next((item for item in anime['data']['Page']['media'] if item['id'] == requirement['anime_id']), None)
+    anime_ids = []
+
+    if parsed_response.failed:
+        if comment is None:
+            context['error_message'] = "Your challenge code could not be loaded from Anilist... Please try again in a few minutes."
+        else:
+            context['error_message'] = "Failed to parse your challenge code... Make sure that your comment follows the AWC challenge code format for this challenge."
+    else:
+        for requirement in parsed_response.requirements:
+            if not requirement.force_raw_edit:
+                anime_ids.append(requirement.anime_id)
 
-                if media:
-                    if media['mediaListEntry'] != None and type(media['mediaListEntry']['startedAt']) is dict:
-                        if None not in media['mediaListEntry']['startedAt'].values():
-                            media['mediaListEntry']['startedAt'] = date(media['mediaListEntry']['startedAt']['year'], media['mediaListEntry']['startedAt']['month'], media['mediaListEntry']['startedAt']['day']).isoformat()
-                        else:
-                            media['mediaListEntry']['startedAt'] = "YYYY-MM-DD"
+        try:
+            anime = anilist.get_anime(request.session['access_token'], anime_ids)
+        except (AnilistUnavailable, GraphQLError) as err:
+            anime = []
 
-                        if None not in media['mediaListEntry']['completedAt'].values():
-                            media['mediaListEntry']['completedAt'] = date(media['mediaListEntry']['completedAt']['year'], media['mediaListEntry']['completedAt']['month'], media['mediaListEntry']['completedAt']['day']).isoformat()
-                        else:
-                            media['mediaListEntry']['completedAt'] = "YYYY-MM-DD"
+        media_by_id = {media.id: media for media in anime}
 
-                    parsed_response['requirements'][i]['media'] = media
+        for requirement in parsed_response.requirements:
+            if not requirement.force_raw_edit:
+                requirement.media = media_by_id.get(requirement.anime_id)
 
     context['submission'] = submission
     context['response'] = parsed_response
@@ -196,6 +258,58 @@ def edit(request, challenge_name):
     
     return render(request, 'awc/edit.html', context)
 
+def update_requirement(request, challenge_name):
+    if request.method != 'POST':
+        return JsonResponse({'errors': [{'message': 'Requirements are updated with a POST request'}]}, status=405)
+
+    # An expired session would otherwise end in an HTML error page, which the edit page cannot show
+    if 'user' not in request.session or 'access_token' not in request.session:
+        return JsonResponse({'errors': [{'message': 'Your session has expired... Please log in again.'}]}, status=401)
+
+    submission = Submission.objects.filter(user__name=request.session['user']['name'], challenge__name=challenge_name).select_related('challenge').first()
+
+    if submission is None:
+        return JsonResponse({'errors': [{'message': 'You have no submission for this challenge'}]}, status=404)
+
+    challenge = submission.challenge
+    key = request.POST.get('requirement', '')
+
+    try:
+        post = anilist.get_post(submission.thread_id, submission.comment_id)
+
+        # Patching the last loaded copy could undo changes made since
+        if post.stale:
+            raise AnilistUnavailable("Anilist is not responding right now, so your challenge was not updated... Please try again in a few minutes.")
+
+        comment = post.comment
+
+        # The page was filled in from the comment the submission remembers, so edits made on Anilist since would be overwritten
+        if submission.comment_fingerprint and not submission.is_unchanged(comment):
+            raise PatchError("Your challenge code has been changed on Anilist since this page was loaded... Please reload the page.")
+
+        parsed_response = challenge_parse_cache.get_or_parse(challenge, comment, lambda: Utils.parse_challenge_code(submission, comment))
+
+        patched, text = patch_requirement(challenge, comment, parsed_response, key, FormState.decode(request.POST))
+
+        if patched != comment:
+            variables = {
+                'id': submission.comment_id,
+                'thread_id': challenge.thread_id,
+                'comment': patched
+            }
+
+            decode_data(anilist.post_authorised_query(request.session['access_token'], anilist.UPDATE_POST_QUERY, variables))
+
+            submission.remember_comment(patched)
+    except PatchError as err:
+        return JsonResponse({'errors': [{'message': str(err)}]}, status=409)
+    except AnilistUnavailable as err:
+        return JsonResponse({'errors': [{'message': str(err)}]}, status=503)
+    except GraphQLError as err:
+        return JsonResponse({'errors': err.errors}, status=502)
+
+    return JsonResponse({'requirement': key, 'updated': patched != comment, 'text': text})
+
 def add_existing_submission(request):
     if request.method == 'POST':
         form = AddExistingSubmissionForm(request.POST)
@@ -321,13 +435,8 @@ def authenticate(request):
     else:
         request.session['access_token'] = response_data['access_token']
 
-    # Define our query variables and values that will be used in the query request
-    variables = {}
-    
     # Make the HTTP Api request
-    response_data = json.loads(anilist.post_authorised_query(request.session['access_token'], anilist.GET_USER_INFO_QUERY, variables))
-    
-    request.session['user'] = response_data['data']['Viewer']
+    request.session['user'] = anilist.get_user_info(request.session['access_token'])
 
     if not User.objects.filter(name=request.session['user']['name']).exists():
         user = User(name=request.session['user']['name'], user_id=request.session['user']['id'],
@@ -362,11 +471,11 @@ def submit_post(request, challenge_name, thread_id, comment_id):
     }
     
     # Make the HTTP Api request
-    response_data = json.loads(anilist.post_authorised_query(request.session['access_token'], anilist.MAKE_POST_QUERY, variables))
+    response_data = decode_data(anilist.post_authorised_query(request.session['access_token'], anilist.MAKE_POST_QUERY, variables))
     
     submission = get_object_or_404(Submission, user__name=request.session['user']['name'], challenge__name=challenge_name)
-    submission.submission_comment_id = response_data['data']['SaveThreadComment']['id']
-    submission.submission_thread_id = response_data['data']['SaveThreadComment']['threadId']
+    submission.submission_comment_id = response_data['SaveThreadComment']['id']
+    submission.submission_thread_id = response_data['SaveThreadComment']['threadId']
     submission.save()
 
     return HttpResponseRedirect(reverse('awc:index'))
@@ -378,9 +487,9 @@ def delete_post(request, comment_id, full_delete=False, is_submission=False):
             
             if full_delete:
                 # Make the HTTP Api request
-                response_data = json.loads(anilist.delete_post(comment_id))
+                response_data = decode_data(anilist.delete_post(request.session['access_token'], comment_id))
             
-            if (not full_delete) or response_data['data']['DeleteThreadComment']['deleted']:
+            if (not full_delete) or response_data['DeleteThreadComment']['deleted']:
                 if is_submission:
                     submission = user.submission_set.get(comment_id=comment_id)
                     submission.submission_comment_id = None
@@ -393,50 +502,53 @@ def delete_post(request, comment_id, full_delete=False, is_submission=False):
     return HttpResponseRedirect(reverse('awc:index'))
 
 def scan(request):
-    page_number = 1
-    
-    while True:
-        # Variables for the GraphQL query
-        variables = {
-            'page_number': page_number,
-            'user_id': User.objects.get(name=request.session['user']['name']).user_id
-        }
-    
-        # Make the HTTP Api request
-        response = json.loads(anilist.post_query(anilist.GET_USER_POSTS_QUERY, variables))
-        
-        thread_ids = set(comment['threadId'] for comment in response['data']['Page']['threadComments'])
-        
-        comments_by_thread = Utils.split_by_key(response['data']['Page']['threadComments'], 'threadId')
+    user_id = User.objects.get(name=request.session['user']['name']).user_id
+
+    # Pages arrive in order while the rest are still being fetched
+    for page in anilist.get_user_posts(user_id):
+        first_comments = {}
+
+        for comment in page:
+            if comment.thread_id not in first_comments or comment.id < first_comments[comment.thread_id].id:
+                first_comments[comment.thread_id] = comment
     
-        for thread_id in thread_ids:
-            comments = comments_by_thread[thread_id]
-            
+        for thread_id, first_comment in first_comments.items():
             try:
                 challenge = Challenge.objects.get(thread_id=thread_id)
                 
                 if not Submission.objects.filter(user__name=request.session['user']['name'], challenge=challenge).exists():
-                    first_comment = min(comments, key=lambda x:x['id'])
-                    
                     submission = Submission(user=User.objects.get(name=request.session['user']['name']),
                                             challenge=challenge,
                                             thread_id=thread_id,
-                                            comment_id=first_comment['id']).save()
+                                            comment_id=first_comment.id).save()
             except:
                 pass
-
-        if response['data']['Page']['pageInfo']['currentPage'] == response['data']['Page']['pageInfo']['lastPage']:
-            break
-        else:
-            page_number += 1
     
     return HttpResponseRedirect(reverse('awc:index'))
 
 def search_anime(request):
-    variables = {
-        'search': request.POST.get("search_anime_title", "")
-    }
-
-    data = json.loads(anilist.post_authorised_query(request.session['access_token'], anilist.SEARCH_ANIME_QUERY, variables))
+    try:
+        media = anilist.search_anime(request.session['access_token'], request.POST.get("search_anime_title", ""))
+    except AnilistUnavailable as err:
+        return JsonResponse({'errors': [{'message': str(err)}]}, status=503)
+    except GraphQLError as err:
+        return JsonResponse({'errors': err.errors}, status=502)
     
-    return JsonResponse(data, safe=False)
+    return JsonResponse({'media': [item.to_json() for item in media]})
+
+def anilist_stats(request):
+    # Worker internals are only exposed while debugging
+    if not settings.DEBUG:
+        raise Http404
+
+    return JsonResponse({
+        'calls': anilist.metrics.snapshot(),
+        'pool': anilist.pool_stats(),
+        'media_cache': anilist_media_cache.stats(),
+        'parse_cache': challenge_parse_cache.stats(),
+        'skeleton_cache': skeleton_cache.stats(),
+        'single_flight': anilist.single_flight.stats(),
+        'circuit_breaker': anilist_circuit_breaker.stats(),
+        'rate_limiter': anilist_rate_limiter.status() if anilist_rate_limiter else None,
+        'cassette': anilist_cassette.stats() if anilist_cassette else None,
+    })
@@ -60,6 +60,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'awc.middleware.AnilistMetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'mion.urls'
@@ -98,6 +99,24 @@ DATABASES = {
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Anilist media and search results, e.g. django.core.cache.backends.db.DatabaseCache to share between workers
+    'anilist': {
+        'BACKEND': os.environ.get('ANILIST_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('ANILIST_CACHE_LOCATION', 'anilist'),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('ANILIST_CACHE_MAX_ENTRIES', 5000)),
+        },
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 